@@ -0,0 +1,198 @@
+'''
+Module with fixtures shared by the benchmarks.
+
+The benchmarks are not collected by default, they are run with:
+
+pytest benchmarks
+
+Each module saves its results to /tmp/tests/rx_data/benchmarks/<module>/results.json. They are compared
+with the baselines in benchmarks/baselines/<module>.json, which are tracked, or in the directory in
+`RX_BENCH_BASELINE`, if set. The throughputs are divided by the one of a fixed reference workload, run
+once per session, such that baselines made in one machine can be used in another. Runs fail when the
+normalized throughput drops, or the memory grows, by more than the fraction in `RX_BENCH_TOLERANCE`,
+0.5 by default, or when a benchmark has no baseline. The baselines are only written when `RX_BENCH_UPDATE=1`.
+
+The benchmark modules get the helpers through the `bench` and `make_ntuples` fixtures, they do not import this module.
+'''
+import os
+import json
+import time
+from typing    import Callable
+from functools import cache
+
+import numpy
+
+import pytest
+from dmu.logging.log_store    import LogStore
+from rx_data                  import process_info as pin
+from rx_data.ntuple_generator import NtupleGenerator
+
+log=LogStore.add_logger('rx_data:benchmarks')
+# ----------------------------------------
+class Data:
+    '''
+    Class used to share attributes
+    '''
+    out_dir   = '/tmp/tests/rx_data/benchmarks'
+    base_dir  = os.environ.get('RX_BENCH_BASELINE', os.path.join(os.path.dirname(__file__), 'baselines'))
+    tolerance = float(os.environ.get('RX_BENCH_TOLERANCE', '0.5'))
+    nrepeat   = int(os.environ.get('RX_BENCH_REPEAT', '5'))
+    update    = os.environ.get('RX_BENCH_UPDATE', '0') == '1'
+    # Differences in memory below this, in MB, are never regressions
+    rss_slack = 20
+# ----------------------------------------
+@cache
+def _get_reference_rate() -> float:
+    '''
+    Runs fixed workload, with Python loops, numpy operations and memory copies, similar to the ones
+    of the benchmarked code, returns the inverse of its fastest time. It is run once per session
+    '''
+    rng = numpy.random.default_rng(0)
+    arr = rng.normal(size=1_000_000)
+
+    def _run():
+        total = 0.
+        for val in arr[:200_000].tolist():
+            total += val * val
+
+        srt = numpy.sort(arr)
+        cpy = numpy.concatenate([srt, arr]) * 2
+
+        return total + cpy.sum()
+
+    l_time = []
+    for _ in range(Data.nrepeat):
+        start = time.perf_counter()
+        _run()
+        l_time.append(time.perf_counter() - start)
+
+    rate = 1 / min(l_time)
+    log.info(f'Reference rate: {rate:.3f} 1/s')
+
+    return rate
+# ----------------------------------------
+class Benchmark:
+    '''
+    Class used to time functions, measure their memory usage and compare with baselines
+    '''
+    # ----------------------------------------
+    def __init__(self, name : str):
+        self._out_dir  = f'{Data.out_dir}/{name}'
+        self._bas_path = f'{Data.base_dir}/{name}.json'
+        self._d_result : dict[str,dict] = {}
+
+        os.makedirs(self._out_dir, exist_ok=True)
+
+        self._d_base = {}
+        if os.path.isfile(self._bas_path):
+            with open(self._bas_path, encoding='utf-8') as ifile:
+                self._d_base = json.load(ifile)
+    # ----------------------------------------
+    def _get_regressions(self, name : str, result : dict) -> list[str]:
+        if Data.update:
+            log.debug(f'Updating, not comparing with baseline: {name}')
+            return []
+
+        if name not in self._d_base:
+            return [f'missing baseline in {self._bas_path}, make it with RX_BENCH_UPDATE=1']
+
+        base   = self._d_base[name]
+        l_regr = []
+        if result['score'] < base['score'] * (1 - Data.tolerance):
+            l_regr.append(f'normalized rate {result["score"]:.3e} < {base["score"]:.3e} {result["unit"]}')
+
+        if result['rss_delta'] > max(base['rss_delta'] * (1 + Data.tolerance), base['rss_delta'] + Data.rss_slack):
+            l_regr.append(f'memory {result["rss_delta"]:.0f} > {base["rss_delta"]:.0f} MB')
+
+        return l_regr
+    # ----------------------------------------
+    def measure(self, name : str, fun : Callable, nitems : int, unit : str = 'candidates') -> dict:
+        '''
+        Runs function `nrepeat` times and stores:
+
+        time     : Fastest time in seconds
+        rate     : Items processed per second, with the fastest time
+        score    : Rate divided by the rate of the reference workload, compared with the baseline
+        rss_peak : Peak resident memory, in MB, while running the function
+        rss_delta: Difference between the peak and the memory before running, in MB
+
+        Fails if the results are worse than the baseline
+        '''
+        l_time   = []
+        rss_peak = 0.
+        rss_from = pin.get_rss('VmRSS') / 1024 ** 2
+        for _ in range(Data.nrepeat):
+            pin.reset_peak_rss()
+            start = time.perf_counter()
+            fun()
+            l_time.append(time.perf_counter() - start)
+            rss_peak = max(rss_peak, pin.get_rss('VmHWM') / 1024 ** 2)
+
+        value  = min(l_time)
+        result = {
+                'time'      : value,
+                'rate'      : nitems / value,
+                'score'     : nitems / value / _get_reference_rate(),
+                'unit'      : unit,
+                'items'     : nitems,
+                'rss_peak'  : rss_peak,
+                'rss_delta' : max(rss_peak - rss_from, 0)}
+
+        log.info(f'{name:<40}{value:>10.3f} s{result["rate"]:>12.3e} {unit}/s{rss_peak:>10.0f} MB')
+        self._d_result[name] = result
+
+        l_regr = self._get_regressions(name, result)
+        if len(l_regr) > 0:
+            pytest.fail(f'Regression in {name}: ' + ', '.join(l_regr))
+
+        return result
+    # ----------------------------------------
+    def save(self) -> None:
+        '''
+        Saves results and, if baselines are being updated, adds them to baselines
+        '''
+        out_path = f'{self._out_dir}/results.json'
+        log.info(f'Saving results to: {out_path}')
+        with open(out_path, 'w', encoding='utf-8') as ofile:
+            json.dump(self._d_result, ofile, indent=4, sort_keys=True)
+
+        if not Data.update:
+            return
+
+        self._d_base.update(self._d_result)
+        os.makedirs(os.path.dirname(self._bas_path), exist_ok=True)
+        log.info(f'Saving {len(self._d_result)} baselines to: {self._bas_path}')
+        with open(self._bas_path, 'w', encoding='utf-8') as ofile:
+            json.dump(self._d_base, ofile, indent=4, sort_keys=True)
+# ----------------------------------------
+@pytest.fixture(scope='module')
+def bench(request) -> Benchmark:
+    '''
+    Benchmark object, named after the module, e.g. calculators for test_calculators.py
+    '''
+    name = request.module.__name__.rpartition('.')[2].removeprefix('test_')
+    obj  = Benchmark(name=name)
+
+    yield obj
+
+    obj.save()
+# ----------------------------------------
+def _make_ntuples(nentries : int, nfiles : int = 1) -> str:
+    '''
+    Makes synthetic ntuples, if not already made, returns directory to be used as ANADIR
+    '''
+    ana_dir = f'{Data.out_dir}/ntuples/{nentries}_{nfiles}'
+    if os.path.isfile(f'{ana_dir}/Data/samples/main.yaml'):
+        return ana_dir
+
+    gen = NtupleGenerator(out_dir=ana_dir, nentries=nentries, nfiles=nfiles)
+    gen.run()
+
+    return ana_dir
+# ----------------------------------------
+@pytest.fixture(scope='session')
+def make_ntuples() -> Callable[..., str]:
+    '''
+    Function taking number of entries and files, making synthetic ntuples and returning directory to be used as ANADIR
+    '''
+    return _make_ntuples
@@ -0,0 +1,75 @@
+'''
+Module used to benchmark the calculators of friend trees, SWPCalculator and HOPCalculator,
+on synthetic ntuples of several sizes
+'''
+import pytest
+from ROOT                   import RDataFrame
+from dmu.logging.log_store  import LogStore
+from rx_data                import utilities as ut
+from rx_data.mis_calculator import MisCalculator
+from rx_data.hop_calculator import HOPCalculator
+from rx_data.swp_calculator import SWPCalculator
+
+log=LogStore.add_logger('rx_data:test_calculators')
+# ----------------------------------------
+class Data:
+    '''
+    Class used to share attributes
+    '''
+    l_size  = [1_000, 10_000, 100_000]
+    sample  = 'DATA_24_MagDown_24c2'
+    d_swp   = {
+            'swp_cascade'    : ({'L1' : 211, 'L2' : 211}, {'H' : 321}),
+            'swp_jpsi_misid' : ({'L1' :  13, 'L2' :  13}, {'H' :  13})}
+# ----------------------------------------
+@pytest.fixture(scope='session', autouse=True)
+def _initialize():
+    LogStore.set_level('rx_data:test_calculators', 10)
+    LogStore.set_level('rx_data:swp_calculator'  , 30)
+    LogStore.set_level('rx_data:hop_calculator'  , 30)
+# ----------------------------------------
+@pytest.fixture(scope='module')
+def ana_dir(make_ntuples) -> str:
+    '''
+    Directory with synthetic ntuples, with enough entries for the largest benchmark
+    '''
+    return make_ntuples(nentries=max(Data.l_size))
+# ----------------------------------------
+def _get_rdf(ana_dir : str, nentries : int, trigger : str) -> RDataFrame:
+    d_samp  = ut.load_yaml(f'{ana_dir}/Data/samples/main.yaml')
+    path    = d_samp[Data.sample][trigger][0]
+
+    rdf = RDataFrame('DecayTree', path)
+    rdf = rdf.Range(nentries)
+    msc = MisCalculator(rdf=rdf, trigger=trigger)
+    rdf = msc.get_rdf()
+
+    return rdf
+# ----------------------------------------
+@pytest.mark.parametrize('kind', list(Data.d_swp))
+@pytest.mark.parametrize('size', Data.l_size)
+def test_swp(bench, ana_dir : str, kind : str, size : int):
+    '''
+    Benchmarks calculation of masses with swapped mass hypotheses
+    '''
+    rdf          = _get_rdf(ana_dir, nentries=size, trigger='Hlt2RD_BuToKpEE_MVA')
+    d_lep, d_had = Data.d_swp[kind]
+
+    def _run():
+        obj = SWPCalculator(rdf=rdf, d_lep=d_lep, d_had=d_had)
+        return obj.get_data(preffix=kind)
+
+    bench.measure(f'{kind}_{size}', _run, nitems=size)
+# ----------------------------------------
+@pytest.mark.parametrize('size', Data.l_size)
+def test_hop(bench, ana_dir : str, size : int):
+    '''
+    Benchmarks calculation of HOP variables
+    '''
+    rdf = _get_rdf(ana_dir, nentries=size, trigger='Hlt2RD_BuToKpEE_MVA')
+
+    def _run():
+        obj = HOPCalculator(rdf=rdf)
+        return obj.get_data(preffix='hop')
+
+    bench.measure(f'hop_{size}', _run, nitems=size)
@@ -0,0 +1,69 @@
+'''
+Module used to benchmark the splitting of lists of LFNs into samples and the loading of
+the catalogs of LFNs, with lists of several sizes
+'''
+import glob
+import json
+from importlib.resources   import files
+from functools             import cache
+
+import pytest
+from dmu.logging.log_store import LogStore
+from rx_data.path_splitter import PathSplitter
+from rx_data.lfn_catalog   import LFNCatalog
+
+log=LogStore.add_logger('rx_data:test_catalogs')
+# ----------------------------------------
+class Data:
+    '''
+    Class used to share attributes
+    '''
+    kind   = 'rx'
+    vers   = 'v10'
+    l_size = [1_000, 10_000, -1]
+# ----------------------------------------
+@pytest.fixture(scope='session', autouse=True)
+def _initialize():
+    LogStore.set_level('rx_data:test_catalogs', 10)
+    LogStore.set_level('rx_data:path_splitter', 30)
+    LogStore.set_level('rx_data:lfn_catalog'  , 30)
+# ----------------------------------------
+@cache
+def _get_lfns() -> list[str]:
+    jsn_wc = files('rx_data_lfns').joinpath(f'{Data.kind}/{Data.vers}/*.json')
+    l_lfn  = []
+    for path in sorted(glob.glob(str(jsn_wc))):
+        with open(path, encoding='utf-8') as ifile:
+            l_lfn += json.load(ifile)
+
+    return l_lfn
+# ----------------------------------------
+@pytest.mark.parametrize('size', Data.l_size)
+def test_split(bench, size : int):
+    '''
+    Benchmarks splitting of LFNs into samples and triggers
+    '''
+    l_lfn = _get_lfns()
+    l_lfn = l_lfn if size < 0 else l_lfn[:size]
+    nlfn  = len(l_lfn)
+    name  = 'all' if size < 0 else size
+
+    def _run():
+        spl = PathSplitter(paths=l_lfn)
+        return spl.split()
+
+    bench.measure(f'split_{name}', _run, nitems=nlfn, unit='paths')
+# ----------------------------------------
+@pytest.mark.parametrize('from_json', [True, False])
+def test_catalog(bench, from_json : bool):
+    '''
+    Benchmarks loading the catalog, from the JSON files or the compressed catalog, and querying it
+    '''
+    nlfn = len(_get_lfns())
+    name = 'json' if from_json else 'catalog'
+
+    def _run():
+        ctl = LFNCatalog(kind=Data.kind, vers=Data.vers, from_json=from_json)
+        return ctl.get_lfns(sample='DATA_*', trigger='Hlt2RD_BuToKpEE_MVA')
+
+    bench.measure(f'catalog_{name}', _run, nitems=nlfn, unit='paths')
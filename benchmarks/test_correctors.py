@@ -0,0 +1,87 @@
+'''
+Module used to benchmark the corrections of electrons, MassBiasCorrector for each kind
+of correction and BremBiasCorrector, on synthetic ntuples of several sizes
+'''
+import numpy
+import uproot
+import pytest
+from vector                      import MomentumObject4D as v4d
+from ROOT                        import RDataFrame
+from dmu.logging.log_store       import LogStore
+from rx_data                     import utilities as ut
+from rx_data.mis_calculator      import MisCalculator
+from rx_data.mass_bias_corrector import MassBiasCorrector
+from rx_data.brem_bias_corrector import BremBiasCorrector
+
+log=LogStore.add_logger('rx_data:test_correctors')
+# ----------------------------------------
+class Data:
+    '''
+    Class used to share attributes
+    '''
+    l_size  = [1_000, 10_000]
+    l_kind  = ['ecalo_bias', 'brem_track_1', 'brem_track_2']
+    sample  = 'Bu_JpsiK_ee_eq_DPC'
+    trigger = 'Hlt2RD_BuToKpEE_MVA'
+# ----------------------------------------
+@pytest.fixture(scope='session', autouse=True)
+def _initialize():
+    LogStore.set_level('rx_data:test_correctors'      , 10)
+    LogStore.set_level('rx_data:mass_bias_corrector'  , 30)
+    LogStore.set_level('rx_data:brem_bias_corrector'  , 30)
+# ----------------------------------------
+@pytest.fixture(scope='module')
+def path(make_ntuples) -> str:
+    '''
+    Path to synthetic ntuple, with enough entries for the largest benchmark
+    '''
+    ana_dir = make_ntuples(nentries=max(Data.l_size))
+    d_samp  = ut.load_yaml(f'{ana_dir}/Data/samples/main.yaml')
+
+    return d_samp[Data.sample][Data.trigger][0]
+# ----------------------------------------
+def _get_rdf(path : str, nentries : int) -> RDataFrame:
+    rdf = RDataFrame('DecayTree', path)
+    rdf = rdf.Range(nentries)
+    msc = MisCalculator(rdf=rdf, trigger=Data.trigger)
+    rdf = msc.get_rdf()
+
+    return rdf
+# ----------------------------------------
+@pytest.mark.parametrize('kind', Data.l_kind)
+@pytest.mark.parametrize('size', Data.l_size)
+def test_mass_bias(bench, path : str, kind : str, size : int):
+    '''
+    Benchmarks correction of electrons and recalculation of masses
+    '''
+    rdf = _get_rdf(path, nentries=size)
+
+    def _run():
+        cor = MassBiasCorrector(rdf=rdf, nthreads=1, ecorr_kind=kind)
+        return cor.get_data(suffix=kind)
+
+    bench.measure(f'mass_bias_{kind}_{size}', _run, nitems=size)
+# ----------------------------------------
+@pytest.mark.parametrize('size', Data.l_size)
+def test_brem_bias(bench, path : str, size : int):
+    '''
+    Benchmarks correction of brem photons, one at a time, for electrons with brem
+    '''
+    l_name = ['L1_BREMHYPOENERGY', 'L1_PT', 'L1_ETA', 'L1_PHI', 'L1_BREMHYPOROW', 'L1_BREMHYPOCOL', 'L1_BREMHYPOAREA']
+    with uproot.open(path) as ifile:
+        d_data = ifile['DecayTree'].arrays(l_name, entry_stop=size, library='np')
+
+    mask   = d_data['L1_BREMHYPOENERGY'] > 0
+    d_data = { name : arr[mask] for name, arr in d_data.items() }
+    l_brem = []
+    for energy, pt, eta, phi, row, col, area in zip(*d_data.values()):
+        lep  = v4d(pt=pt, eta=eta, phi=phi, mass=0.511)
+        brem = v4d(px=lep.px, py=lep.py, pz=lep.pz, e=energy)
+        l_brem.append((brem, int(row), int(col), int(area)))
+
+    obj = BremBiasCorrector()
+    def _run():
+        return [ obj.correct(brem=brem, row=row, col=col, area=area) for brem, row, col, area in l_brem ]
+
+    ncand = int(numpy.sum(mask))
+    bench.measure(f'brem_bias_{size}', _run, nitems=ncand)
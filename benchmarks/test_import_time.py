@@ -0,0 +1,90 @@
+'''
+Module used to benchmark the time needed to start the command line scripts.
+
+It runs `python -X importtime` for each entry point in `pyproject.toml`, saves
+the cumulative import times to a JSON file and checks that the lightweight
+scripts do not import ROOT, pandas or vector.
+'''
+import os
+import sys
+import json
+import tomllib
+import subprocess
+
+import pytest
+from dmu.logging.log_store import LogStore
+
+log=LogStore.add_logger('rx_data:test_import_time')
+# ----------------------------------------
+class Data:
+    '''
+    Class used to share attributes
+    '''
+    out_dir     = '/tmp/tests/rx_data/benchmarks/import_time'
+    pyproject   = os.path.join(os.path.dirname(__file__), '..', 'pyproject.toml')
+    l_heavy_mod = ['ROOT', 'pandas', 'vector']
+    # These scripts only manipulate paths and should start quickly
+    l_light_cli = [
+            'list_triggers',
+            'download_rx_data',
+            'copy_samples',
+            'make_tree_structure',
+            'make_lfn_catalog']
+
+    d_time : dict[str,dict] = {}
+# ----------------------------------------
+@pytest.fixture(scope='session', autouse=True)
+def _initialize():
+    LogStore.set_level('rx_data:test_import_time', 10)
+    os.makedirs(Data.out_dir, exist_ok=True)
+
+    yield
+
+    out_path = f'{Data.out_dir}/import_time.json'
+    log.info(f'Saving import times to: {out_path}')
+    with open(out_path, 'w', encoding='utf-8') as ofile:
+        json.dump(Data.d_time, ofile, indent=4, sort_keys=True)
+# ----------------------------------------
+def _get_entry_points() -> dict[str,str]:
+    with open(Data.pyproject, 'rb') as ifile:
+        cfg = tomllib.load(ifile)
+
+    d_script = cfg['project']['scripts']
+
+    return { name : target.split(':')[0] for name, target in d_script.items() }
+# ----------------------------------------
+def _import_time(module : str) -> dict[str,int]:
+    '''
+    Takes name of module, returns dictionary mapping imported modules
+    to their cumulative import time in microseconds
+    '''
+    cmd    = [sys.executable, '-X', 'importtime', '-c', f'import {module}']
+    result = subprocess.run(cmd, capture_output=True, text=True, check=False)
+    if result.returncode != 0:
+        pytest.skip(f'Cannot import {module}:\n{result.stderr[-500:]}')
+
+    d_time = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+
+        _, cumulative, name = line.split('|')
+        d_time[name.strip()] = int(cumulative)
+
+    return d_time
+# ----------------------------------------
+@pytest.mark.parametrize('name, module', _get_entry_points().items())
+def test_entry_point(name : str, module : str):
+    '''
+    Measures import time of script and checks that lightweight scripts do not load heavy modules
+    '''
+    d_time = _import_time(module)
+    total  = d_time[module]
+    l_mod  = [ mod for mod in Data.l_heavy_mod if mod in d_time ]
+
+    log.info(f'{name:<30}{total / 1000:>10.0f} ms {l_mod}')
+    Data.d_time[name] = {'module' : module, 'time_us' : total, 'heavy_modules' : l_mod}
+
+    if name in Data.l_light_cli:
+        assert l_mod == [], f'{name} imports {l_mod}'
+# ----------------------------------------
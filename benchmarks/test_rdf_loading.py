@@ -0,0 +1,50 @@
+'''
+Module used to benchmark the construction of dataframes with friend trees by RDFGetter,
+for synthetic samples with different numbers of files
+'''
+import pytest
+from dmu.logging.log_store import LogStore
+from rx_data.rdf_getter    import RDFGetter
+
+log=LogStore.add_logger('rx_data:test_rdf_loading')
+# ----------------------------------------
+class Data:
+    '''
+    Class used to share attributes
+    '''
+    l_nfile  = [1, 10, 50]
+    nentries = 1_000
+    sample   = 'DATA_24_MagDown_24c2'
+    trigger  = 'Hlt2RD_BuToKpEE_MVA'
+# ----------------------------------------
+@pytest.fixture(scope='session', autouse=True)
+def _initialize():
+    LogStore.set_level('rx_data:test_rdf_loading', 10)
+    LogStore.set_level('rx_data:rdf_getter'           , 30)
+# ----------------------------------------
+@pytest.mark.parametrize('nfile', Data.l_nfile)
+def test_construction(bench, make_ntuples, nfile : int, monkeypatch):
+    '''
+    Benchmarks finding the samples and reading the lists of files
+    '''
+    monkeypatch.setenv('ANADIR', make_ntuples(nentries=Data.nentries, nfiles=nfile))
+
+    def _run():
+        return RDFGetter(sample=Data.sample, trigger=Data.trigger)
+
+    bench.measure(f'construction_{nfile}', _run, nitems=nfile, unit='files')
+# ----------------------------------------
+@pytest.mark.parametrize('nfile', Data.l_nfile)
+def test_per_file(bench, make_ntuples, nfile : int, monkeypatch):
+    '''
+    Benchmarks building one dataframe per file, with friend trees, and reading one column
+    '''
+    monkeypatch.setenv('ANADIR', make_ntuples(nentries=Data.nentries, nfiles=nfile))
+
+    def _run():
+        gtr   = RDFGetter(sample=Data.sample, trigger=Data.trigger)
+        d_rdf = gtr.get_rdf(per_file=True)
+
+        return [ rdf.Sum('mva_cmb').GetValue() for rdf in d_rdf.values() ]
+
+    bench.measure(f'per_file_{nfile}', _run, nitems=nfile * Data.nentries)
@@ -0,0 +1,108 @@
+'''
+Module used to benchmark reading and writing of YAML files with lists of samples.
+
+It makes a synthetic list of samples with 60k paths, writes it and reads it with
+the pure Python and the LibYAML based implementations, saves the times to a JSON file
+and checks that the ones used by the project are faster.
+'''
+import os
+import json
+import time
+from typing import Callable
+
+import yaml
+import pytest
+from dmu.logging.log_store import LogStore
+from rx_data               import utilities as ut
+
+log=LogStore.add_logger('rx_data:test_yaml_io')
+# ----------------------------------------
+class Data:
+    '''
+    Class used to share attributes
+    '''
+    out_dir   = '/tmp/tests/rx_data/benchmarks/yaml_io'
+    grid_dir  = 'root://x509up_u12477@eoslhcb.cern.ch//eos/lhcb/grid/user/lhcb/user/a/acampove/2025_01'
+    nsample   = 100
+    ntrigger  = 20
+    nfile     = 30
+
+    d_time : dict[str,float] = {}
+# ----------------------------------------
+@pytest.fixture(scope='session', autouse=True)
+def _initialize():
+    LogStore.set_level('rx_data:test_yaml_io', 10)
+    os.makedirs(Data.out_dir, exist_ok=True)
+
+    yield
+
+    out_path = f'{Data.out_dir}/yaml_io.json'
+    log.info(f'Saving times to: {out_path}')
+    with open(out_path, 'w', encoding='utf-8') as ofile:
+        json.dump(Data.d_time, ofile, indent=4, sort_keys=True)
+# ----------------------------------------
+@pytest.fixture(scope='module')
+def _samples() -> dict[str,dict[str,list[str]]]:
+    '''
+    Returns synthetic list of samples with nsample x ntrigger x nfile paths
+    '''
+    d_struc = {}
+    for isample in range(Data.nsample):
+        sample = f'mc_24_w31_34_magup_sim10d_{11100000 + isample}_bd_kstee_eq_btosllball05_dpc'
+        d_struc[sample] = {}
+        for itrigger in range(Data.ntrigger):
+            trigger = f'Hlt2RD_BuToKpEE_MVA_{itrigger:02}'
+            d_struc[sample][trigger] = [ f'{Data.grid_dir}/{ifile:03}/{sample}_{trigger}_{ifile:010x}.root' for ifile in range(Data.nfile) ]
+
+    return d_struc
+# ----------------------------------------
+def _measure(name : str, fun : Callable) -> float:
+    start = time.perf_counter()
+    fun()
+    value = time.perf_counter() - start
+
+    log.info(f'{name:<20}{value:>10.3f} s')
+    Data.d_time[name] = value
+
+    return value
+# ----------------------------------------
+def test_dump(_samples : dict, tmp_path):
+    '''
+    Compares the writer used by the project with the pure Python dumper
+    '''
+    def _dump_python():
+        with open(f'{tmp_path}/python.yaml', 'w', encoding='utf-8') as ofile:
+            yaml.dump(_samples, ofile, Dumper=ut.IndentListDumper, default_flow_style=False)
+
+    t_python = _measure('dump_python' , _dump_python)
+    t_stream = _measure('dump_samples', lambda : ut.dump_samples(_samples, f'{tmp_path}/stream.yaml'))
+
+    with open(f'{tmp_path}/python.yaml', encoding='utf-8') as ifile:
+        python_text = ifile.read()
+
+    with open(f'{tmp_path}/stream.yaml', encoding='utf-8') as ifile:
+        stream_text = ifile.read()
+
+    assert python_text == stream_text
+    assert t_stream < t_python
+# ----------------------------------------
+def test_load(_samples : dict, tmp_path):
+    '''
+    Compares the loader used by the project with the pure Python one
+    '''
+    yaml_path = f'{tmp_path}/samples.yaml'
+    ut.dump_samples(_samples, yaml_path)
+
+    def _load_python():
+        with open(yaml_path, encoding='utf-8') as ifile:
+            return yaml.safe_load(ifile)
+
+    t_python = _measure('load_python', _load_python)
+    t_loader = _measure('load_yaml'  , lambda : ut.load_yaml(yaml_path))
+
+    assert ut.load_yaml(yaml_path) == _samples
+    if ut.Data.yaml_loader is yaml.SafeLoader:
+        pytest.skip('PyYAML was built without LibYAML')
+
+    assert t_loader < t_python
+# ----------------------------------------
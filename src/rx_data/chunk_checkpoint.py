@@ -0,0 +1,229 @@
+'''
+Module containing ChunkCheckpoint class
+'''
+import os
+import glob
+import json
+import shutil
+import hashlib
+from typing                import Union
+
+import numpy
+import uproot
+from dmu.logging.log_store import LogStore
+from rx_data.column_writer import ColumnWriter
+
+log = LogStore.add_logger('rx_data:chunk_checkpoint')
+# ------------------------------------------
+class ChunkCheckpoint:
+    '''
+    Class meant to keep the chunks of an output file, as they are finished, such that a job that
+    was stopped can continue from the first missing chunk. The chunks are stored as:
+
+    /path/to/output.root.chunks/00000.root
+    /path/to/output.root.chunks/00001.root
+    ...
+    /path/to/output.root.chunks/checkpoint.json
+
+    where the JSON file has, for each chunk, the range of entries and a hash of the file.
+    When all the chunks are done, they are merged into the output, which is written atomically.
+    Usage:
+
+    ckp = ChunkCheckpoint(out_path='/path/to/output.root', config={'input' : path, 'chunk_size' : 1000})
+    for ichunk, (start, stop) in enumerate(l_range):
+        if ichunk < ckp.ndone:
+            continue
+
+        with ColumnWriter(path=ckp.get_chunk_path(ichunk)) as wrt:
+            wrt.write(d_data)
+
+        ckp.add(ichunk, start, stop)
+
+    ckp.merge()
+    '''
+    checkpoint_name = 'checkpoint.json'
+    # ------------------------------------------
+    def __init__(
+            self,
+            out_path    : str,
+            config      : dict,
+            tree        : str             = 'DecayTree',
+            fmt         : str             = 'root',
+            compression : Union[str,None] = None,
+            basket_size : Union[int,None] = None):
+        '''
+        out_path   : Path to final output
+        config     : Dictionary with everything that, if changed, makes the chunks unusable, e.g. input file and chunk size
+        tree, fmt, compression, basket_size : Used to write the output, see `ColumnWriter`
+        '''
+        self._out_path    = out_path
+        # Round trip makes it comparable with the one loaded, e.g. tuples become lists
+        self._config      = json.loads(json.dumps(config))
+        self._tree        = tree
+        self._fmt         = fmt
+        self._compression = compression
+        self._basket_size = basket_size
+
+        self._chunk_dir   = f'{out_path}.chunks'
+        self._ckp_path    = f'{self._chunk_dir}/{ChunkCheckpoint.checkpoint_name}'
+        self._l_chunk     = self._load()
+    # ------------------------------------------
+    @property
+    def ndone(self) -> int:
+        '''
+        Number of chunks, from the first one, that are finished and can be reused
+        '''
+        return len(self._l_chunk)
+    # ------------------------------------------
+    def get_chunk_path(self, index : int) -> str:
+        '''
+        Returns path where the chunk with a given index has to be written
+        '''
+        os.makedirs(self._chunk_dir, exist_ok=True)
+
+        return f'{self._chunk_dir}/{index:05}.{self._fmt}'
+    # ------------------------------------------
+    @staticmethod
+    def _get_hash(path : str) -> str:
+        '''
+        Returns hash of file, the file is synced to disk first
+        '''
+        hsh = hashlib.sha256()
+        with open(path, 'rb') as ifile:
+            os.fsync(ifile.fileno())
+            for block in iter(lambda : ifile.read(1024 ** 2), b''):
+                hsh.update(block)
+
+        return hsh.hexdigest()
+    # ------------------------------------------
+    def _is_valid(self, index : int, d_chunk : dict) -> bool:
+        path = self.get_chunk_path(index)
+        if d_chunk['index'] != index:
+            log.warning(f'Expected chunk {index}, found {d_chunk["index"]}')
+            return False
+
+        if not os.path.isfile(path):
+            log.warning(f'Missing chunk: {path}')
+            return False
+
+        if ChunkCheckpoint._get_hash(path) != d_chunk['hash']:
+            log.warning(f'Hash does not match for chunk: {path}')
+            return False
+
+        return True
+    # ------------------------------------------
+    def _load(self) -> list[dict]:
+        '''
+        Returns list of chunks that can be reused, from the first one up to the first missing or corrupted one.
+        Everything else in the directory with chunks is removed
+        '''
+        if not os.path.isfile(self._ckp_path):
+            self._clean()
+            return []
+
+        with open(self._ckp_path, encoding='utf-8') as ifile:
+            d_ckp = json.load(ifile)
+
+        if d_ckp['config'] != self._config:
+            log.warning(f'Configuration changed, not reusing chunks in: {self._chunk_dir}')
+            self._clean()
+            return []
+
+        l_chunk = []
+        for index, d_chunk in enumerate(d_ckp['chunks']):
+            if not self._is_valid(index, d_chunk):
+                break
+
+            l_chunk.append(d_chunk)
+
+        # Chunks after the first missing one, and temporary files from a stopped job, are not used
+        s_keep = { self.get_chunk_path(index) for index in range(len(l_chunk)) } | {self._ckp_path}
+        for path in glob.glob(f'{self._chunk_dir}/*'):
+            if path not in s_keep:
+                log.debug(f'Removing: {path}')
+                os.remove(path)
+
+        nchunk = len(l_chunk)
+        log.info(f'Resuming after {nchunk} finished chunk(s) in: {self._chunk_dir}')
+
+        return l_chunk
+    # ------------------------------------------
+    def _clean(self) -> None:
+        if os.path.isdir(self._chunk_dir):
+            log.debug(f'Removing: {self._chunk_dir}')
+            shutil.rmtree(self._chunk_dir)
+    # ------------------------------------------
+    @staticmethod
+    def remove_stale(out_path : str) -> None:
+        '''
+        Removes chunks of an output that already exists, left by a job stopped after the merge, but before they were removed
+        '''
+        if not os.path.isfile(out_path):
+            raise FileNotFoundError(f'Output not found, chunks might still be needed: {out_path}')
+
+        chunk_dir = f'{out_path}.chunks'
+        if os.path.isdir(chunk_dir):
+            log.warning(f'Removing stale chunks: {chunk_dir}')
+            shutil.rmtree(chunk_dir)
+    # ------------------------------------------
+    def _save(self) -> None:
+        '''
+        Writes checkpoint to temporary file, which is synced to disk and renamed
+        '''
+        tmp_path = f'{self._ckp_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as ofile:
+            json.dump({'config' : self._config, 'chunks' : self._l_chunk}, ofile, indent=4)
+            ofile.flush()
+            os.fsync(ofile.fileno())
+
+        os.replace(tmp_path, self._ckp_path)
+
+        fd = os.open(self._chunk_dir, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    # ------------------------------------------
+    def add(self, index : int, start : int, stop : int) -> None:
+        '''
+        Records chunk with given index, holding entries in [start, stop), as finished.
+        Chunks need to be added in order
+        '''
+        if index != self.ndone:
+            raise ValueError(f'Expected chunk {self.ndone}, found {index}')
+
+        path = self.get_chunk_path(index)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f'Cannot find chunk: {path}')
+
+        self._l_chunk.append({'index' : index, 'start' : start, 'stop' : stop, 'hash' : ChunkCheckpoint._get_hash(path)})
+        self._save()
+    # ------------------------------------------
+    def _read_chunk(self, path : str) -> dict[str,numpy.ndarray]:
+        if self._fmt == 'parquet':
+            import pyarrow.parquet as pq
+
+            table = pq.read_table(path)
+            return { name : table.column(name).to_numpy() for name in table.column_names }
+
+        with uproot.open(path) as ifile:
+            return ifile[self._tree].arrays(library='np')
+    # ------------------------------------------
+    def merge(self) -> None:
+        '''
+        Merges chunks into output, which appears only when it is complete, then removes chunks
+        '''
+        nchunk = self.ndone
+        if nchunk == 0:
+            raise ValueError(f'No chunk found in: {self._chunk_dir}')
+
+        if nchunk == 1:
+            # Single chunk is already the output, written with the same settings
+            os.replace(self.get_chunk_path(0), self._out_path)
+        else:
+            log.info(f'Merging {nchunk} chunks into: {self._out_path}')
+            with ColumnWriter(path=self._out_path, tree=self._tree, fmt=self._fmt, compression=self._compression, basket_size=self._basket_size) as wrt:
+                for index in range(nchunk):
+                    wrt.write(self._read_chunk(self.get_chunk_path(index)))
+
+        self._clean()
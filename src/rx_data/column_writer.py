@@ -0,0 +1,153 @@
+'''
+Module containing ColumnWriter class
+'''
+import os
+from typing                import Union
+
+import numpy
+import uproot
+from dmu.logging.log_store import LogStore
+
+log = LogStore.add_logger('rx_data:column_writer')
+# ------------------------------------------
+class ColumnWriter:
+    '''
+    Class meant to write dictionaries of arrays, e.g. made by the calculators, chunk by chunk,
+    without building ROOT dataframes. Supports:
+
+    - ROOT files, written with uproot, with a given compression and number of entries per basket
+    - Parquet files, written with pyarrow, with one row group per chunk
+
+    The output is first written to a temporary file, which is renamed when the writer is closed.
+    Usage:
+
+    with ColumnWriter(path='/some/file.root', tree='DecayTree', compression='zstd:5') as wrt:
+        for d_data in l_chunk:
+            wrt.write(d_data)
+    '''
+    d_compression = {'zlib' : uproot.ZLIB, 'lzma' : uproot.LZMA, 'lz4' : uproot.LZ4, 'zstd' : uproot.ZSTD}
+    # Same default levels as in ROOT
+    d_level       = {'zlib' : 1, 'lzma' : 7, 'lz4' : 4, 'zstd' : 5}
+    l_format      = ['root', 'parquet']
+    # ------------------------------------------
+    def __init__(
+            self,
+            path        : str,
+            tree        : str                   = 'DecayTree',
+            fmt         : str                   = 'root',
+            compression : Union[str,None]       = None,
+            basket_size : Union[int,None]       = None):
+        '''
+        path       : Path to output file
+        tree       : Name of tree, used only for ROOT files
+        fmt        : Format of output, root or parquet
+        compression: Algorithm and level, e.g. zstd:5 or lz4, by default ZLIB:1 for ROOT and snappy for Parquet
+        basket_size: Maximum number of entries per basket (ROOT) or row group (Parquet), by default, one per chunk
+        '''
+        if fmt not in ColumnWriter.l_format:
+            raise ValueError(f'Invalid format {fmt}, expected one of: {ColumnWriter.l_format}')
+
+        self._path        = path
+        self._tmp_path    = f'{path}.{os.getpid()}.tmp'
+        self._tree        = tree
+        self._fmt         = fmt
+        self._compression = compression
+        self._basket_size = basket_size
+
+        self._ofile       = None
+        self._otree       = None
+        self._nentries    = 0
+    # ------------------------------------------
+    def _get_compression(self) -> tuple[Union[str,None],Union[int,None]]:
+        if self._compression is None:
+            return None, None
+
+        algorithm, _, level = self._compression.partition(':')
+        algorithm = algorithm.lower()
+        if self._fmt == 'root' and algorithm not in ColumnWriter.d_compression:
+            raise ValueError(f'Invalid compression {algorithm}, expected one of: {list(ColumnWriter.d_compression)}')
+
+        level = None if level == '' else int(level)
+
+        return algorithm, level
+    # ------------------------------------------
+    def _open_root(self, d_data : dict[str,numpy.ndarray]) -> None:
+        algorithm, level = self._get_compression()
+        algorithm   = 'zlib' if algorithm is None else algorithm
+        level       = ColumnWriter.d_level[algorithm] if level is None else level
+        compression = ColumnWriter.d_compression[algorithm](level)
+
+        self._ofile = uproot.recreate(self._tmp_path, compression=compression)
+        self._otree = self._ofile.mktree(self._tree, { name : arr.dtype for name, arr in d_data.items() })
+    # ------------------------------------------
+    def _open_parquet(self, table) -> None:
+        import pyarrow.parquet as pq
+
+        algorithm, level = self._get_compression()
+        algorithm        = 'snappy' if algorithm is None else algorithm
+
+        self._ofile = pq.ParquetWriter(self._tmp_path, table.schema, compression=algorithm, compression_level=level)
+    # ------------------------------------------
+    def _write_root(self, d_data : dict[str,numpy.ndarray], nentries : int) -> None:
+        if self._otree is None:
+            self._open_root(d_data)
+
+        step = nentries if self._basket_size is None else self._basket_size
+        for start in range(0, nentries, max(step, 1)):
+            self._otree.extend({ name : arr[start:start + step] for name, arr in d_data.items() })
+    # ------------------------------------------
+    def _write_parquet(self, d_data : dict[str,numpy.ndarray]) -> None:
+        import pyarrow as pa
+
+        table = pa.table(d_data)
+        if self._ofile is None:
+            self._open_parquet(table)
+
+        self._ofile.write_table(table, row_group_size=self._basket_size)
+    # ------------------------------------------
+    def write(self, d_data : dict[str,numpy.ndarray]) -> None:
+        '''
+        Appends chunk to output, all the chunks need to have the same columns and types
+        '''
+        l_size = [ len(arr) for arr in d_data.values() ]
+        if len(set(l_size)) > 1:
+            raise ValueError(f'Columns have different sizes: {l_size}')
+
+        nentries = l_size[0] if len(l_size) > 0 else 0
+        d_data   = { name : numpy.ascontiguousarray(arr) for name, arr in d_data.items() }
+        if self._fmt == 'root':
+            self._write_root(d_data, nentries)
+        else:
+            self._write_parquet(d_data)
+
+        self._nentries += nentries
+        log.debug(f'Written {nentries} entries, {self._nentries} in total')
+    # ------------------------------------------
+    def close(self) -> None:
+        '''
+        Closes output and moves it to final path
+        '''
+        if self._ofile is None:
+            raise ValueError(f'Nothing was written to: {self._path}')
+
+        self._ofile.close()
+        os.replace(self._tmp_path, self._path)
+        log.debug(f'Saved: {self._path}')
+    # ------------------------------------------
+    def _abort(self) -> None:
+        if self._ofile is not None:
+            self._ofile.close()
+
+        if os.path.isfile(self._tmp_path):
+            os.remove(self._tmp_path)
+    # ------------------------------------------
+    def __enter__(self):
+        return self
+    # ------------------------------------------
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is not None:
+            self._abort()
+            return
+
+        self.close()
+# ------------------------------------------
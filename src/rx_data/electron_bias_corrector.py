@@ -28,7 +28,11 @@ class ElectronBiasCorrector:
         - For electrons with brem: Do nothing
         - For electrons without brem: If `BREMTRACKBASEDENERGY > 50 MeV` add brem, otherwise do nothing.
         - Optionally, rescale energy of electron based on measurement of "mu" through the momentum closure.
+
+    The regressor used to rescale the energy is loaded once and shared by all the instances, if it is loaded,
+    with `load_corrector`, before forking, it will also be shared by the child processes.
     '''
+    d_corrector : dict[str,Corrector] = {}
     # ---------------------------------
     def __init__(self, skip_correction : bool = False, brem_energy_threshold : float = 300):
         '''
@@ -142,17 +146,28 @@ class ElectronBiasCorrector:
 
         raise ValueError(f'Cannot find attribute {name} among:')
     # ---------------------------------
-    def _get_corrector(self) -> Corrector:
-        if hasattr(self, '_corrector'):
-            return self._corrector
-
+    @staticmethod
+    def load_corrector() -> Corrector:
+        '''
+        Returns regressor used to scale electrons, it is loaded only once per process
+        '''
         config_path = files('rx_data_data').joinpath('calibration/ecal.yaml')
         config_path = str(config_path)
+        if config_path in ElectronBiasCorrector.d_corrector:
+            return ElectronBiasCorrector.d_corrector[config_path]
 
         log.info(f'Loading config for calibration: {config_path}')
         cfg         = gut.load_json(config_path)
 
-        self._corrector = Corrector(cfg=cfg)
+        ElectronBiasCorrector.d_corrector[config_path] = Corrector(cfg=cfg)
+
+        return ElectronBiasCorrector.d_corrector[config_path]
+    # ---------------------------------
+    def _get_corrector(self) -> Corrector:
+        if hasattr(self, '_corrector'):
+            return self._corrector
+
+        self._corrector = ElectronBiasCorrector.load_corrector()
 
         return self._corrector
     # ---------------------------------
@@ -0,0 +1,125 @@
+'''
+Module containing FileCache class
+'''
+import os
+import json
+from typing import Any, Union
+
+from dmu.logging.log_store import LogStore
+
+log = LogStore.add_logger('rx_data:file_cache')
+# ------------------------------------------
+class FileCache:
+    '''
+    Class meant to store, in a JSON file, values calculated from files, e.g. number of entries.
+
+    Values are keyed by the identity of the file, i.e. (real path, size, modification time), such
+    that a value is only returned if the file did not change since the value was stored.
+    Files that cannot be accessed through the local filesystem, e.g. PFNs, are never cached.
+    '''
+    # ------------------------------------------
+    def __init__(self, path : str):
+        '''
+        path: Path to JSON file where the cache is stored, it will be created if it does not exist
+        '''
+        self._path    = path
+        self._d_entry = self._load()
+        self._nchange = 0
+    # ------------------------------------------
+    def _load(self) -> dict[str,dict]:
+        if not os.path.isfile(self._path):
+            log.debug(f'Cache not found, starting new one: {self._path}')
+            return {}
+
+        try:
+            with open(self._path, encoding='utf-8') as ifile:
+                d_entry = json.load(ifile)
+        except json.JSONDecodeError:
+            log.warning(f'Cannot read cache, starting new one: {self._path}')
+            return {}
+
+        nentry = len(d_entry)
+        log.debug(f'Loaded {nentry} entries from: {self._path}')
+
+        return d_entry
+    # ------------------------------------------
+    @staticmethod
+    def identity(path : str) -> Union[tuple[str,int,int], None]:
+        '''
+        Takes path to file, returns tuple with real path, size in bytes and
+        modification time in nanoseconds. If the file cannot be accessed, returns None
+        '''
+        if '://' in path:
+            return None
+
+        real_path = os.path.realpath(path)
+        try:
+            stat = os.stat(real_path)
+        except OSError:
+            return None
+
+        return real_path, stat.st_size, stat.st_mtime_ns
+    # ------------------------------------------
+    def get(self, path : str, identity : Union[tuple[str,int,int],None] = None) -> Any:
+        '''
+        Parameters
+        ---------------
+        path    : Path to file
+        identity: Identity of file as returned by `identity`, if not passed it will be calculated
+
+        Returns
+        ---------------
+        Value stored for file, None if nothing was stored or the file changed
+        '''
+        identity = FileCache.identity(path) if identity is None else identity
+        if identity is None:
+            return None
+
+        real_path, size, mtime = identity
+        entry = self._d_entry.get(real_path)
+        if entry is None:
+            return None
+
+        if entry['size'] != size or entry['mtime'] != mtime:
+            log.debug(f'File changed, ignoring cached value for: {real_path}')
+            return None
+
+        return entry['value']
+    # ------------------------------------------
+    def set(self, path : str, value : Any, identity : Union[tuple[str,int,int],None] = None) -> None:
+        '''
+        Stores value for file, value has to be JSON serializable.
+        Files that cannot be accessed are ignored
+        '''
+        identity = FileCache.identity(path) if identity is None else identity
+        if identity is None:
+            log.debug(f'Cannot access file, not caching: {path}')
+            return
+
+        real_path, size, mtime = identity
+        self._d_entry[real_path] = {'size' : size, 'mtime' : mtime, 'value' : value}
+        self._nchange += 1
+    # ------------------------------------------
+    def save(self) -> None:
+        '''
+        Writes cache to JSON file, if anything changed
+        '''
+        if self._nchange == 0:
+            log.debug('Cache did not change, not saving it')
+            return
+
+        cache_dir = os.path.dirname(self._path)
+        if cache_dir != '':
+            os.makedirs(cache_dir, exist_ok=True)
+
+        tmp_path = f'{self._path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as ofile:
+            json.dump(self._d_entry, ofile)
+
+        os.replace(tmp_path, self._path)
+        log.debug(f'Saved {self._nchange} new entries to: {self._path}')
+        self._nchange = 0
+    # ------------------------------------------
+    def __len__(self) -> int:
+        return len(self._d_entry)
+# ------------------------------------------
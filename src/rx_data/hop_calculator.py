@@ -104,18 +104,24 @@ class HOPCalculator:
 
         return d_data
     # -------------------------------
-    def get_rdf(self, preffix : str) -> RDataFrame:
+    def get_data(self, preffix : str) -> dict[str,numpy.ndarray]:
         '''
-        Returns ROOT dataframe with HOP variables
+        Returns dictionary with HOP variables, as well as run and event numbers, as arrays
         '''
-
         l_alpha, l_mass = self._get_values()
         arr_alpha       = numpy.array(l_alpha)
         arr_mass        = numpy.array(l_mass )
         d_data          = {f'{preffix}_alpha' : arr_alpha, f'{preffix}_mass' : arr_mass}
         d_data          = self._attach_extra_branches(d_data)
 
-        rdf = RDF.FromNumpy(d_data)
+        return d_data
+    # -------------------------------
+    def get_rdf(self, preffix : str) -> RDataFrame:
+        '''
+        Returns ROOT dataframe with HOP variables
+        '''
+        d_data = self.get_data(preffix=preffix)
+        rdf    = RDF.FromNumpy(d_data)
 
         return rdf
 # -------------------------------
@@ -0,0 +1,354 @@
+'''
+Module containing LFNCatalog class
+'''
+import os
+import re
+import glob
+import gzip
+import json
+import hashlib
+import random
+import fnmatch
+from typing              import Union
+from importlib.resources import files
+
+from dmu.logging.log_store import LogStore
+from rx_data               import utilities as ut
+
+log = LogStore.add_logger('rx_data:lfn_catalog')
+# ------------------------------------------
+class LFNCatalog:
+    '''
+    Class meant to provide access to the LFNs shipped with the project, i.e. in
+
+    rx_data_lfns/KIND/VERSION/*.json
+
+    The LFNs, together with the information extracted from their file names, are stored
+    in a gzipped columnar file, `catalog.json.gz`, next to the JSON files. If this file
+    does not exist, or was made from JSON files different from the current ones, the
+    catalog is built on the fly from the JSON files.
+
+    The columns are:
+
+    lfn       : Logical file name
+    sample    : Sample, as found in the file name, e.g. data_24_magup_24c1
+    trigger   : HLT2 trigger
+    polarity  : magup or magdown
+    event_type: Event type for MC, None for data
+    '''
+    catalog_name = 'catalog.json.gz'
+    l_category   = ['sample', 'trigger', 'polarity', 'event_type']
+
+    pol_rgx      = r'_(magup|magdown)_'
+    evt_rgx      = r'^mc_.*?_(\d{8})_'
+    # ------------------------------------------
+    def __init__(self, kind : str, vers : str, from_json : bool = False):
+        '''
+        kind     : Type of production, e.g. rx
+        vers     : Version of LFNs, e.g. v10
+        from_json: If True, will ignore the compressed catalog and build it from the JSON files, default False
+        '''
+        self._kind      = kind
+        self._vers      = vers
+        self._from_json = from_json
+        self._lfn_dir   = str(files('rx_data_lfns').joinpath(f'{kind}/{vers}'))
+
+        self._d_column: dict[str,list]
+        self._d_index : dict[tuple[str,str],list[int]] = {}
+
+        self._load()
+    # ------------------------------------------
+    @property
+    def catalog_path(self) -> str:
+        '''
+        Path to compressed file where catalog is or would be stored
+        '''
+        return f'{self._lfn_dir}/{LFNCatalog.catalog_name}'
+    # ------------------------------------------
+    def _load(self) -> None:
+        if self._from_json:
+            log.debug(f'Building catalog from JSON files in: {self._lfn_dir}')
+            self._d_column = LFNCatalog._columns_from_lfns(self._read_lfns())
+            return
+
+        if not os.path.isfile(self.catalog_path):
+            log.warning(f'Catalog not found, building it from JSON files, run make_lfn_catalog to avoid this: {self.catalog_path}')
+            self._d_column = LFNCatalog._columns_from_lfns(self._read_lfns())
+            return
+
+        log.debug(f'Loading catalog from: {self.catalog_path}')
+        with gzip.open(self.catalog_path, 'rt', encoding='utf-8') as ifile:
+            d_data = json.load(ifile)
+
+        if d_data.get('hash') != self._get_hash():
+            log.warning(f'Catalog is outdated, building it from JSON files, run make_lfn_catalog to avoid this: {self.catalog_path}')
+            self._d_column = LFNCatalog._columns_from_lfns(self._read_lfns())
+            return
+
+        self._d_column = LFNCatalog._decode(d_data)
+    # ------------------------------------------
+    def _get_json_paths(self) -> list[str]:
+        json_wc = f'{self._lfn_dir}/*.json'
+        l_json  = glob.glob(json_wc)
+        if len(l_json) == 0:
+            raise FileNotFoundError(f'No files found in: {json_wc}')
+
+        return sorted(l_json)
+    # ------------------------------------------
+    def _get_hash(self) -> str:
+        '''
+        Returns hash of names and contents of JSON files, used to check that catalog was made from them
+        '''
+        hsh = hashlib.sha256()
+        for json_path in self._get_json_paths():
+            hsh.update(os.path.basename(json_path).encode('utf-8'))
+            with open(json_path, 'rb') as ifile:
+                hsh.update(ifile.read())
+
+        return hsh.hexdigest()
+    # ------------------------------------------
+    def _read_lfns(self) -> list[str]:
+        json_wc = f'{self._lfn_dir}/*.json'
+        l_lfn   = []
+        for json_path in self._get_json_paths():
+            with open(json_path, encoding='utf-8') as ifile:
+                l_lfn += json.load(ifile)
+
+        nlfn = len(l_lfn)
+        log.debug(f'Read {nlfn} LFNs from {json_wc}')
+
+        return l_lfn
+    # ------------------------------------------
+    @staticmethod
+    def _columns_from_lfns(l_lfn : list[str]) -> dict[str,list]:
+        d_column = {'lfn' : []}
+        d_column.update({ name : [] for name in LFNCatalog.l_category })
+
+        d_info = ut.info_from_paths(l_lfn, raise_on_fail=False)
+        d_column['lfn'    ] = list(l_lfn)
+        d_column['sample' ] = d_info['sample']
+        d_column['trigger'] = d_info['line']
+
+        for lfn in l_lfn:
+            name = os.path.basename(lfn)
+            d_column['polarity'  ].append(LFNCatalog._search(LFNCatalog.pol_rgx, name))
+            d_column['event_type'].append(LFNCatalog._search(LFNCatalog.evt_rgx, name))
+
+        nbad = d_column['sample'].count(None)
+        if nbad != 0:
+            log.warning(f'Could not extract sample and trigger from {nbad} LFNs')
+
+        return d_column
+    # ------------------------------------------
+    @staticmethod
+    def _search(regex : str, name : str) -> Union[str,None]:
+        mtch = re.search(regex, name)
+        if not mtch:
+            return None
+
+        return mtch.group(1)
+    # ------------------------------------------
+    @staticmethod
+    def _encode(d_column : dict[str,list]) -> dict:
+        '''
+        Takes dictionary with columns, returns dictionary where
+        categorical columns are stored as list of values and list of codes
+        '''
+        d_data = {'nrows' : len(d_column['lfn']), 'columns' : {}}
+        for name, l_val in d_column.items():
+            if name not in LFNCatalog.l_category:
+                d_data['columns'][name] = l_val
+                continue
+
+            l_value = sorted(set(l_val), key=lambda val : '' if val is None else val)
+            d_code  = { value : code for code, value in enumerate(l_value) }
+            l_code  = [ d_code[val] for val in l_val ]
+
+            d_data['columns'][name] = {'values' : l_value, 'codes' : l_code}
+
+        return d_data
+    # ------------------------------------------
+    @staticmethod
+    def _decode(d_data : dict) -> dict[str,list]:
+        d_column = {}
+        for name, column in d_data['columns'].items():
+            if name not in LFNCatalog.l_category:
+                d_column[name] = column
+                continue
+
+            l_value = column['values']
+            d_column[name] = [ l_value[code] for code in column['codes'] ]
+
+        nrows = d_data['nrows']
+        for name, l_val in d_column.items():
+            if len(l_val) != nrows:
+                raise ValueError(f'Column {name} has {len(l_val)} entries, expected {nrows}')
+
+        return d_column
+    # ------------------------------------------
+    def _get_index(self) -> dict[tuple[str,str],list[int]]:
+        if len(self._d_index) != 0:
+            return self._d_index
+
+        l_sample  = self._d_column['sample']
+        l_trigger = self._d_column['trigger']
+        for irow, key in enumerate(zip(l_sample, l_trigger)):
+            if key not in self._d_index:
+                self._d_index[key] = []
+
+            self._d_index[key].append(irow)
+
+        return self._d_index
+    # ------------------------------------------
+    def save(self) -> str:
+        '''
+        Writes catalog to `catalog.json.gz` in directory with JSON files
+        Returns path to catalog
+        '''
+        d_data = LFNCatalog._encode(self._d_column)
+        d_data['hash'] = self._get_hash()
+
+        log.info(f'Saving catalog to: {self.catalog_path}')
+        with gzip.open(self.catalog_path, 'wt', encoding='utf-8') as ofile:
+            json.dump(d_data, ofile, separators=(',', ':'))
+
+        return self.catalog_path
+    # ------------------------------------------
+    @staticmethod
+    def build(kind : str, vers : str) -> str:
+        '''
+        Builds catalog from the JSON files for a given kind and version, saves it
+        and returns path to it
+        '''
+        ctl = LFNCatalog(kind=kind, vers=vers, from_json=True)
+
+        return ctl.save()
+    # ------------------------------------------
+    def get_column(self, name : str) -> list:
+        '''
+        Returns copy of column, e.g. lfn, sample, trigger
+        '''
+        if name not in self._d_column:
+            raise ValueError(f'Invalid column {name}, use one of: {list(self._d_column)}')
+
+        return list(self._d_column[name])
+    # ------------------------------------------
+    @staticmethod
+    def _match_any(value : str, l_pattern : list[str]) -> bool:
+        return any(fnmatch.fnmatch(value, pattern) for pattern in l_pattern)
+    # ------------------------------------------
+    def get_strata(
+            self,
+            samples  : Union[list[str],None] = None,
+            triggers : Union[list[str],None] = None) -> dict[tuple[str,str],list[int]]:
+        '''
+        Parameters
+        ----------------
+        samples : List of sample names, accepts wildcards, e.g. data_24_magup_*. By default all samples
+        triggers: List of HLT2 triggers, accepts wildcards. By default all triggers
+
+        Returns
+        ----------------
+        Dictionary mapping (sample, trigger) to list of indices of rows in catalog.
+        LFNs whose sample or trigger could not be extracted are never returned.
+        '''
+        l_sample  = ['*'] if samples  is None else samples
+        l_trigger = ['*'] if triggers is None else triggers
+
+        d_stratum = {}
+        for (sample, trigger), l_index in self._get_index().items():
+            if sample is None or trigger is None:
+                continue
+
+            if not LFNCatalog._match_any(sample , l_sample):
+                continue
+
+            if not LFNCatalog._match_any(trigger, l_trigger):
+                continue
+
+            d_stratum[(sample, trigger)] = l_index
+
+        return dict(sorted(d_stratum.items()))
+    # ------------------------------------------
+    def get_rows(self, sample : str = '*', trigger : str = '*') -> list[int]:
+        '''
+        Parameters
+        ----------------
+        sample : Sample name, accepts wildcards, e.g. data_24_magup_*
+        trigger: HLT2 trigger, accepts wildcards
+
+        Returns
+        ----------------
+        Sorted list of indices of rows, whose sample and trigger match
+        '''
+        d_stratum = self.get_strata(samples=[sample], triggers=[trigger])
+
+        l_row = []
+        for l_index in d_stratum.values():
+            l_row += l_index
+
+        return sorted(l_row)
+    # ------------------------------------------
+    def get_lfns(self, sample : str = '*', trigger : str = '*') -> list[str]:
+        '''
+        Returns list of LFNs whose sample and trigger match the arguments, see `get_rows`
+        '''
+        l_lfn = self._d_column['lfn']
+
+        return [ l_lfn[irow] for irow in self.get_rows(sample=sample, trigger=trigger) ]
+    # ------------------------------------------
+    def query(
+            self,
+            samples   : Union[list[str],None] = None,
+            triggers  : Union[list[str],None] = None,
+            nfile     : int                   = -1,
+            randomize : bool                  = False,
+            seed      : Union[int,None]       = None) -> list[str]:
+        '''
+        Parameters
+        ----------------
+        samples  : List of sample names, accepts wildcards. By default all samples
+        triggers : List of HLT2 triggers, accepts wildcards. By default all triggers
+        nfile    : If larger than zero, pick at most this number of files for each (sample, trigger)
+        randomize: If True, the nfile files will be picked randomly, otherwise the first ones are used
+        seed     : Seed used for random picking, by default None
+
+        Returns
+        ----------------
+        Sorted list of LFNs
+        '''
+        d_stratum = self.get_strata(samples=samples, triggers=triggers)
+        rng       = random.Random(seed)
+        l_lfn     = self._d_column['lfn']
+
+        l_row = []
+        for l_index in d_stratum.values():
+            if   nfile <= 0 or nfile >= len(l_index):
+                l_row += l_index
+            elif randomize:
+                l_row += rng.sample(l_index, nfile)
+            else:
+                l_row += l_index[:nfile]
+
+        nstratum = len(d_stratum)
+        nrow     = len(l_row)
+        log.debug(f'Picked {nrow} LFNs from {nstratum} (sample, trigger) pairs')
+
+        return sorted(l_lfn[irow] for irow in l_row)
+    # ------------------------------------------
+    def get_triggers(self) -> dict[str,int]:
+        '''
+        Returns dictionary with trigger name as key and number of files as value, sorted by trigger
+        '''
+        d_trigger = {}
+        for (_, trigger), l_index in self._get_index().items():
+            if trigger is None:
+                continue
+
+            d_trigger[trigger] = d_trigger.get(trigger, 0) + len(l_index)
+
+        return { name : d_trigger[name] for name in sorted(d_trigger) }
+    # ------------------------------------------
+    def __len__(self) -> int:
+        return len(self._d_column['lfn'])
+# ------------------------------------------
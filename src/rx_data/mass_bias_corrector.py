@@ -3,6 +3,8 @@ Module storing MassBiasCorrector class
 '''
 # pylint: disable=too-many-return-statements
 
+from typing                          import Union
+
 import vector
 import numpy
 import pandas as pnd
@@ -17,6 +19,16 @@ from rx_data.electron_bias_corrector import ElectronBiasCorrector
 
 log=LogStore.add_logger('rx_data:mass_bias_corrector')
 # ------------------------------------------
+def _mix(key : numpy.ndarray) -> numpy.ndarray:
+    '''
+    Finalizer of splitmix64, takes array of uint64 and returns array of well mixed uint64
+    '''
+    key = (key ^ (key >> numpy.uint64(30))) * numpy.uint64(0xBF58476D1CE4E5B9)
+    key = (key ^ (key >> numpy.uint64(27))) * numpy.uint64(0x94D049BB133111EB)
+    key =  key ^ (key >> numpy.uint64(31))
+
+    return key
+# ------------------------------------------
 class MassBiasCorrector:
     '''
     Class meant to correct B mass without DTF constraint
@@ -28,16 +40,19 @@ class MassBiasCorrector:
     # ------------------------------------------
     def __init__(self,
                  rdf                   : RDataFrame,
-                 skip_correction       : bool  = False,
-                 nthreads              : int   = 1,
-                 brem_energy_threshold : float = 400,
-                 ecorr_kind            : str   = 'brem_track_2'):
+                 skip_correction       : bool            = False,
+                 nthreads              : int             = 1,
+                 brem_energy_threshold : float           = 400,
+                 ecorr_kind            : str             = 'brem_track_2',
+                 seed                  : Union[int,None] = None):
         '''
         rdf : ROOT dataframe
         skip_correction: Will do everything but not correction. Needed to check that only the correction is changing data.
         nthreads : Number of threads, used by pandarallel
         brem_energy_threshold: Lowest energy that an ECAL cluster needs to have to be considered a photon, used as argument of ElectronBiasCorrector, default 0 (MeV)
         ecorr_kind : Kind of correction to be added to electrons, [ecalo_bias, brem_track]
+        seed : If passed, the random numbers used to smear each candidate will depend only on this, the run and event number.
+               Thus the smeared masses will not depend on how the data is split in chunks or processes.
         '''
         self._is_mc           = self._rdf_is_mc(rdf)
         self._df              = ut.df_from_rdf(rdf)
@@ -50,10 +65,15 @@ class MassBiasCorrector:
         self._ecorr_kind = ecorr_kind
 
         self._qsq_corr   = Q2SmearCorrector()
+        self._seed       = seed
 
         self._silence_logger(name = 'rx_data:brem_bias_corrector')
         self._silence_logger(name = 'rx_data:electron_bias_corrector')
 
+        # Regressor is loaded here, before the processes are forked, such that they share it
+        if self._ecorr_kind == 'brem_track_2' and not self._skip_correction:
+            ElectronBiasCorrector.load_corrector()
+
         if self._nthreads > 1:
             pandarallel.initialize(nb_workers=self._nthreads, progress_bar=True)
     # ------------------------------------------
@@ -157,19 +177,190 @@ class MassBiasCorrector:
         true    = row[f'{particle}_TRUEM']
         nbrem   = row['L1_HASBREMADDED'] + row['L2_HASBREMADDED']
         block   = row['block']
-        smeared = self._qsq_corr.get_mass(nbrem=nbrem, block=block, jpsi_mass_reco=reco, jpsi_mass_true=true)
+        seeds   = None
+        if self._seed is not None:
+            seeds = self._get_seeds(run=[row['RUNNUMBER']], evt=[row['EVENTNUMBER']])
+
+        [smeared] = self._smear_scalar(nbrem, block, numpy.array([reco]), numpy.array([true]), seeds)
 
         return smeared
     # ------------------------------------------
-    def _calculate_correction(self, row : pnd.Series) -> pnd.Series:
+    def _correct_electrons(self, row : pnd.Series) -> pnd.Series:
         row  = self._correct_electron('L1', row)
         row  = self._correct_electron('L2', row)
 
+        return row
+    # ------------------------------------------
+    def _calculate_correction(self, row : pnd.Series) -> pnd.Series:
+        row  = self._correct_electrons(row)
+
         # NOTE: The variable calculation has to be done on the row AFTER the correction
         row  = self._calculate_variables(row)
 
         return row
     # ------------------------------------------
+    def _get_corrected_df(self) -> pnd.DataFrame:
+        '''
+        Returns dataframe with electrons corrected, candidate by candidate
+        '''
+        df = self._df
+        if self._skip_correction:
+            return df
+
+        if self._nthreads > 1:
+            df_corr = df.parallel_apply(self._correct_electrons, axis=1)
+        else:
+            df_corr = df.apply(self._correct_electrons, axis=1)
+
+        return df_corr
+    # ------------------------------------------
+    def _get_momentum(self, df : pnd.DataFrame, name : str, mass : float) -> vector.MomentumNumpy4D:
+        return vector.array({
+            'pt' : df[f'{name}_PT' ].to_numpy(dtype=float),
+            'phi': df[f'{name}_PHI'].to_numpy(dtype=float),
+            'eta': df[f'{name}_ETA'].to_numpy(dtype=float),
+            'm'  : numpy.full(len(df), mass)})
+    # ------------------------------------------
+    def _calculate_dira_columns(
+            self,
+            df       : pnd.DataFrame,
+            momentum : vector.VectorNumpy3D,
+            particle : str) -> numpy.ndarray:
+        '''
+        Same as `_calculate_dira`, for all the candidates at once
+        '''
+        DR = vector.array({
+            'x' : df[f'{particle}_END_VX'].to_numpy(dtype=float) - df[f'{particle}_BPVX'].to_numpy(dtype=float),
+            'y' : df[f'{particle}_END_VY'].to_numpy(dtype=float) - df[f'{particle}_BPVY'].to_numpy(dtype=float),
+            'z' : df[f'{particle}_END_VZ'].to_numpy(dtype=float) - df[f'{particle}_BPVZ'].to_numpy(dtype=float)})
+
+        cos_theta = DR.dot(momentum) / (DR.mag * momentum.mag)
+
+        return numpy.asarray(cos_theta)
+    # ------------------------------------------
+    def _get_seeds(self, run : numpy.ndarray, evt : numpy.ndarray) -> numpy.ndarray:
+        '''
+        Returns array with one seed per candidate, made from the seed of the corrector, the run and event numbers
+        '''
+        key = numpy.full(len(run), self._seed, dtype=numpy.uint64)
+        with numpy.errstate(over='ignore'):
+            for arr in [run, evt]:
+                key = _mix(key ^ numpy.asarray(arr).astype(numpy.uint64))
+
+        return (key >> numpy.uint64(32)).astype(numpy.uint32)
+    # ------------------------------------------
+    def _smear_scalar(
+            self,
+            nbrem : int,
+            block : int,
+            reco  : numpy.ndarray,
+            true  : numpy.ndarray,
+            seeds : Union[numpy.ndarray,None]) -> numpy.ndarray:
+        '''
+        Smears masses candidate by candidate, `Q2SmearCorrector.get_mass` only takes numbers.
+        If seeds are passed, the generator of numpy is seeded for each candidate, and its state
+        is restored at the end, such that the random numbers of the caller are not changed
+        '''
+        l_smeared = []
+        state     = numpy.random.get_state() if seeds is not None else None
+        try:
+            for index, (mass_reco, mass_true) in enumerate(zip(reco, true)):
+                if seeds is not None:
+                    numpy.random.seed(int(seeds[index]))
+
+                smeared = self._qsq_corr.get_mass(nbrem=nbrem, block=block, jpsi_mass_reco=mass_reco, jpsi_mass_true=mass_true)
+                l_smeared.append(smeared)
+        finally:
+            if state is not None:
+                numpy.random.set_state(state)
+
+        return numpy.array(l_smeared, dtype=float)
+    # ------------------------------------------
+    def _smear_masses(self, df : pnd.DataFrame, particle : str, reco : numpy.ndarray) -> numpy.ndarray:
+        '''
+        Same as `_smear_mass`, for all the candidates. The candidates are grouped by
+        number of brem photons and block, the seeds are made for all of them at once
+        '''
+        if not self._is_mc:
+            return reco
+
+        arr_true  = df[f'{particle}_TRUEM'].to_numpy(dtype=float)
+        arr_nbrem = (df['L1_HASBREMADDED'].to_numpy() + df['L2_HASBREMADDED'].to_numpy()).astype(int)
+        arr_block = df['block'].to_numpy().astype(int)
+        arr_seed  = None
+        if self._seed is not None:
+            arr_seed = self._get_seeds(run=df['RUNNUMBER'].to_numpy(), evt=df['EVENTNUMBER'].to_numpy())
+
+        smeared = numpy.full(len(reco), numpy.nan)
+        s_group = set(zip(arr_nbrem.tolist(), arr_block.tolist()))
+        for nbrem, block in sorted(s_group):
+            mask  = (arr_nbrem == nbrem) & (arr_block == block)
+            seeds = None if arr_seed is None else arr_seed[mask]
+            log.debug(f'Smearing {mask.sum()} candidates with nbrem/block: {nbrem}/{block}')
+
+            smeared[mask] = self._smear_scalar(nbrem, block, reco[mask], arr_true[mask], seeds)
+
+        return smeared
+    # ------------------------------------------
+    def _calculate_columns(self, df : pnd.DataFrame) -> dict[str,numpy.ndarray]:
+        '''
+        Same as `_calculate_variables`, with each variable calculated for all the candidates at once
+        Returns dictionary with the arrays, in the same order as the row by row calculation
+        '''
+        l1 = self._get_momentum(df, name='L1', mass=self._emass)
+        l2 = self._get_momentum(df, name='L2', mass=self._emass)
+        kp = self._get_momentum(df, name= 'H', mass=self._kmass)
+
+        jp = l1 + l2
+        bp = jp + kp
+
+        bmass = numpy.asarray(bp.mass)
+        jmass = numpy.asarray(jp.mass)
+        bmass = numpy.where(numpy.isnan(bmass), -1, bmass)
+        jmass = numpy.where(numpy.isnan(jmass), -1, jmass)
+
+        d_data = {
+                'B_M'    : bmass,
+                'Jpsi_M' : jmass,
+                'B_PT'   : numpy.asarray(bp.pt),
+                'Jpsi_PT': numpy.asarray(jp.pt)}
+
+        for lep in ['L1', 'L2']:
+            for var in ['PX', 'PY', 'PZ', 'PT']:
+                d_data[f'{lep}_{var}'] = df[f'{lep}_{var}'].to_numpy()
+
+        for lep in ['L1', 'L2']:
+            d_data[f'{lep}_HASBREMADDED'] = df[f'{lep}_HASBREMADDED'].to_numpy()
+
+        d_data['Jpsi_M_smr'] = self._smear_masses(df, particle='Jpsi', reco=jmass)
+        d_data[   'B_M_smr'] = self._smear_masses(df, particle=   'B', reco=bmass)
+
+        d_data[   'B_DIRA_OWNPV'] = self._calculate_dira_columns(df, momentum=bp.to_Vector3D(), particle=   'B')
+        d_data['Jpsi_DIRA_OWNPV'] = self._calculate_dira_columns(df, momentum=jp.to_Vector3D(), particle='Jpsi')
+
+        return d_data
+    # ------------------------------------------
+    def get_data(self, suffix : str = None) -> dict[str,numpy.ndarray]:
+        '''
+        Returns dictionary with corrected variables as contiguous arrays,
+        as in the row by row calculation, these are doubles and NaNs are replaced by -1
+        '''
+        df     = self._get_corrected_df()
+        d_calc = self._calculate_columns(df)
+        d_data = {}
+        for name, arr in d_calc.items():
+            name = name if suffix is None else f'{name}_{suffix}'
+            # Rows are series of doubles, thus e.g. *_HASBREMADDED are doubles in the row by row calculation
+            arr  = numpy.asarray(arr, dtype=numpy.float64)
+            arr  = numpy.where(numpy.isnan(arr), -1, arr)
+
+            d_data[name] = numpy.ascontiguousarray(arr)
+
+        for variable in ['EVENTNUMBER', 'RUNNUMBER']:
+            d_data[variable] = numpy.ascontiguousarray(self._df[variable].to_numpy())
+
+        return d_data
+    # ------------------------------------------
     def _add_suffix(self, df : pnd.DataFrame, suffix : str):
         if suffix is None:
             return df
@@ -178,14 +369,22 @@ class MassBiasCorrector:
 
         return df
     # ------------------------------------------
-    def get_rdf(self, suffix: str = None) -> RDataFrame:
+    def get_rdf(self, suffix: str = None, vectorized : bool = False) -> RDataFrame:
         '''
         Returns corrected ROOT dataframe
 
-        mass_name (str) : Name of the column containing the corrected mass, by default B_M
+        suffix     (str) : If passed, will be appended to the names of the corrected variables
+        vectorized (bool): If True the variables are calculated from the corrected electrons for all
+                           the candidates at once, otherwise (default) it is done candidate by candidate
         '''
         log.info('Applying bias correction')
 
+        if vectorized:
+            d_data = self.get_data(suffix=suffix)
+            rdf    = RDF.FromNumpy(d_data)
+
+            return rdf
+
         df = self._df
         if self._nthreads > 1:
             df_corr = df.parallel_apply(self._calculate_correction, axis=1)
@@ -0,0 +1,434 @@
+'''
+Module containing NtupleGenerator class
+'''
+import os
+import json
+import zlib
+import hashlib
+from typing                import Union
+
+import numpy
+import vector
+import uproot
+from dmu.logging.log_store import LogStore
+from rx_data               import utilities as ut
+
+log = LogStore.add_logger('rx_data:ntuple_generator')
+# ------------------------------------------
+class NtupleGenerator:
+    '''
+    Class meant to write synthetic ntuples with the layout of the real ones, for tests and benchmarks
+    that need to run without access to the real data. It writes:
+
+    - Main trees, `DecayTree`, with B+ -> J/psi(-> l+ l-) K+ candidates, the branches used by the calculators
+      and correctors, with truth information for MC
+    - For MC, in the same files, `MCDecayTree`, with the true decays of the candidates followed by as many
+      decays that were not reconstructed
+    - Friend trees, with the same file names as the main ones, e.g. `mva`, `hop`, `brem_track_2`
+    - YAML files with the lists of paths, one per tree, such that with `ANADIR` pointing to `out_dir`,
+      `RDFGetter` can read them
+
+    under:
+
+    out_dir/Data/samples/main.yaml
+    out_dir/Data/main/v1/data_24_magdown_24c2_Hlt2RD_BuToKpEE_MVA_0123456789.root
+    out_dir/Data/mva/v1/data_24_magdown_24c2_Hlt2RD_BuToKpEE_MVA_0123456789.root
+    ...
+
+    The contents are random, but reproducible, for a given seed, sample, trigger and file index.
+    '''
+    l_friend   = ['mva', 'hop', 'cascade', 'jpsi_misid', 'brem_track_2']
+    # These friend trees exist only for electron triggers
+    l_ee_only  = ['brem_track_2']
+    l_sample   = ['DATA_24_MagDown_24c2', 'Bu_JpsiK_ee_eq_DPC']
+    l_trigger  = ['Hlt2RD_BuToKpEE_MVA', 'Hlt2RD_BuToKpMuMu_MVA']
+
+    d_mass     = {'B' : 5279.34, 'Jpsi' : 3096.90, 'H' : 493.677, 'EE' : 0.511, 'MuMu' : 105.66}
+    d_id       = {'B' : 521, 'Jpsi' : 443, 'H' : 321, 'EE' : 11, 'MuMu' : 13}
+    # c tau of B+ in mm
+    b_ctau     = 0.4911
+    # ------------------------------------------
+    def __init__(
+            self,
+            out_dir   : str,
+            nentries  : int                    = 1000,
+            nfiles    : int                    = 2,
+            samples   : Union[list[str],None]  = None,
+            triggers  : Union[list[str],None]  = None,
+            friends   : Union[list[str],None]  = None,
+            version   : str                    = 'v1',
+            seed      : int                    = 0):
+        '''
+        out_dir  : Directory where the `Data` directory will be made, i.e. the value `ANADIR` will take
+        nentries : Number of candidates per file
+        nfiles   : Number of files per sample and trigger
+        samples  : Names of samples, data samples should start with `DATA_`, by default `l_sample`
+        triggers : Names of HLT2 triggers, by default `l_trigger`
+        friends  : Friend trees to make, by default `l_friend`
+        version  : Version of the trees, used to name the directories
+        seed     : Used to seed the random numbers
+        '''
+        self._out_dir   = out_dir
+        self._nentries  = nentries
+        self._nfiles    = nfiles
+        self._l_sample  = NtupleGenerator.l_sample  if samples  is None else samples
+        self._l_trigger = NtupleGenerator.l_trigger if triggers is None else triggers
+        self._l_friend  = NtupleGenerator.l_friend  if friends  is None else friends
+        self._version   = version
+        self._seed      = seed
+
+        l_bad = [ friend for friend in self._l_friend if friend not in NtupleGenerator.l_friend ]
+        if len(l_bad) > 0:
+            raise ValueError(f'Invalid friend trees {l_bad}, expected some of: {NtupleGenerator.l_friend}')
+
+        if nentries <= 0 or nfiles <= 0:
+            raise ValueError(f'Number of entries and files need to be positive, found: {nentries}/{nfiles}')
+    # ------------------------------------------
+    def _is_mc(self, sample : str) -> bool:
+        return not sample.startswith('DATA_')
+    # ------------------------------------------
+    def _get_file_name(self, sample : str, trigger : str, ifile : int) -> str:
+        '''
+        Returns name of file following `utilities.Data.dt_rgx` or `utilities.Data.mc_rgx`
+        '''
+        hsh = hashlib.md5(f'{sample}_{trigger}_{ifile}'.encode('utf-8')).hexdigest()[:10]
+        if not self._is_mc(sample):
+            return f'{sample.lower()}_{trigger}_{hsh}.root'
+
+        # Event type is made up, but stable for a given sample
+        event_type = 10_000_000 + zlib.crc32(sample.encode('utf-8')) % 90_000_000
+
+        return f'mc_magdown_{event_type}_{sample.lower()}_{trigger}_{hsh}.root'
+    # ------------------------------------------
+    def _get_rng(self, sample : str, trigger : str, ifile : int) -> numpy.random.Generator:
+        key = zlib.crc32(f'{sample}_{trigger}_{ifile}'.encode('utf-8'))
+
+        return numpy.random.default_rng([self._seed, key])
+    # ------------------------------------------
+    def _decay(
+            self,
+            rng    : numpy.random.Generator,
+            parent : vector.MomentumNumpy4D,
+            mass_1 : float,
+            mass_2 : float) -> tuple[vector.MomentumNumpy4D, vector.MomentumNumpy4D]:
+        '''
+        Isotropic two body decay of parent, returns momenta of daughters in the lab frame
+        '''
+        mass  = numpy.asarray(parent.mass)
+        size  = len(mass)
+        pstar = numpy.sqrt((mass ** 2 - (mass_1 + mass_2) ** 2) * (mass ** 2 - (mass_1 - mass_2) ** 2)) / (2 * mass)
+        cost  = rng.uniform(-1, +1, size)
+        phi   = rng.uniform(-numpy.pi, +numpy.pi, size)
+        sint  = numpy.sqrt(1 - cost ** 2)
+
+        px    = pstar * sint * numpy.cos(phi)
+        py    = pstar * sint * numpy.sin(phi)
+        pz    = pstar * cost
+
+        dau_1 = vector.array({'px' : +px, 'py' : +py, 'pz' : +pz, 'E' : numpy.sqrt(pstar ** 2 + mass_1 ** 2)})
+        dau_2 = vector.array({'px' : -px, 'py' : -py, 'pz' : -pz, 'E' : numpy.sqrt(pstar ** 2 + mass_2 ** 2)})
+
+        return dau_1.boost_p4(parent), dau_2.boost_p4(parent)
+    # ------------------------------------------
+    def _get_true_momenta(self, rng : numpy.random.Generator, lepton : str) -> dict[str,vector.MomentumNumpy4D]:
+        size = self._nentries
+        pt   = 1_000 + rng.exponential(5_000, size)
+        eta  = rng.uniform(2.0, 5.0, size)
+        phi  = rng.uniform(-numpy.pi, +numpy.pi, size)
+
+        bp       = vector.array({'pt' : pt, 'eta' : eta, 'phi' : phi, 'M' : numpy.full(size, NtupleGenerator.d_mass['B'])})
+        jp, kp   = self._decay(rng, bp, NtupleGenerator.d_mass['Jpsi'], NtupleGenerator.d_mass['H'])
+        mass     = NtupleGenerator.d_mass[lepton]
+        l1, l2   = self._decay(rng, jp, mass, mass)
+
+        return {'B' : bp, 'Jpsi' : jp, 'H' : kp, 'L1' : l1, 'L2' : l2}
+    # ------------------------------------------
+    def _smear(self, rng : numpy.random.Generator, mom : vector.MomentumNumpy4D, mass : float, resolution : float) -> vector.MomentumNumpy4D:
+        scale = rng.normal(1, resolution, len(mom))
+
+        return vector.array({'px' : scale * mom.px, 'py' : scale * mom.py, 'pz' : scale * mom.pz, 'M' : numpy.full(len(mom), mass)})
+    # ------------------------------------------
+    def _add_momentum(self, d_data : dict[str,numpy.ndarray], name : str, mom : vector.MomentumNumpy4D) -> None:
+        d_data[f'{name}_PX' ] = numpy.asarray(mom.px )
+        d_data[f'{name}_PY' ] = numpy.asarray(mom.py )
+        d_data[f'{name}_PZ' ] = numpy.asarray(mom.pz )
+        d_data[f'{name}_PT' ] = numpy.asarray(mom.pt )
+        d_data[f'{name}_P'  ] = numpy.asarray(mom.p  )
+        d_data[f'{name}_ETA'] = numpy.asarray(mom.eta)
+        d_data[f'{name}_PHI'] = numpy.asarray(mom.phi)
+        d_data[f'{name}_PE' ] = numpy.asarray(mom.E  )
+    # ------------------------------------------
+    def _add_leptons(
+            self,
+            rng    : numpy.random.Generator,
+            d_data : dict[str,numpy.ndarray],
+            d_true : dict[str,vector.MomentumNumpy4D],
+            lepton : str) -> dict[str,vector.MomentumNumpy4D]:
+        '''
+        Adds lepton branches, returns reconstructed momenta.
+        For electrons, the track loses a fraction of the momentum to bremsstrahlung,
+        which is recovered, with worse resolution, when a photon was added
+        '''
+        size   = self._nentries
+        mass   = NtupleGenerator.d_mass[lepton]
+        d_reco = {}
+        for name, charge in [('L1', +1), ('L2', -1)]:
+            true = d_true[name]
+            if lepton == 'MuMu':
+                track = self._smear(rng, true, mass, 0.005)
+                reco  = track
+                brem  = numpy.zeros(size, dtype=bool)
+            else:
+                track = self._smear(rng, true, mass, 0.005)
+                frac  = numpy.clip(rng.exponential(0.2, size), 0, 0.9)
+                track = vector.array({'px' : (1 - frac) * track.px, 'py' : (1 - frac) * track.py, 'pz' : (1 - frac) * track.pz, 'M' : numpy.full(size, mass)})
+                brem  = rng.uniform(0, 1, size) < 0.6
+                full  = self._smear(rng, true, mass, 0.02)
+                reco  = vector.array({
+                    'px' : numpy.where(brem, full.px, track.px),
+                    'py' : numpy.where(brem, full.py, track.py),
+                    'pz' : numpy.where(brem, full.pz, track.pz),
+                    'M'  : numpy.full(size, mass)})
+
+            brem_energy = numpy.where(brem, numpy.asarray(reco.E) - numpy.asarray(track.E), 0)
+
+            self._add_momentum(d_data, name, reco)
+            d_data[f'{name}_TRACK_PX'            ] = numpy.asarray(track.px)
+            d_data[f'{name}_TRACK_PY'            ] = numpy.asarray(track.py)
+            d_data[f'{name}_TRACK_PZ'            ] = numpy.asarray(track.pz)
+            d_data[f'{name}_ID'                  ] = numpy.full(size, -charge * NtupleGenerator.d_id[lepton], dtype='int32')
+            d_data[f'{name}_PID_E'               ] = rng.normal(5 if lepton == 'EE' else -5, 2, size)
+            d_data[f'{name}_HASBREMADDED'        ] = brem
+            d_data[f'{name}_BREMHYPOENERGY'      ] = numpy.where(brem, brem_energy, -1)
+            d_data[f'{name}_BREMTRACKBASEDENERGY'] = numpy.where(brem, brem_energy * rng.normal(1, 0.1, size), -1)
+            d_data[f'{name}_BREMHYPOROW'         ] = numpy.where(brem, rng.integers(0, 52, size), -1).astype('int32')
+            d_data[f'{name}_BREMHYPOCOL'         ] = numpy.where(brem, rng.integers(0, 64, size), -1).astype('int32')
+            d_data[f'{name}_BREMHYPOAREA'        ] = numpy.where(brem, rng.integers(0,  3, size), -1).astype('int32')
+
+            d_reco[name] = reco
+
+        return d_reco
+    # ------------------------------------------
+    def _add_vertices(
+            self,
+            rng    : numpy.random.Generator,
+            d_data : dict[str,numpy.ndarray],
+            bp     : vector.MomentumNumpy4D) -> None:
+        size = self._nentries
+        pv_x = rng.normal(0,  0.05, size)
+        pv_y = rng.normal(0,  0.05, size)
+        pv_z = rng.normal(0, 50.00, size)
+
+        flight = rng.exponential(NtupleGenerator.b_ctau, size) * numpy.asarray(bp.p) / NtupleGenerator.d_mass['B']
+        p      = numpy.asarray(bp.p)
+        sv_x   = pv_x + flight * numpy.asarray(bp.px) / p + rng.normal(0, 0.01, size)
+        sv_y   = pv_y + flight * numpy.asarray(bp.py) / p + rng.normal(0, 0.01, size)
+        sv_z   = pv_z + flight * numpy.asarray(bp.pz) / p + rng.normal(0, 0.10, size)
+
+        # J/psi decays promptly, both share the decay vertex
+        for particle in ['B', 'Jpsi']:
+            d_data[f'{particle}_BPVX'  ] = pv_x
+            d_data[f'{particle}_BPVY'  ] = pv_y
+            d_data[f'{particle}_BPVZ'  ] = pv_z
+            d_data[f'{particle}_END_VX'] = sv_x
+            d_data[f'{particle}_END_VY'] = sv_y
+            d_data[f'{particle}_END_VZ'] = sv_z
+    # ------------------------------------------
+    def _get_dira(self, d_data : dict[str,numpy.ndarray], particle : str) -> numpy.ndarray:
+        mom = vector.array({'x' : d_data[f'{particle}_PX'], 'y' : d_data[f'{particle}_PY'], 'z' : d_data[f'{particle}_PZ']})
+        fly = vector.array({
+            'x' : d_data[f'{particle}_END_VX'] - d_data[f'{particle}_BPVX'],
+            'y' : d_data[f'{particle}_END_VY'] - d_data[f'{particle}_BPVY'],
+            'z' : d_data[f'{particle}_END_VZ'] - d_data[f'{particle}_BPVZ']})
+
+        return numpy.asarray(mom.dot(fly) / (mom.mag * fly.mag))
+    # ------------------------------------------
+    def _get_main(self, rng : numpy.random.Generator, sample : str, trigger : str, ifile : int) -> dict[str,numpy.ndarray]:
+        '''
+        Returns dictionary with branches of main tree
+        '''
+        size   = self._nentries
+        lepton = 'EE' if 'EE' in trigger else 'MuMu'
+        d_true = self._get_true_momenta(rng, lepton)
+
+        d_data = {}
+        d_data['RUNNUMBER'  ] = numpy.full(size, 300_000 + ifile, dtype='uint32')
+        d_data['EVENTNUMBER'] = numpy.arange(size, dtype='uint64') + ifile * size
+        d_data['nPVs'       ] = rng.poisson(5, size).astype('int32') + 1
+        d_data['block'      ] = rng.integers(1, 9, size).astype('int32')
+
+        d_reco = self._add_leptons(rng, d_data, d_true, lepton)
+        kp     = self._smear(rng, d_true['H'], NtupleGenerator.d_mass['H'], 0.005)
+        self._add_momentum(d_data, 'H', kp)
+        d_data['H_ID'   ] = numpy.full(size, NtupleGenerator.d_id['H'], dtype='int32')
+        d_data['H_PID_E'] = rng.normal(-5, 2, size)
+
+        jp = d_reco['L1'] + d_reco['L2']
+        bp = jp + kp
+        for name, mom in [('Jpsi', jp), ('B', bp)]:
+            d_data[f'{name}_M' ] = numpy.asarray(mom.mass)
+            d_data[f'{name}_PT'] = numpy.asarray(mom.pt  )
+            d_data[f'{name}_PX'] = numpy.asarray(mom.px  )
+            d_data[f'{name}_PY'] = numpy.asarray(mom.py  )
+            d_data[f'{name}_PZ'] = numpy.asarray(mom.pz  )
+
+        self._add_vertices(rng, d_data, d_true['B'])
+        d_data['B_DIRA_OWNPV'   ] = self._get_dira(d_data, 'B')
+        d_data['Jpsi_DIRA_OWNPV'] = self._get_dira(d_data, 'Jpsi')
+
+        # Fit constraining the J/psi mass
+        jtrue = d_true['Jpsi']
+        d_data['Jpsi_DTF_HEAD_PE'] = numpy.asarray(jtrue.E )
+        d_data['Jpsi_DTF_HEAD_PX'] = numpy.asarray(jtrue.px)
+        d_data['Jpsi_DTF_HEAD_PY'] = numpy.asarray(jtrue.py)
+        d_data['Jpsi_DTF_HEAD_PZ'] = numpy.asarray(jtrue.pz)
+        d_data['B_const_mass_M'  ] = rng.normal(NtupleGenerator.d_mass['B'], 15, size)
+
+        if self._is_mc(sample):
+            self._add_truth(d_data, d_true, lepton)
+
+        return d_data
+    # ------------------------------------------
+    def _add_truth(
+            self,
+            d_data : dict[str,numpy.ndarray],
+            d_true : dict[str,vector.MomentumNumpy4D],
+            lepton : str) -> None:
+        size = self._nentries
+        d_id = {
+                'B'    : NtupleGenerator.d_id['B'],
+                'Jpsi' : NtupleGenerator.d_id['Jpsi'],
+                'H'    : NtupleGenerator.d_id['H'],
+                'L1'   : -NtupleGenerator.d_id[lepton],
+                'L2'   : +NtupleGenerator.d_id[lepton]}
+
+        for name, mom in d_true.items():
+            d_data[f'{name}_TRUEPX'    ] = numpy.asarray(mom.px)
+            d_data[f'{name}_TRUEPY'    ] = numpy.asarray(mom.py)
+            d_data[f'{name}_TRUEPZ'    ] = numpy.asarray(mom.pz)
+            d_data[f'{name}_TRUEENERGY'] = numpy.asarray(mom.E )
+            d_data[f'{name}_TRUEID'    ] = numpy.full(size, d_id[name], dtype='int32')
+
+        d_data['B_TRUEM'   ] = numpy.asarray(d_true['B'   ].mass)
+        d_data['Jpsi_TRUEM'] = numpy.asarray(d_true['Jpsi'].mass)
+    # ------------------------------------------
+    def _get_mcdt(self, rng : numpy.random.Generator, d_main : dict[str,numpy.ndarray], trigger : str) -> dict[str,numpy.ndarray]:
+        '''
+        Returns branches of MCDecayTree, the true decays of the candidates in the main tree, followed
+        by the same number of decays, that were not reconstructed, with event numbers not used by any file
+        '''
+        lepton = 'EE' if 'EE' in trigger else 'MuMu'
+        d_lost = {}
+        self._add_truth(d_lost, self._get_true_momenta(rng, lepton), lepton)
+        d_lost['RUNNUMBER'  ] = d_main['RUNNUMBER']
+        d_lost['EVENTNUMBER'] = d_main['EVENTNUMBER'] + self._nfiles * self._nentries
+
+        return { name : numpy.concatenate([d_main[name], arr_lost]) for name, arr_lost in d_lost.items() }
+    # ------------------------------------------
+    def _get_friend(
+            self,
+            rng    : numpy.random.Generator,
+            friend : str,
+            d_main : dict[str,numpy.ndarray]) -> dict[str,numpy.ndarray]:
+        '''
+        Returns branches of friend tree, derived from the main tree when possible
+        '''
+        size   = self._nentries
+        d_data = {'EVENTNUMBER' : d_main['EVENTNUMBER'], 'RUNNUMBER' : d_main['RUNNUMBER']}
+        bmass  = d_main['B_M']
+
+        if friend == 'mva':
+            d_data['mva_cmb'] = rng.beta(5, 2, size)
+            d_data['mva_prc'] = rng.beta(5, 2, size)
+        elif friend == 'hop':
+            d_data['hop_alpha'] = rng.normal(1, 0.1, size)
+            d_data['hop_mass' ] = bmass * rng.normal(1, 0.02, size)
+        elif friend in ['cascade', 'jpsi_misid']:
+            d_data[f'swp_{friend}_mass_org'] = bmass
+            d_data[f'swp_{friend}_mass_swp'] = bmass * rng.normal(0.9, 0.05, size)
+        elif friend == 'brem_track_2':
+            l_name = ['B_M', 'Jpsi_M', 'B_PT', 'Jpsi_PT', 'B_DIRA_OWNPV', 'Jpsi_DIRA_OWNPV']
+            l_name+= [ f'{lep}_{var}' for lep in ['L1', 'L2'] for var in ['PX', 'PY', 'PZ', 'PT', 'HASBREMADDED'] ]
+            for name in l_name:
+                d_data[f'{name}_brem_track_2'] = d_main[name]
+
+            d_data['B_M_smr_brem_track_2'   ] = d_main['B_M'   ] * rng.normal(1, 0.005, size)
+            d_data['Jpsi_M_smr_brem_track_2'] = d_main['Jpsi_M'] * rng.normal(1, 0.005, size)
+        else:
+            raise ValueError(f'Invalid friend tree: {friend}')
+
+        return d_data
+    # ------------------------------------------
+    def _write(self, path : str, d_tree : dict[str,dict[str,numpy.ndarray]], metadata : Union[dict,None] = None) -> None:
+        '''
+        Writes file with trees in `d_tree`, where the key is the name of the tree and the value its branches
+        '''
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with uproot.recreate(tmp_path) as ofile:
+            for tree, d_data in d_tree.items():
+                ofile[tree] = d_data
+
+            if metadata is not None:
+                ofile['metadata'] = json.dumps(metadata)
+
+        os.replace(tmp_path, path)
+    # ------------------------------------------
+    def _get_tree_dir(self, tree : str) -> str:
+        return f'{self._out_dir}/Data/{tree}/{self._version}'
+    # ------------------------------------------
+    def _make_files(self, sample : str, trigger : str, ifile : int) -> dict[str,str]:
+        '''
+        Writes main and friend files, returns dictionary with tree kind as key and path as value
+        '''
+        rng    = self._get_rng(sample, trigger, ifile)
+        fname  = self._get_file_name(sample, trigger, ifile)
+        d_main = self._get_main(rng, sample, trigger, ifile)
+        d_path = {'main' : f'{self._get_tree_dir("main")}/{fname}'}
+
+        d_tree = {'DecayTree' : d_main}
+        if self._is_mc(sample):
+            d_tree['MCDecayTree'] = self._get_mcdt(rng, d_main, trigger)
+
+        metadata = {'generator' : 'NtupleGenerator', 'sample' : sample, 'trigger' : trigger, 'file' : ifile, 'seed' : self._seed}
+        self._write(d_path['main'], d_tree, metadata=metadata)
+
+        for friend in self._l_friend:
+            if friend in NtupleGenerator.l_ee_only and 'EE' not in trigger:
+                continue
+
+            path   = f'{self._get_tree_dir(friend)}/{fname}'
+            d_data = self._get_friend(rng, friend, d_main)
+            self._write(path, {'DecayTree' : d_data})
+            d_path[friend] = path
+
+        return d_path
+    # ------------------------------------------
+    def run(self) -> dict[str,str]:
+        '''
+        Makes files and lists of samples, returns dictionary with tree kind, e.g. main, mva, as key
+        and path to YAML file with list of samples as value
+        '''
+        d_struc = {}
+        for sample in self._l_sample:
+            for trigger in self._l_trigger:
+                log.debug(f'Making {self._nfiles} files for {sample}/{trigger}')
+                for ifile in range(self._nfiles):
+                    d_path = self._make_files(sample, trigger, ifile)
+                    for tree, path in d_path.items():
+                        d_struc.setdefault(tree, {}).setdefault(sample, {}).setdefault(trigger, []).append(path)
+
+        sample_dir = f'{self._out_dir}/Data/samples'
+        os.makedirs(sample_dir, exist_ok=True)
+
+        d_yaml = {}
+        for tree, d_sample in d_struc.items():
+            yaml_path = f'{sample_dir}/{tree}.yaml'
+            ut.dump_samples(d_sample, yaml_path)
+            d_yaml[tree] = yaml_path
+
+        nfile = sum( len(l_path) for d_sample in d_struc['main'].values() for l_path in d_sample.values() )
+        log.info(f'Made {nfile} main files with {self._nentries} entries each in: {self._out_dir}/Data')
+
+        return d_yaml
+# ------------------------------------------
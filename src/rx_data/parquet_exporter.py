@@ -0,0 +1,202 @@
+'''
+Module containing ParquetExporter class
+'''
+import os
+import glob
+import json
+import hashlib
+from typing                import Union
+
+import numpy
+import pyarrow         as pa
+import pyarrow.parquet as pq
+from dmu.logging.log_store import LogStore
+from rx_data.rdf_getter    import RDFGetter
+from rx_data.file_cache    import FileCache
+
+log = LogStore.add_logger('rx_data:parquet_exporter')
+# ------------------------------------------
+class ParquetExporter:
+    '''
+    Class meant to export columns of a sample and trigger, including the ones in friend trees,
+    into a directory with one Parquet file, made of a single row group, per file in the main sample.
+
+    The files store in their metadata, under the `rx_data` key, the sample, trigger, columns, selection
+    and the (path, size, modification time) of the input files. When exporting again, only the files
+    whose inputs or configuration changed are rewritten.
+
+    The output can then be read with e.g.:
+
+    import pyarrow.dataset as ds
+
+    table = ds.dataset(out_dir, format='parquet').to_table()
+    '''
+    meta_key = b'rx_data'
+    # ------------------------------------------
+    def __init__(
+            self,
+            sample      : str,
+            trigger     : str,
+            columns     : list[str],
+            out_dir     : str,
+            selection   : Union[dict[str,str],None] = None,
+            float32     : Union[bool,list[str]]     = False,
+            dictionary  : Union[list[str],None]     = None,
+            compression : str                       = 'zstd'):
+        '''
+        sample     : Sample name, e.g. DATA_24_MagDown_24c2
+        trigger    : HLT2 trigger, e.g. Hlt2RD_BuToKpEE_MVA
+        columns    : Columns to export, friend columns can be used as with RDFGetter, e.g. mva.mva_cmb
+        out_dir    : Directory where the Parquet files will go
+        selection  : Dictionary with name of cut as key and cut as value, applied before exporting
+        float32    : If True, all double precision columns will be stored as single precision, if list, only those columns
+        dictionary : List of columns to store with dictionary encoding, e.g. columns with few distinct values
+        compression: Compression used by Parquet, by default zstd
+        '''
+        self._sample      = sample
+        self._trigger     = trigger
+        self._l_column    = columns
+        self._out_dir     = out_dir
+        self._d_selection = {} if selection  is None else selection
+        self._float32     = float32
+        self._l_dict      = [] if dictionary is None else dictionary
+        self._compression = compression
+    # ------------------------------------------
+    def _get_config(self) -> dict:
+        '''
+        Returns dictionary with everything that, if changed, requires exporting again
+        '''
+        return {
+                'sample'      : self._sample,
+                'trigger'     : self._trigger,
+                'columns'     : self._l_column,
+                'selection'   : self._d_selection,
+                'float32'     : self._float32,
+                'dictionary'  : self._l_dict,
+                'compression' : self._compression,
+                'max_entries' : RDFGetter.max_entries}
+    # ------------------------------------------
+    def _get_provenance(self, l_input : list[str]) -> dict:
+        l_identity = []
+        for path in l_input:
+            identity = FileCache.identity(path)
+            # Remote files cannot be checked for changes, the path is used
+            identity = [path, -1, -1] if identity is None else list(identity)
+            l_identity.append(identity)
+
+        config = self._get_config()
+        hsh    = hashlib.sha256(json.dumps([config, l_identity], sort_keys=True).encode('utf-8')).hexdigest()
+
+        return {'hash' : hsh, 'config' : config, 'inputs' : l_identity}
+    # ------------------------------------------
+    def _get_out_path(self, main_path : str) -> str:
+        fname = os.path.basename(main_path).replace('.root', '.parquet')
+
+        return f'{self._out_dir}/{fname}'
+    # ------------------------------------------
+    def _is_up_to_date(self, out_path : str, provenance : dict) -> bool:
+        if not os.path.isfile(out_path):
+            return False
+
+        metadata = pq.read_schema(out_path).metadata or {}
+        if ParquetExporter.meta_key not in metadata:
+            return False
+
+        old_provenance = json.loads(metadata[ParquetExporter.meta_key])
+
+        return old_provenance['hash'] == provenance['hash']
+    # ------------------------------------------
+    def _use_float32(self, name : str, arr : numpy.ndarray) -> bool:
+        if arr.dtype != numpy.float64:
+            return False
+
+        if isinstance(self._float32, bool):
+            return self._float32
+
+        return name in self._float32
+    # ------------------------------------------
+    def _get_table(self, rdf, provenance : dict) -> pa.Table:
+        for name, cut in self._d_selection.items():
+            rdf = rdf.Filter(cut, name)
+
+        d_data = rdf.AsNumpy(self._l_column)
+        d_arr  = {}
+        for name in self._l_column:
+            arr = d_data[name]
+            if self._use_float32(name, arr):
+                arr = arr.astype(numpy.float32)
+
+            d_arr[name] = arr
+
+        table = pa.table(d_arr)
+        table = table.replace_schema_metadata({ParquetExporter.meta_key : json.dumps(provenance)})
+
+        return table
+    # ------------------------------------------
+    def _write_table(self, table : pa.Table, out_path : str) -> None:
+        tmp_path = f'{out_path}.{os.getpid()}.tmp'
+        pq.write_table(
+                table,
+                tmp_path,
+                row_group_size = max(table.num_rows, 1),
+                compression    = self._compression,
+                use_dictionary = self._l_dict if len(self._l_dict) > 0 else False)
+
+        os.replace(tmp_path, out_path)
+    # ------------------------------------------
+    def _remove_orphans(self, l_out_path : list[str]) -> None:
+        '''
+        Removes Parquet files in output directory, made for this sample and trigger,
+        that do not correspond to any input anymore
+        '''
+        s_out_path = set(l_out_path)
+        for path in glob.glob(f'{self._out_dir}/*.parquet'):
+            if path in s_out_path:
+                continue
+
+            metadata = pq.read_schema(path).metadata or {}
+            if ParquetExporter.meta_key not in metadata:
+                continue
+
+            config = json.loads(metadata[ParquetExporter.meta_key])['config']
+            if config['sample'] != self._sample or config['trigger'] != self._trigger:
+                continue
+
+            log.info(f'Removing file without inputs: {path}')
+            os.remove(path)
+    # ------------------------------------------
+    def run(self) -> list[str]:
+        '''
+        Exports the data, returns list of paths to Parquet files
+        '''
+        os.makedirs(self._out_dir, exist_ok=True)
+
+        gtr     = RDFGetter(sample=self._sample, trigger=self._trigger)
+        d_input = gtr.get_paths()
+        d_todo  = {}
+        for main_path, l_input in d_input.items():
+            out_path   = self._get_out_path(main_path)
+            provenance = self._get_provenance(l_input)
+            if self._is_up_to_date(out_path, provenance):
+                log.debug(f'Up to date: {out_path}')
+                continue
+
+            d_todo[main_path] = out_path, provenance
+
+        l_out_path = [ self._get_out_path(main_path) for main_path in d_input ]
+        self._remove_orphans(l_out_path)
+
+        ntodo = len(d_todo)
+        nfile = len(d_input)
+        log.info(f'Exporting {ntodo}/{nfile} files to: {self._out_dir}')
+        if ntodo == 0:
+            return l_out_path
+
+        d_rdf = gtr.get_rdf(per_file=True)
+        for main_path, (out_path, provenance) in d_todo.items():
+            log.debug(f'Exporting: {main_path}')
+            table = self._get_table(d_rdf[main_path], provenance)
+            self._write_table(table, out_path)
+
+        return l_out_path
+# ------------------------------------------
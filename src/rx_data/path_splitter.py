@@ -67,9 +67,9 @@ class PathSplitter:
         npath = len(self._l_path)
         log.info(f'Splitting {npath} paths into categories')
 
+        d_info      = ut.info_from_paths(self._l_path)
         d_info_path = {}
-        for path in self._l_path:
-            info = ut.info_from_path(path)
+        for path, info in zip(self._l_path, zip(d_info['sample'], d_info['line'])):
             if info not in d_info_path:
                 d_info_path[info] = []
 
@@ -0,0 +1,54 @@
+'''
+Module with functions reading, from /proc, the memory used and the bytes read and written by this process.
+Outside Linux, or if /proc cannot be read, they fall back to `resource` or return zeros
+'''
+import resource
+
+from dmu.logging.log_store import LogStore
+
+log=LogStore.add_logger('rx_data:process_info')
+# ----------------------------------------
+def reset_peak_rss() -> None:
+    '''
+    Makes the kernel reset the peak resident memory of this process, VmHWM, to the current one
+    '''
+    try:
+        with open('/proc/self/clear_refs', 'w', encoding='utf-8') as ofile:
+            ofile.write('5')
+    except OSError:
+        log.debug('Cannot reset peak RSS, peak will be the one of the whole process')
+# ----------------------------------------
+def get_rss(field : str = 'VmRSS') -> int:
+    '''
+    Returns resident memory of this process in bytes
+
+    field: VmRSS for the current memory or VmHWM for the peak, since the start or the last call to `reset_peak_rss`
+    '''
+    if field not in ['VmRSS', 'VmHWM']:
+        raise ValueError(f'Invalid field: {field}')
+
+    try:
+        with open('/proc/self/status', encoding='utf-8') as ifile:
+            for line in ifile:
+                if line.startswith(f'{field}:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    # In Linux ru_maxrss is in kB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+# ----------------------------------------
+def get_io() -> tuple[int,int]:
+    '''
+    Returns bytes read and written by this process so far, including the ones served from the page cache
+    '''
+    d_io = {}
+    try:
+        with open('/proc/self/io', encoding='utf-8') as ifile:
+            for line in ifile:
+                key, _, val = line.partition(':')
+                d_io[key] = int(val)
+    except OSError:
+        return 0, 0
+
+    return d_io.get('rchar', 0), d_io.get('wchar', 0)
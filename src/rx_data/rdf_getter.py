@@ -13,6 +13,7 @@ from importlib.resources import files
 
 import dmu.generic.utilities as gut
 from dmu.logging.log_store import LogStore
+from rx_data               import utilities as ut
 
 import yaml
 from ROOT                  import RDF, RDataFrame, GetThreadPoolSize
@@ -189,8 +190,7 @@ class RDFGetter:
         d_section = {'trees' : [self._tree_name]}
 
         log.debug(f'Building section from: {yaml_path}')
-        with open(yaml_path, encoding='utf-8') as ifile:
-            d_data = yaml.safe_load(ifile)
+        d_data = ut.load_yaml(yaml_path)
 
         l_path = []
         nopath = False
@@ -474,6 +474,23 @@ class RDFGetter:
 
         return rdf
     # ---------------------------------------------------
+    def get_paths(self) -> dict[str,list[str]]:
+        '''
+        Returns dictionary with:
+
+        key  : Path to ROOT file in the main sample
+        value: List of paths to that file and its friends
+        '''
+        d_data = self._get_samples()
+        l_main = d_data['samples'][self._main_tree]['files']
+        l_frnd = [ data_kind['files'] for data_kind in d_data['friends'].values() ]
+
+        d_path = {}
+        for ifile, main_path in enumerate(l_main):
+            d_path[main_path] = [main_path] + [ l_path[ifile] for l_path in l_frnd ]
+
+        return d_path
+    # ---------------------------------------------------
     @staticmethod
     def add_truem(rdf : RDataFrame) -> RDataFrame:
         '''
@@ -583,8 +600,8 @@ class RDFGetter:
 
         data_frnd = data['friends']
         for kind, data_kind in data_frnd.items():
-            fpath = data_kind['files'][ifile]
-            datac['friends'][kind]['files'] = [fpath]
+            fpath_frnd = data_kind['files'][ifile]
+            datac['friends'][kind]['files'] = [fpath_frnd]
 
         return datac, fpath
     # ---------------------------------------------------
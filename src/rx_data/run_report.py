@@ -0,0 +1,197 @@
+'''
+Module with RunReport class
+'''
+import os
+import json
+import time
+from contextlib            import contextmanager
+from typing                import Iterator, Union
+
+from dmu.logging.log_store import LogStore
+from rx_data               import process_info as pin
+
+log=LogStore.add_logger('rx_data:run_report')
+# ----------------------------------------
+class RunReport:
+    '''
+    Class meant to collect the time, entries, bytes read and written and peak memory
+    of each stage of a job, e.g. for each chunk of each file, and to save them as:
+
+    - JSON file, with a summary per stage and every measurement
+    - Prometheus textfile, to be picked up by the textfile collector of the node exporter
+
+    Usage:
+
+    rep = RunReport(labels={'kind' : 'hop'})
+    with rep.stage('calculate', path=path, chunk=0) as rec:
+        d_data         = calculate()
+        rec['entries'] = len(d_data['hop_mass'])
+
+    rep.save('/path/to/report.json')
+    '''
+    prefix = 'rx_data'
+    # ----------------------------------------
+    def __init__(self, labels : Union[dict[str,str],None] = None):
+        '''
+        labels: Dictionary with information on the job, e.g. kind of branch, used also as Prometheus labels
+        '''
+        self._d_label  = {} if labels is None else labels
+        self._l_record : list[dict] = []
+        # Records of stages that are running, the outer ones first
+        self._l_open   : list[dict] = []
+        self._start    = time.time()
+        self._io_start = pin.get_io()
+        self._peak_rss = pin.get_rss('VmHWM')
+    # ----------------------------------------
+    def get_peak_rss(self) -> int:
+        '''
+        Returns peak resident memory of this process in bytes, since the report was created
+        '''
+        self._update_peak_rss()
+
+        return self._peak_rss
+    # ----------------------------------------
+    def _update_peak_rss(self) -> None:
+        '''
+        Adds peak memory since the last reset to the job and to every stage running
+        '''
+        peak_rss = pin.get_rss('VmHWM')
+        self._peak_rss = max(self._peak_rss, peak_rss)
+        for rec in self._l_open:
+            rec['peak_rss'] = max(rec['peak_rss'], peak_rss)
+    # ----------------------------------------
+    @contextmanager
+    def stage(self, name : str, path : Union[str,None] = None, chunk : Union[int,None] = None) -> Iterator[dict]:
+        '''
+        Context manager measuring the code inside it. It yields the record, a dictionary, where
+        the caller can add `entries` and any other quantity, e.g. `bytes_written` if known.
+        Stages can be nested, the peak memory of a stage includes the one of the stages inside it
+        '''
+        rec = {'stage' : name, 'path' : path, 'chunk' : chunk, 'entries' : None, 'peak_rss' : 0}
+        rd_start, wt_start = pin.get_io()
+        # The peak since the last reset goes to the stages running, before it is lost
+        self._update_peak_rss()
+        pin.reset_peak_rss()
+        self._l_open.append(rec)
+        start = time.perf_counter()
+        try:
+            yield rec
+        finally:
+            seconds = time.perf_counter() - start
+            rd_end, wt_end = pin.get_io()
+
+            rec['seconds'] = seconds
+            rec.setdefault('bytes_read'   , rd_end - rd_start)
+            rec.setdefault('bytes_written', wt_end - wt_start)
+            rec['rate']    = None if rec['entries'] is None or seconds == 0 else rec['entries'] / seconds
+
+            self._update_peak_rss()
+            self._l_open.remove(rec)
+
+            self._l_record.append(rec)
+            log.debug(f'{name:<20}{seconds:>10.3f} s')
+    # ----------------------------------------
+    def _get_stages(self) -> dict[str,dict]:
+        '''
+        Returns dictionary with stage as key and totals for that stage as value
+        '''
+        d_stage = {}
+        for rec in self._l_record:
+            d_total = d_stage.setdefault(rec['stage'], {'calls' : 0, 'seconds' : 0., 'entries' : 0, 'bytes_read' : 0, 'bytes_written' : 0, 'peak_rss' : 0})
+            d_total['calls']         += 1
+            d_total['seconds']       += rec['seconds']
+            d_total['entries']       += 0 if rec['entries'] is None else rec['entries']
+            d_total['bytes_read']    += rec['bytes_read']
+            d_total['bytes_written'] += rec['bytes_written']
+            d_total['peak_rss']       = max(d_total['peak_rss'], rec['peak_rss'])
+
+        for d_total in d_stage.values():
+            d_total['rate'] = None if d_total['seconds'] == 0 else d_total['entries'] / d_total['seconds']
+
+        return d_stage
+    # ----------------------------------------
+    def to_dict(self) -> dict:
+        '''
+        Returns dictionary with labels, totals for the job, totals per stage and every measurement
+        '''
+        rd_end, wt_end = pin.get_io()
+
+        return {
+                'labels'       : self._d_label,
+                'wall_seconds' : time.time() - self._start,
+                'bytes_read'   : rd_end - self._io_start[0],
+                'bytes_written': wt_end - self._io_start[1],
+                'peak_rss'     : self.get_peak_rss(),
+                'stages'       : self._get_stages(),
+                'records'      : self._l_record}
+    # ----------------------------------------
+    def _get_prometheus_lines(self, d_report : dict) -> list[str]:
+        label = ','.join( f'{key}="{val}"' for key, val in sorted(self._d_label.items()) )
+        pref  = RunReport.prefix
+
+        l_line = []
+        for name, value, kind, help_str in [
+                ('wall_seconds'       , d_report['wall_seconds' ], 'gauge'  , 'Time since the job started'),
+                ('read_bytes_total'   , d_report['bytes_read'   ], 'counter', 'Bytes read by the job'),
+                ('written_bytes_total', d_report['bytes_written'], 'counter', 'Bytes written by the job'),
+                ('peak_rss_bytes'     , d_report['peak_rss'     ], 'gauge'  , 'Peak resident memory of the job')]:
+            l_line.append(f'# HELP {pref}_{name} {help_str}')
+            l_line.append(f'# TYPE {pref}_{name} {kind}')
+            l_line.append(f'{pref}_{name}{{{label}}} {value}')
+
+        for name, help_str in [
+                ('seconds'      , 'Time spent in each stage'),
+                ('calls'        , 'Number of times each stage ran'),
+                ('entries'      , 'Entries processed by each stage'),
+                ('bytes_read'   , 'Bytes read by each stage'),
+                ('bytes_written', 'Bytes written by each stage'),
+                ('peak_rss'     , 'Peak resident memory, in bytes, while running each stage')]:
+            l_line.append(f'# HELP {pref}_stage_{name} {help_str}')
+            l_line.append(f'# TYPE {pref}_stage_{name} gauge')
+            for stage, d_total in sorted(d_report['stages'].items()):
+                stage_label = f'{label},stage="{stage}"' if label != '' else f'stage="{stage}"'
+                l_line.append(f'{pref}_stage_{name}{{{stage_label}}} {d_total[name]}')
+
+        return l_line
+    # ----------------------------------------
+    def _write(self, path : str, text : str) -> None:
+        '''
+        Writes text to temporary file and renames it, such that readers never see partial files
+        '''
+        dir_name = os.path.dirname(path)
+        if dir_name != '':
+            os.makedirs(dir_name, exist_ok=True)
+
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as ofile:
+            ofile.write(text)
+
+        os.replace(tmp_path, path)
+    # ----------------------------------------
+    def save(self, path : str, prometheus : Union[str,None] = None) -> dict:
+        '''
+        Saves report to JSON file and, if a path is passed in `prometheus`, to a Prometheus textfile, e.g. `job.prom`
+        Returns the report as a dictionary
+        '''
+        d_report = self.to_dict()
+        self._write(path, json.dumps(d_report, indent=4))
+        log.info(f'Saved report to: {path}')
+
+        if prometheus is not None:
+            l_line = self._get_prometheus_lines(d_report)
+            self._write(prometheus, '\n'.join(l_line) + '\n')
+            log.info(f'Saved Prometheus metrics to: {prometheus}')
+
+        return d_report
+    # ----------------------------------------
+    def print_summary(self) -> None:
+        '''
+        Prints table with totals per stage
+        '''
+        log.info(70 * '-')
+        log.info(f'{"Stage":<20}{"Calls":>8}{"Seconds":>12}{"Entries":>14}{"Entries/s":>16}')
+        log.info(70 * '-')
+        for stage, d_total in self._get_stages().items():
+            rate = '' if d_total['rate'] is None else f'{d_total["rate"]:.3e}'
+            log.info(f'{stage:<20}{d_total["calls"]:>8}{d_total["seconds"]:>12.3f}{d_total["entries"]:>14}{rate:>16}')
+        log.info(70 * '-')
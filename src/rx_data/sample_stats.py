@@ -0,0 +1,175 @@
+'''
+Module containing SampleStats class
+'''
+import os
+from concurrent.futures    import ThreadPoolExecutor
+from typing                import Union
+
+import pandas as pnd
+from dmu.logging.log_store import LogStore
+from rx_data               import utilities as ut
+from rx_data.file_cache    import FileCache
+from rx_data.stats         import Stats
+
+log = LogStore.add_logger('rx_data:sample_stats')
+# ------------------------------------------
+class SampleStats:
+    '''
+    Class meant to calculate, for each sample and trigger in a YAML file with lists of samples:
+
+    - Number of files
+    - Size in bytes
+    - Optionally, number of entries in tree and bytes per entry
+    - Optionally, size of each branch, compressed and uncompressed
+
+    The files are accessed concurrently. The entries and branch sizes are read
+    from the metadata of the trees and cached per file, in the cache of `Stats`
+    '''
+    # ------------------------------------------
+    def __init__(
+            self,
+            samples_path : str,
+            tree         : str  = 'DecayTree',
+            entries      : bool = False,
+            branches     : bool = False,
+            nthreads     : int  = 16):
+        '''
+        samples_path: Path to YAML file with {sample : {trigger : [path_1, path_2...]}}
+        tree        : Name of tree used to get entries and branch sizes
+        entries     : If True, will read number of entries
+        branches    : If True, will read sizes of branches
+        nthreads    : Number of threads used to access files
+        '''
+        self._samples_path = samples_path
+        self._tree         = tree
+        self._entries      = entries
+        self._branches     = branches
+        self._nthreads     = nthreads
+
+        self._d_data : dict[str,dict[str,list[str]]] = {}
+        self._d_file : dict[str,dict] = {}
+    # ------------------------------------------
+    @staticmethod
+    def _get_size(path : str) -> int:
+        identity = FileCache.identity(path)
+        if identity is None:
+            raise FileNotFoundError(f'Cannot access: {path}')
+
+        _, size, _ = identity
+
+        return size
+    # ------------------------------------------
+    def _load_files(self) -> dict[str,dict]:
+        '''
+        Returns dictionary mapping path to dictionary with size, entries and branch sizes of file,
+        the latter two only if requested
+        '''
+        if len(self._d_file) != 0:
+            return self._d_file
+
+        d_data = ut.load_yaml(self._samples_path)
+        l_path = sorted({ path for d_trigger in d_data.values() for l_path in d_trigger.values() for path in l_path })
+        npath  = len(l_path)
+        log.info(f'Reading information from {npath} files with {self._nthreads} threads')
+
+        with ThreadPoolExecutor(max_workers=self._nthreads) as pool:
+            l_size = list(pool.map(SampleStats._get_size, l_path))
+
+        d_file = { path : {'size' : size} for path, size in zip(l_path, l_size) }
+        if self._entries:
+            d_entry = Stats.get_file_entries(l_path, tree=self._tree, nthreads=self._nthreads)
+            for path, nentries in d_entry.items():
+                d_file[path]['entries'] = nentries
+
+        if self._branches:
+            d_branch = Stats.get_file_branches(l_path, tree=self._tree, nthreads=self._nthreads)
+            for path, d_size in d_branch.items():
+                d_file[path]['branches'] = d_size
+
+        self._d_file = d_file
+        self._d_data = d_data
+
+        return self._d_file
+    # ------------------------------------------
+    def get_df(self) -> pnd.DataFrame:
+        '''
+        Returns dataframe with columns Sample, Trigger, Files, Bytes and, if entries were requested,
+        Entries and BytesPerEntry. Sorted by size in decreasing order.
+        '''
+        d_file = self._load_files()
+        l_row  = []
+        for sample, d_trigger in self._d_data.items():
+            for trigger, l_path in d_trigger.items():
+                row = {'Sample' : sample, 'Trigger' : trigger, 'Files' : len(l_path)}
+                row['Bytes'] = sum(d_file[path]['size'] for path in l_path)
+
+                if self._entries:
+                    nentries = sum(d_file[path]['entries'] for path in l_path)
+                    row['Entries'      ] = nentries
+                    row['BytesPerEntry'] = row['Bytes'] / nentries if nentries > 0 else float('nan')
+
+                l_row.append(row)
+
+        df = pnd.DataFrame(l_row)
+        df = df.sort_values(by='Bytes', ascending=False, ignore_index=True)
+
+        return df
+    # ------------------------------------------
+    def get_branch_df(self) -> pnd.DataFrame:
+        '''
+        Returns dataframe with columns Sample, Trigger, Branch, Compressed and Uncompressed,
+        with the sizes in bytes of each branch, summed over files
+        '''
+        if not self._branches:
+            raise ValueError('Branch sizes were not requested')
+
+        d_file = self._load_files()
+        l_row  = []
+        for sample, d_trigger in self._d_data.items():
+            for trigger, l_path in d_trigger.items():
+                d_size = {}
+                for path in l_path:
+                    for branch, [comp, ucomp] in d_file[path]['branches'].items():
+                        old_comp, old_ucomp = d_size.get(branch, [0, 0])
+                        d_size[branch] = [old_comp + comp, old_ucomp + ucomp]
+
+                l_row += [ {'Sample' : sample, 'Trigger' : trigger, 'Branch' : branch, 'Compressed' : comp, 'Uncompressed' : ucomp}
+                          for branch, [comp, ucomp] in d_size.items() ]
+
+        df = pnd.DataFrame(l_row, columns=['Sample', 'Trigger', 'Branch', 'Compressed', 'Uncompressed'])
+        df = df.sort_values(by='Compressed', ascending=False, ignore_index=True)
+
+        return df
+    # ------------------------------------------
+    @staticmethod
+    def save(df : pnd.DataFrame, path : str, formats : Union[list[str],None] = None) -> None:
+        '''
+        Saves dataframe
+
+        path   : Path to output without extension, e.g. /some/dir/stats
+        formats: List of formats among md, csv and parquet, by default all
+        '''
+        formats = ['md', 'csv', 'parquet'] if formats is None else formats
+
+        out_dir = os.path.dirname(path)
+        if out_dir != '':
+            os.makedirs(out_dir, exist_ok=True)
+
+        for fmt in formats:
+            out_path = f'{path}.{fmt}'
+            if   fmt == 'md':
+                with open(out_path, 'w', encoding='utf-8') as ofile:
+                    ofile.write(df.to_markdown(index=False))
+            elif fmt == 'csv':
+                df.to_csv(out_path, index=False)
+            elif fmt == 'parquet':
+                try:
+                    df.to_parquet(out_path, index=False)
+                except ImportError:
+                    log.warning(f'Cannot save {out_path}, no Parquet engine found, install pyarrow')
+                    continue
+            else:
+                raise ValueError(f'Invalid format: {fmt}')
+
+            log.info(f'Saved: {out_path}')
+# ------------------------------------------
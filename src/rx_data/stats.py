@@ -1,18 +1,32 @@
 '''
 Module with Stats class
 '''
-import yaml
-from ROOT                  import RDataFrame
-from dmu.generic           import version_management as vman
+import os
+import fnmatch
+from concurrent.futures    import ThreadPoolExecutor
+from functools             import partial
+from typing                import Any, Callable, Union
+
+import uproot
 from dmu.logging.log_store import LogStore
+from rx_data               import utilities as ut
+from rx_data.file_cache    import FileCache
 
 log=LogStore.add_logger('rx_data:stats')
 # ----------------------------------------
 class Stats:
     '''
     Class meant to provide number of candidates
+
+    The number of entries is read from the metadata of the trees, in parallel,
+    and cached in a JSON file, such that only new or changed files are opened
     '''
-    d_sample : dict[str:str] = {}
+    d_sample : dict[str,str] = {}
+    cache_dir  = os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache'))
+    cache_path = f'{cache_dir}/rx_data/stats/entries.json'
+    nthreads   = 8
+
+    d_data : dict[str,tuple[int,dict]] = {}
     # ----------------------------------------
     def __init__(self, sample : str, trigger : str):
         '''
@@ -22,14 +36,27 @@ class Stats:
         self._sample  = sample
         self._trigger = trigger
     # ----------------------------------------
-    def _get_paths(self) -> list[str]:
+    @staticmethod
+    def _get_samples() -> dict[str,dict[str,list[str]]]:
+        '''
+        Returns dictionary with lists of paths for main trees, the YAML file is
+        only read again if it changed
+        '''
         if 'main' not in Stats.d_sample:
             raise ValueError('Cannot find main section among samples')
 
         yaml_path = Stats.d_sample['main']
+        mtime     = os.stat(yaml_path).st_mtime_ns
+        if yaml_path in Stats.d_data and Stats.d_data[yaml_path][0] == mtime:
+            return Stats.d_data[yaml_path][1]
 
-        with open(yaml_path, encoding='utf-8') as ifile:
-            d_data = yaml.safe_load(ifile)
+        d_data = ut.load_yaml(yaml_path)
+        Stats.d_data[yaml_path] = mtime, d_data
+
+        return d_data
+    # ----------------------------------------
+    def _get_paths(self) -> list[str]:
+        d_data = Stats._get_samples()
 
         if self._sample not in d_data:
             raise ValueError(f'Cannot find {self._sample} in list of samples')
@@ -45,14 +72,132 @@ class Stats:
 
         return l_path
     # ----------------------------------------
+    @staticmethod
+    def _read_entries(path : str, tree : str) -> int:
+        with uproot.open(path) as rfile:
+            nentries = rfile[tree].num_entries
+
+        return nentries
+    # ----------------------------------------
+    @staticmethod
+    def _read_branches(path : str, tree : str) -> dict[str,list[int]]:
+        with uproot.open(path) as rfile:
+            d_branch = { branch.name : [branch.compressed_bytes, branch.uncompressed_bytes] for branch in rfile[tree].branches }
+
+        return d_branch
+    # ----------------------------------------
+    @staticmethod
+    def _get_file_values(
+            l_path   : list[str],
+            key      : str,
+            reader   : Callable[[str],Any],
+            nthreads : Union[int,None]) -> dict[str,Any]:
+        '''
+        Returns dictionary mapping path to value stored under key in the cache entry of the file.
+        Values missing in the cache are read, in parallel, with `reader`, which takes the path
+        '''
+        cache   = FileCache(path=Stats.cache_path)
+        d_value = {}
+        d_tree  = {}
+        l_miss  = []
+        for path in l_path:
+            d_tree[path] = cache.get(path) or {}
+            if key in d_tree[path]:
+                d_value[path] = d_tree[path][key]
+            else:
+                l_miss.append(path)
+
+        nmiss  = len(l_miss)
+        ncache = len(d_value)
+        log.debug(f'Reading {key} from {nmiss} files, found {ncache} in cache')
+        if nmiss == 0:
+            return d_value
+
+        nthreads = Stats.nthreads if nthreads is None else nthreads
+        with ThreadPoolExecutor(max_workers=nthreads) as pool:
+            l_value = list(pool.map(reader, l_miss))
+
+        for path, value in zip(l_miss, l_value):
+            d_value[path] = value
+            cache.set(path, {**d_tree[path], key : value})
+
+        cache.save()
+
+        return d_value
+    # ----------------------------------------
+    @staticmethod
+    def get_file_entries(l_path : list[str], tree : str, nthreads : Union[int,None] = None) -> dict[str,int]:
+        '''
+        Parameters
+        ----------------
+        l_path  : List of paths to ROOT files
+        tree    : Name of tree
+        nthreads: Number of threads used to read files missing in cache, by default `Stats.nthreads`
+
+        Returns
+        ----------------
+        Dictionary mapping path to number of entries in tree
+        '''
+        reader = partial(Stats._read_entries, tree=tree)
+
+        return Stats._get_file_values(l_path, key=tree, reader=reader, nthreads=nthreads)
+    # ----------------------------------------
+    @staticmethod
+    def get_file_branches(l_path : list[str], tree : str, nthreads : Union[int,None] = None) -> dict[str,dict[str,list[int]]]:
+        '''
+        Parameters
+        ----------------
+        l_path  : List of paths to ROOT files
+        tree    : Name of tree
+        nthreads: Number of threads used to read files missing in cache, by default `Stats.nthreads`
+
+        Returns
+        ----------------
+        Dictionary mapping path to dictionary between branch name and [compressed, uncompressed] size in bytes.
+        These are stored in the same cache entry as the number of entries, under `<tree>/branches`
+        '''
+        reader = partial(Stats._read_branches, tree=tree)
+
+        return Stats._get_file_values(l_path, key=f'{tree}/branches', reader=reader, nthreads=nthreads)
+    # ----------------------------------------
     def get_entries(self, tree : str) -> int:
         '''
         Takes tree name, returns number of entries
         '''
+        l_path  = self._get_paths()
+        d_entry = Stats.get_file_entries(l_path, tree)
+
+        return sum(d_entry.values())
+    # ----------------------------------------
+    @staticmethod
+    def get_sample_entries(samples : list[str], triggers : list[str], tree : str) -> dict[tuple[str,str],int]:
+        '''
+        Parameters
+        ----------------
+        samples : List of samples, accepts wildcards, e.g. Bu_*
+        triggers: List of HLT2 triggers, accepts wildcards
+        tree    : Name of tree, e.g. MCDecayTree
+
+        Returns
+        ----------------
+        Dictionary mapping (sample, trigger) to number of entries, for all
+        the samples and triggers in the main YAML file matching the arguments
+        '''
+        d_data = Stats._get_samples()
+        d_path = {}
+        for sample, d_trigger in d_data.items():
+            if not any(fnmatch.fnmatch(sample, pattern) for pattern in samples):
+                continue
+
+            for trigger, l_path in d_trigger.items():
+                if any(fnmatch.fnmatch(trigger, pattern) for pattern in triggers):
+                    d_path[(sample, trigger)] = l_path
+
+        if len(d_path) == 0:
+            raise ValueError(f'No sample found for {samples} and {triggers}')
 
-        l_path = self._get_paths()
-        rdf    = RDataFrame(tree, l_path)
-        val    = rdf.Count().GetValue()
+        l_path  = [ path for l_path in d_path.values() for path in l_path ]
+        d_entry = Stats.get_file_entries(l_path, tree)
 
-        return val
+        return { key : sum(d_entry[path] for path in l_path) for key, l_path in d_path.items() }
 # ----------------------------------------
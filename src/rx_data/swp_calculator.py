@@ -2,6 +2,7 @@
 Module with class used to swap mass hypotheses
 '''
 
+import numpy
 import pandas as pnd
 from ROOT                  import RDataFrame, RDF
 from tqdm                  import tqdm
@@ -153,10 +154,10 @@ class SWPCalculator:
 
         return sr_mass
     #---------------------------------
-    def get_rdf(self,
-                preffix      : str,
-                progress_bar : bool = False,
-                use_ss       : bool = False) -> RDataFrame:
+    def get_data(self,
+                 preffix      : str,
+                 progress_bar : bool = False,
+                 use_ss       : bool = False) -> dict[str,numpy.ndarray]:
         '''
         Parameters:
         ------------------
@@ -166,7 +167,7 @@ class SWPCalculator:
 
         Returns:
         ------------------
-        Pandas dataframe with orignal and swapped masses, i.e. masses after the mass hypothesis swap
+        Dictionary with arrays of orignal and swapped masses, i.e. masses after the mass hypothesis swap, and run and event numbers
         '''
         if use_ss:
             log.warning('Building candidates from Same Sign tracks')
@@ -185,6 +186,16 @@ class SWPCalculator:
         d_extra = self._rdf.AsNumpy(self._extra_branches)
         d_data.update(d_extra)
 
+        return d_data
+    #---------------------------------
+    def get_rdf(self,
+                preffix      : str,
+                progress_bar : bool = False,
+                use_ss       : bool = False) -> RDataFrame:
+        '''
+        Same as `get_data`, but returns ROOT dataframe
+        '''
+        d_data = self.get_data(preffix=preffix, progress_bar=progress_bar, use_ss=use_ss)
         rdf    = RDF.FromNumpy(d_data)
 
         return rdf
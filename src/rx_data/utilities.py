@@ -1,16 +1,28 @@
 '''
 Module with utility functions
+
+This module is imported by the command line scripts that only need to parse paths,
+thus pandas and ROOT are only imported when the dataframe utilities are used
 '''
 # pylint: disable=too-many-return-statements
+# pylint: disable=import-outside-toplevel
+
+from __future__ import annotations
 
 import os
 import re
+from typing                 import TYPE_CHECKING, Union
+from functools              import lru_cache
 from dataclasses            import dataclass
 
-import pandas as pnd
-from ROOT                   import RDataFrame
+import yaml
 from dmu.logging.log_store  import LogStore
 
+if TYPE_CHECKING:
+    import numpy
+    import pandas as pnd
+    from ROOT import RDataFrame
+
 log   = LogStore.add_logger('rx_data:utilities')
 # ---------------------------------
 @dataclass
@@ -23,6 +35,23 @@ class Data:
 
     dt_rgx  = r'(data_\d{2}_.*c\d)_(Hlt2RD_.*(?:EE|MuMu|misid|cal|MVA|LL|DD))_?(\d{3}_\d{3}|[a-z0-9]{10})?\.root'
     mc_rgx  = r'mc_.*_\d{8}_(.*)_(\w+RD_.*)_(\d{3}_\d{3}|\w{10}).root'
+
+    # Single pattern for data and MC, groups 1-3 are filled for data and 4-6 for MC
+    rgx_cre = re.compile(f'(?:{dt_rgx})|(?:{mc_rgx})')
+
+    # Strings that YAML writes without quotes, e.g. paths, sample and trigger names
+    pln_cre = re.compile(r'[A-Za-z_/][\w/.:@+=-]*')
+    l_bool  = ['yes', 'no', 'true', 'false', 'on', 'off', 'null']
+
+    # LibYAML is much faster, use it when PyYAML was built with it
+    yaml_loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+# ---------------------------------
+class IndentListDumper(yaml.SafeDumper):
+    '''
+    Class needed to implement indentation correctly in dumped yaml files
+    '''
+    def increase_indent(self, flow=False, indentless=False):
+        return super().increase_indent(flow, False)
 # ---------------------------------
 def is_mc(sample : str) -> bool:
     '''
@@ -113,81 +142,230 @@ def info_from_path(path : str) -> tuple[str,str]:
     Will return tuple with information associated to file
     This is needed to name output file and directories
     '''
-
     name = os.path.basename(path)
-    if   name.startswith('dt_') or name.startswith('data_'):
-        info = _info_from_data_path(path)
-    elif name.startswith('mc_'):
-        info = _info_from_mc_path(path)
-    else:
-        log.error(f'File name is not for data or MC: {name}')
-        raise ValueError
-
-    return info
+    info = _parse_name(name)
+    if info is None:
+        _raise_parsing_error(name)
+
+    sample, line, _ = info
+
+    return sample, line
 # ---------------------------------
-def _info_from_mc_path(path : str) -> tuple[str,str]:
+def info_from_paths(paths : list[str], raise_on_fail : bool = True) -> dict[str,list]:
     '''
-    Will return information from path to file
+    Batch version of `info_from_path`
+
+    Parameters
+    -------------
+    paths        : List of paths to ROOT files, LFNs or PFNs
+    raise_on_fail: If True (default) will raise ValueError for paths that cannot be parsed, otherwise their values will be None
+
+    Returns
+    -------------
+    Dictionary with columns `sample`, `line` and `hash`, with one entry per path
     '''
-    name = os.path.basename(path)
-    mtch = re.match(Data.mc_rgx, name)
-    if not mtch:
-        raise ValueError(f'Cannot extract information from MC file:\n\n{name}\n\nUsing {Data.mc_rgx}')
+    l_info = [ _parse_name(path.rpartition('/')[2]) for path in paths ]
 
-    try:
-        [sample, line, _] = mtch.groups()
-    except ValueError as exc:
-        raise ValueError(f'Expected three elements in: {mtch.groups()}') from exc
+    if raise_on_fail and None in l_info:
+        path = paths[l_info.index(None)]
+        _raise_parsing_error(os.path.basename(path))
 
-    return sample, line
+    l_none = (None, None, None)
+    l_info = [ l_none if info is None else info for info in l_info ]
+
+    if len(l_info) == 0:
+        return {'sample' : [], 'line' : [], 'hash' : []}
+
+    l_sample, l_line, l_hash = zip(*l_info)
+
+    return {'sample' : list(l_sample), 'line' : list(l_line), 'hash' : list(l_hash)}
 # ---------------------------------
-def _info_from_data_path(path : str) -> tuple[str,str]:
+@lru_cache(maxsize=2 ** 16)
+def _parse_name(name : str) -> Union[tuple[str,str,Union[str,None]], None]:
     '''
-    Will get info from data path
+    Takes name of ROOT file, returns sample, HLT2 line and hash or None if the name cannot be parsed.
+    Results are memoized, the same names show up for every kind of friend tree. The cache is bounded,
+    large enough for all the names in one version of the LFNs
     '''
-    name = os.path.basename(path)
-    mtch = re.match(Data.dt_rgx, name)
+    mtch = Data.rgx_cre.match(name)
     if not mtch:
-        raise ValueError(f'Cannot find kind in:\n\n{name}\n\nusing\n\n{Data.dt_rgx}')
+        return None
 
-    try:
-        [sample, line, _] = mtch.groups()
-    except ValueError as exc:
-        raise ValueError(f'Expected three elements in: {mtch.groups()}') from exc
+    if mtch.group(1) is None:
+        [sample, line, hsh] = mtch.groups()[3:]
 
+        return sample, line, hsh
+
+    [sample, line, hsh] = mtch.groups()[:3]
     sample = sample.replace('_turbo_', '_')
     sample = sample.replace('_full_' , '_')
 
-    return sample, line
+    return sample, line, hsh
+# ---------------------------------
+def _raise_parsing_error(name : str) -> None:
+    if name.startswith('dt_') or name.startswith('data_'):
+        raise ValueError(f'Cannot find kind in:\n\n{name}\n\nusing\n\n{Data.dt_rgx}')
+
+    if name.startswith('mc_'):
+        raise ValueError(f'Cannot extract information from MC file:\n\n{name}\n\nUsing {Data.mc_rgx}')
+
+    log.error(f'File name is not for data or MC: {name}')
+    raise ValueError(f'File name is not for data or MC: {name}')
+# ---------------------------------
+def load_yaml(path : str) -> Union[dict,list]:
+    '''
+    Reads YAML file, e.g. with lists of samples, using LibYAML if available
+    '''
+    with open(path, encoding='utf-8') as ifile:
+        data = yaml.load(ifile, Loader=Data.yaml_loader) # nosec B506, loader is always a safe one
+
+    return data
+# ---------------------------------
+def dump_samples(d_struc : dict[str,dict[str,list[str]]], path : str) -> None:
+    '''
+    Writes dictionary {sample : {trigger : [path_1, path_2...]}} to YAML file
+    in the format written by `IndentListDumper`.
+
+    The file is written line by line, if any value would need quoting,
+    e.g. path with spaces, the whole dictionary is dumped with `IndentListDumper`
+    '''
+    l_line = _get_sample_lines(d_struc)
+    with open(path, 'w', encoding='utf-8') as ofile:
+        if l_line is None:
+            log.debug('Found values that need quoting, using IndentListDumper')
+            yaml.dump(d_struc, ofile, Dumper=IndentListDumper, default_flow_style=False)
+            return
+
+        ofile.write('\n'.join(l_line))
+        ofile.write('\n')
+# ---------------------------------
+def _get_sample_lines(d_struc : dict) -> Union[list[str],None]:
+    '''
+    Returns lines of YAML file with lists of samples, None if these cannot be written without quoting
+    '''
+    if not isinstance(d_struc, dict) or len(d_struc) == 0:
+        return None
+
+    l_line = []
+    for sample in sorted(d_struc):
+        d_trig = d_struc[sample]
+        if not _is_plain(sample, is_key=True) or not isinstance(d_trig, dict) or len(d_trig) == 0:
+            return None
+
+        l_line.append(f'{sample}:')
+        for trigger in sorted(d_trig):
+            l_path = d_trig[trigger]
+            if not _is_plain(trigger, is_key=True) or not isinstance(l_path, list) or len(l_path) == 0:
+                return None
+
+            l_line.append(f'  {trigger}:')
+            for path in l_path:
+                if not _is_plain(path):
+                    return None
+
+                l_line.append(f'    - {path}')
+
+    return l_line
 # ---------------------------------
-def df_from_rdf(rdf : RDataFrame) -> pnd.DataFrame:
+def _is_plain(value, is_key : bool = False) -> bool:
+    '''
+    Checks if value is a string that YAML would write without quotes
+    is_key: If True, will also check that YAML would write it as a simple key
+    '''
+    if not isinstance(value, str):
+        return False
+
+    # Longer keys are written as complex keys, i.e. `? key`
+    if is_key and len(value) >= 128:
+        return False
+
+    if value.endswith(':') or value.lower() in Data.l_bool:
+        return False
+
+    return Data.pln_cre.fullmatch(value) is not None
+# ---------------------------------
+def df_from_rdf(
+        rdf     : RDataFrame,
+        columns : Union[list[str],None] = None,
+        float32 : Union[bool,list[str]] = False) -> pnd.DataFrame:
     '''
     Utility method needed to get pandas dataframe from ROOT dataframe
+
+    rdf    : ROOT dataframe
+    columns: Columns to read, by default, the ones needed by the correctors and calculators
+    float32: If True, all double precision columns will be stored as single precision, to halve the memory, if list, only those columns
     '''
+    import pandas as pnd
+
     rdf    = _preprocess_rdf(rdf)
-    l_col  = [ name.c_str() for name in rdf.GetColumnNames() if _pick_column(name.c_str()) ]
-    d_data = rdf.AsNumpy(l_col)
-    df     = pnd.DataFrame(d_data)
+    d_data = _get_arrays(rdf, columns, float32)
+    df     = pnd.DataFrame(d_data, copy=False)
+
+    return df
+# ---------------------------------
+def _use_float32(
+        name    : str,
+        arr     : numpy.ndarray,
+        float32 : Union[bool,list[str]]) -> bool:
+    '''
+    Returns true if the column should be stored with single precision
+    '''
+    import numpy
+
+    if arr.dtype != numpy.float64:
+        return False
+
+    if isinstance(float32, bool):
+        return float32
+
+    return name in float32
+# ---------------------------------
+def _get_arrays(
+        rdf     : RDataFrame,
+        columns : Union[list[str],None],
+        float32 : Union[bool,list[str]]) -> dict[str,numpy.ndarray]:
+    '''
+    Returns dictionary with arrays for each column, without the entries where any column is NaN
+    '''
+    import numpy
+
+    if columns is None:
+        columns = [ name.c_str() for name in rdf.GetColumnNames() if _pick_column(name.c_str()) ]
+
+    d_data = rdf.AsNumpy(columns)
+    if float32:
+        d_data = { name : arr.astype(numpy.float32, copy=False) if _use_float32(name, arr, float32) else arr for name, arr in d_data.items() }
+
+    ntot   = len(next(iter(d_data.values()), []))
+    is_nan = numpy.zeros(ntot, dtype=bool)
+    d_nnan = {}
+    for name, arr in d_data.items():
+        if arr.dtype.kind != 'f':
+            continue
+
+        arr_nan = numpy.isnan(arr)
+        nnan    = numpy.count_nonzero(arr_nan)
+        if nnan > 0:
+            d_nnan[name] = nnan
+            is_nan      |= arr_nan
+
+    if len(d_nnan) == 0:
+        return d_data
 
-    ntot     = len(df)
-    has_nans = False
     log.debug(60 * '-')
     log.debug(f'{"Variable":<20}{"NaNs":<20}{"%":<20}')
     log.debug(60 * '-')
-    for name, sr in df.items():
-        nnan = sr.isna().sum()
+    for name, nnan in d_nnan.items():
         perc = 100 * nnan / ntot
-        if perc > 0:
-            has_nans = True
-            log.debug(f'{name:<20}{nnan:<20}{perc:<20.2f}')
+        log.debug(f'{name:<20}{nnan:<20}{perc:<20.2f}')
     log.debug(60 * '-')
 
-    if has_nans:
-        df   = df.dropna()
-        ndrp = len(df)
-        log.warning(f'Dropping columns with NaNs {ntot} -> {ndrp}')
+    is_good = ~is_nan
+    d_data  = { name : arr[is_good] for name, arr in d_data.items() }
+    ndrp    = numpy.count_nonzero(is_good)
+    log.warning(f'Dropping columns with NaNs {ntot} -> {ndrp}')
 
-    return df
+    return d_data
 # ------------------------------------------
 def _preprocess_rdf(rdf: RDataFrame) -> RDataFrame:
     rdf = _preprocess_lepton(rdf, 'L1')
@@ -14,16 +14,22 @@ from typing      import Union
 from dataclasses import dataclass
 
 import tqdm
+import numpy
 import dmu.generic.utilities as gut
-from ROOT                   import RDataFrame, TFileMerger
+from ROOT                   import RDataFrame
 from dmu.logging.log_store  import LogStore
 from dmu.generic            import version_management as vman
 
+from rx_data                     import utilities as ut
 from rx_data.rdf_getter          import RDFGetter
 from rx_data.mis_calculator      import MisCalculator
 from rx_data.hop_calculator      import HOPCalculator
 from rx_data.swp_calculator      import SWPCalculator
 from rx_data.mass_bias_corrector import MassBiasCorrector
+from rx_data.column_writer       import ColumnWriter
+from rx_data.run_report          import RunReport
+from rx_data.chunk_checkpoint    import ChunkCheckpoint
+from rx_data.file_cache          import FileCache
 
 log = LogStore.add_logger('rx_data:branch_calculator')
 # ---------------------------------
@@ -41,6 +47,12 @@ class Data:
     lvl  : int
     wild_card : str
     chunk_size: int
+    rerun     : str
+    fmt       : str
+    comp      : Union[str,None]
+    bsize     : Union[int,None]
+    prom      : Union[str,None]
+    report    : RunReport
 
     l_kind    = ['hop', 'swp_jpsi_misid', 'swp_cascade', 'ecalo_bias', 'brem_track_1', 'brem_track_2']
     l_ecorr   = ['ecalo_bias', 'brem_track_1', 'brem_track_2']
@@ -56,11 +68,16 @@ def _parse_args() -> None:
     parser.add_argument('-k', '--kind', type=str, help='Kind of branch to create', choices=Data.l_kind, required=True)
     parser.add_argument('-v', '--vers', type=str, help='Version of outputs', required=True)
     parser.add_argument('-w', '--wc'  , type=str, help='Wildcard, if passed will be used to match paths')
+    parser.add_argument('-r', '--rerun',type=str, help='Path to YAML file made by check_missing, if passed, will only process the main files listed for this kind')
     parser.add_argument('-n', '--nmax', type=int, help='If used, limit number of entries to process to this value')
     parser.add_argument('-s', '--chunk',type=int, help='It will set the chunk size, dataframes will be split before processing', default=100_000)
     parser.add_argument('-p', '--part', nargs= 2, help='Partitioning, first number is the index, second is the number of parts', required=True)
     parser.add_argument('-b', '--pbar',           help='If used, will show progress bar whenever it is available', action='store_true')
     parser.add_argument('-d', '--dry' ,           help='If used, will do dry drun, e.g. stop before processing', action='store_true')
+    parser.add_argument('-f', '--fmt' , type=str, help='Format of outputs', choices=ColumnWriter.l_format, default='root')
+    parser.add_argument('-c', '--comp', type=str, help='Compression of outputs, e.g. zstd:5 or lz4, by default ZLIB:1 for ROOT and snappy for Parquet')
+    parser.add_argument('-B', '--bsize',type=int, help='Maximum number of entries per basket or row group, by default one per chunk')
+    parser.add_argument('-P', '--prom', type=str, help='If passed, will also save metrics of the job to this Prometheus textfile, e.g. /path/to/job.prom')
     parser.add_argument('-l', '--lvl' , type=int, help='log level', choices=[10, 20, 30], default=20)
     args = parser.parse_args()
 
@@ -73,6 +90,11 @@ def _parse_args() -> None:
     Data.lvl  = args.lvl
     Data.wild_card = args.wc
     Data.chunk_size= args.chunk
+    Data.rerun     = args.rerun
+    Data.fmt       = args.fmt
+    Data.comp      = args.comp
+    Data.bsize     = args.bsize
+    Data.prom      = args.prom
 
     LogStore.set_level('rx_data:branch_calculator', Data.lvl)
 # ---------------------------------
@@ -141,9 +163,28 @@ def _filter_paths(l_path : list[str]) -> list[str]:
 
     return l_path
 # ---------------------------------
+def _get_rerun_paths() -> list[str]:
+    '''
+    Returns list of paths to main files, whose friends are missing, for current kind
+    '''
+    d_path = ut.load_yaml(Data.rerun)
+    if Data.kind not in d_path:
+        raise ValueError(f'Kind {Data.kind} not found in: {Data.rerun}')
+
+    l_path = d_path[Data.kind]
+    npath  = len(l_path)
+    log.info(f'Found {npath} paths with missing friends in: {Data.rerun}')
+
+    return l_path
+# ---------------------------------
 def _get_paths() -> list[str]:
-    data_dir = vman.get_last_version(dir_path=f'{Data.ana_dir}/Data/main', version_only=False)
-    l_path   = glob.glob(f'{data_dir}/*.root')
+    if Data.rerun is None:
+        data_dir = vman.get_last_version(dir_path=f'{Data.ana_dir}/Data/main', version_only=False)
+        l_path   = glob.glob(f'{data_dir}/*.root')
+    else:
+        data_dir = Data.rerun
+        l_path   = _get_rerun_paths()
+
     l_path   = _filter_paths(l_path)
     l_path   = _get_partition(l_path)
 
@@ -165,6 +206,9 @@ def _get_out_dir() -> str:
 # ---------------------------------
 def _get_out_path(path : str) -> str:
     fname    = os.path.basename(path)
+    if Data.fmt == 'parquet':
+        fname = fname.replace('.root', '.parquet')
+
     out_path = f'{Data.out_dir}/{fname}'
 
     log.debug(f'Creating : {out_path}')
@@ -198,27 +242,17 @@ def _skip_qsq_smear(trigger: str, path : str) -> bool:
 
     return False
 # ---------------------------------
-def _process_rdf(rdf : RDataFrame, trigger : str, path : str) -> Union[RDataFrame,None]:
+def _process_rdf(rdf : RDataFrame, trigger : str, path : str) -> dict[str,numpy.ndarray]:
     '''
     Takes:
 
-    rdf: Dataframe to have the columns added
+    rdf: Dataframe to have the columns added, empty files are skipped before
     trigger: HLT2 trigger
     path: Full path to corresponding ROOT file
 
     Returns:
-    Either:
-    - Dataframe with columns needed
-    - None, in case it does not make sense to add the columns to this type of file
+    Dictionary with arrays for the columns needed
     '''
-    nentries = rdf.Count().GetValue()
-    if nentries == 0:
-        log.warning(f'Found empty input file: {path}/{Data.tree_name}')
-        rdf=RDataFrame(0)
-        rdf=rdf.Define('fake_column', '1')
-
-        return rdf
-
     msc = MisCalculator(rdf=rdf, trigger=trigger)
     rdf = msc.get_rdf()
 
@@ -227,93 +261,115 @@ def _process_rdf(rdf : RDataFrame, trigger : str, path : str) -> Union[RDataFram
     is_ss = 'SameSign' in trigger
 
     if   Data.kind == 'hop':
-        obj = HOPCalculator(rdf=rdf)
-        rdf = obj.get_rdf(preffix=Data.kind)
+        obj    = HOPCalculator(rdf=rdf)
+        d_data = obj.get_data(preffix=Data.kind)
     elif Data.kind in Data.l_ecorr:
         skip_correction = _is_mc(path) and Data.kind == 'ecalo_bias'
         if skip_correction:
             log.warning('Turning off ecalo_bias correction for MC sample')
 
-        cor = MassBiasCorrector(rdf=rdf, skip_correction=skip_correction, ecorr_kind=Data.kind)
-        rdf = cor.get_rdf(suffix=Data.kind)
+        cor    = MassBiasCorrector(rdf=rdf, skip_correction=skip_correction, ecorr_kind=Data.kind)
+        d_data = cor.get_data(suffix=Data.kind)
     elif Data.kind == 'swp_jpsi_misid':
-        obj = SWPCalculator(rdf=rdf, d_lep={'L1' :  13, 'L2' :  13}, d_had={'H' :  13})
-        rdf = obj.get_rdf(preffix=Data.kind, progress_bar=Data.pbar, use_ss=is_ss)
+        obj    = SWPCalculator(rdf=rdf, d_lep={'L1' :  13, 'L2' :  13}, d_had={'H' :  13})
+        d_data = obj.get_data(preffix=Data.kind, progress_bar=Data.pbar, use_ss=is_ss)
     elif Data.kind == 'swp_cascade'   :
-        obj = SWPCalculator(rdf=rdf, d_lep={'L1' : 211, 'L2' : 211}, d_had={'H' : 321})
-        rdf = obj.get_rdf(preffix=Data.kind, progress_bar=Data.pbar, use_ss=is_ss)
+        obj    = SWPCalculator(rdf=rdf, d_lep={'L1' : 211, 'L2' : 211}, d_had={'H' : 321})
+        d_data = obj.get_data(preffix=Data.kind, progress_bar=Data.pbar, use_ss=is_ss)
     else:
         raise ValueError(f'Invalid kind: {Data.kind}')
 
-    return rdf
+    return d_data
 # ---------------------------------
-def _split_rdf(rdf : RDataFrame) -> list[RDataFrame]:
-    nentries = rdf.Count().GetValue()
+def _split_rdf(rdf : RDataFrame, nentries : int) -> list[tuple[RDataFrame,int,int]]:
+    '''
+    Returns list of (dataframe, first entry, last entry + 1) for each chunk
+    '''
     l_size   = range(0, nentries, Data.chunk_size)
 
     l_rdf    = [
-                rdf.Range(start, min(start + Data.chunk_size, nentries))
+                (rdf.Range(start, min(start + Data.chunk_size, nentries)), start, min(start + Data.chunk_size, nentries))
                 for start in l_size ]
 
     return l_rdf
 # ---------------------------------
+def _get_checkpoint(path : str, out_path : str, nentries : int) -> ChunkCheckpoint:
+    '''
+    Returns object keeping track of finished chunks, these are reused only if the input
+    and the settings that change the output are the same
+    '''
+    config = {
+            'input'     : FileCache.identity(path),
+            'kind'      : Data.kind,
+            'entries'   : nentries,
+            'chunk_size': Data.chunk_size,
+            'fmt'       : Data.fmt,
+            'comp'      : Data.comp,
+            'bsize'     : Data.bsize}
+
+    return ChunkCheckpoint(out_path=out_path, config=config, tree=Data.tree_name, fmt=Data.fmt, compression=Data.comp, basket_size=Data.bsize)
+# ---------------------------------
 @gut.timeit
 def _create_file(path : str, trigger : str) -> None:
     out_path = _get_out_path(path)
     if os.path.isfile(out_path):
         log.warning(f'Output found, skipping {out_path}')
+        ChunkCheckpoint.remove_stale(out_path)
         return
 
-    rdf = RDataFrame(Data.tree_name, path)
-    nentries = rdf.Count().GetValue()
-    if nentries == 0:
-        log.warning('Found empty file, skipping')
-        return
+    with Data.report.stage('file', path=path) as rec_file:
+        rec_file['input_bytes'] = os.path.getsize(os.path.realpath(path))
 
-    if _is_mc(path=path):
-        rdf = RDFGetter.add_truem(rdf)
+        rdf = RDataFrame(Data.tree_name, path)
+        with Data.report.stage('count', path=path) as rec:
+            nentries       = rdf.Count().GetValue()
+            rec['entries'] = nentries
 
-    if Data.nmax is not None:
-        log.warning(f'Limitting dataframe to {Data.nmax} entries')
-        rdf=rdf.Range(Data.nmax)
+        if nentries == 0:
+            log.warning('Found empty file, skipping')
+            return
 
-    l_rdf = _split_rdf(rdf=rdf)
+        if _is_mc(path=path):
+            with Data.report.stage('add_truem', path=path):
+                rdf = RDFGetter.add_truem(rdf)
 
-    if Data.dry:
-        log.warning('Doing dry run')
-        return
+        if Data.nmax is not None:
+            log.warning(f'Limitting dataframe to {Data.nmax} entries')
+            rdf      = rdf.Range(Data.nmax)
+            nentries = min(nentries, Data.nmax)
 
-    nchunk = len(l_rdf)
-    if nchunk == 1:
-        log.info('File will be processed in a single chunk')
-        rdf = l_rdf[0]
-        rdf = _process_rdf(rdf, trigger, path)
-        if rdf is not None:
-            rdf.Snapshot(Data.tree_name, out_path)
+        l_rdf = _split_rdf(rdf=rdf, nentries=nentries)
 
-        return
+        if Data.dry:
+            log.warning('Doing dry run')
+            return
 
-    log.info(f'File will be processed in {nchunk} chunks')
-    fmrg = TFileMerger()
-    for index, rdf_in in enumerate(tqdm.tqdm(l_rdf, ascii=' -')):
-        rdf_out  = _process_rdf(rdf_in, trigger, path)
-        if rdf_out is None:
-            continue
+        nchunk = len(l_rdf)
+        ckp    = _get_checkpoint(path, out_path, nentries)
+        log.info(f'File will be processed in {nchunk} chunk(s), {ckp.ndone} already done')
+        rec_file['resumed_chunks'] = ckp.ndone
+        for ichunk, (rdf_in, start, stop) in enumerate(tqdm.tqdm(l_rdf, ascii=' -', disable=nchunk == 1)):
+            if ichunk < ckp.ndone:
+                continue
 
-        tmp_path = out_path.replace('.root', f'_{index:03}_pre_merge.root')
-        rdf_out.Snapshot(Data.tree_name, tmp_path)
+            with Data.report.stage('calculate', path=path, chunk=ichunk) as rec:
+                d_data         = _process_rdf(rdf_in, trigger, path)
+                rec['entries'] = stop - start
 
-        fmrg.AddFile(tmp_path, cpProgress=False)
+            with Data.report.stage('write', path=path, chunk=ichunk) as rec:
+                chunk_path = ckp.get_chunk_path(ichunk)
+                with ColumnWriter(path=chunk_path, tree=Data.tree_name, fmt=Data.fmt, compression=Data.comp, basket_size=Data.bsize) as wrt:
+                    wrt.write(d_data)
 
-    fmrg.OutputFile(out_path)
+                ckp.add(ichunk, start, stop)
+                rec['entries'] = stop - start
 
-    log.info(f'Merging temporary files into: {out_path}')
-    fmrg.Merge()
+        with Data.report.stage('merge', path=path) as rec:
+            ckp.merge()
+            rec['entries'] = nentries
 
-    tmp_wc = out_path.replace('.root', '_*_pre_merge.root')
-    log.info(f'Removing temporary files from: {tmp_wc}')
-    for tmp_path in glob.glob(tmp_wc):
-        os.remove(tmp_path)
+        rec_file['entries']      = nentries
+        rec_file['output_bytes'] = os.path.getsize(out_path)
 # ---------------------------------
 def _trigger_from_path(path : str) -> str:
     ichar   = path.index('Hlt2')
@@ -328,6 +384,18 @@ def _trigger_from_path(path : str) -> str:
 
     return trigger
 # ---------------------------------
+def _save_report() -> None:
+    '''
+    Saves report with time, entries, bytes and memory used by each stage, next to the outputs
+    '''
+    Data.report.print_summary()
+    if Data.dry:
+        return
+
+    igroup, ngroup = Data.part
+    out_path       = f'{Data.out_dir}/reports/{Data.kind}_{int(igroup):03}_{int(ngroup):03}.json'
+    Data.report.save(out_path, prometheus=Data.prom)
+# ---------------------------------
 def main():
     '''
     Script starts here
@@ -335,13 +403,19 @@ def main():
     _parse_args()
     gut.TIMER_ON=True
 
+    igroup, ngroup = Data.part
+    Data.report  = RunReport(labels={'kind' : Data.kind, 'vers' : Data.vers, 'part' : f'{igroup}_{ngroup}'})
+
     l_path       = _get_paths()
     Data.out_dir = _get_out_dir()
     log.info('Processing paths')
-    for path in tqdm.tqdm(l_path, ascii=' -'):
-        trigger = _trigger_from_path(path)
-        log.debug(f'{"":<4}{path}')
-        _create_file(path, trigger)
+    try:
+        for path in tqdm.tqdm(l_path, ascii=' -'):
+            trigger = _trigger_from_path(path)
+            log.debug(f'{"":<4}{path}')
+            _create_file(path, trigger)
+    finally:
+        _save_report()
 # ---------------------------------
 if __name__ == '__main__':
     main()
@@ -4,10 +4,14 @@ Script meant to check if ROOT files are corrupted
 import os
 import glob
 import argparse
+from multiprocessing       import Pool
+from typing                import Union
 
 import tqdm
+import uproot
 from ROOT                  import TFile
 from dmu.logging.log_store import LogStore
+from rx_data.file_cache    import FileCache
 
 log=LogStore.add_logger('rx_data:check_file')
 # -----------------------------------
@@ -19,6 +23,15 @@ class Data:
     rgex    : str
     remove  : bool
     dry     : bool
+    deep    : bool
+    no_tree : bool
+    nprc    : int
+    mnf_path: str
+    l_frnd  : list[str]
+
+    tree_name = 'DecayTree'
+    step_size = '200 MB'
+    mnf_name  = '.check_corrupted.json'
 # -----------------------------------
 def _get_paths() -> list[str]:
     if Data.rgex is None:
@@ -45,6 +58,11 @@ def _parse_args() -> None:
     parser.add_argument('-x', '--rgex', type=str, help='Regular expression to filter file names')
     parser.add_argument('-r', '--remo',           help='If set, will remove bad files'    , action='store_true')
     parser.add_argument('-d', '--dry' ,           help='If set, will not remove bad files', action='store_true')
+    parser.add_argument('-n', '--nprc', type=int, help='Number of processes used to check files', default=1)
+    parser.add_argument('-D', '--deep',           help='If set, will read all the entries of the tree, instead of only opening the file', action='store_true')
+    parser.add_argument('-F', '--frnd', nargs='+', help='Directories with friend files, whose trees should have the same number of entries', default=[])
+    parser.add_argument('-t', '--ntre',           help='If set, friend files without tree will also be treated as bad files', action='store_true')
+    parser.add_argument('-m', '--mnf' , type=str, help='Path to JSON file where results are cached, by default in directory with files')
     parser.add_argument('-l', '--lvl' , type=int, help='log level', choices=[10, 20, 30], default=20)
     args = parser.parse_args()
 
@@ -53,26 +71,188 @@ def _parse_args() -> None:
     Data.lvl     = args.lvl
     Data.dry     = args.dry
     Data.remove  = args.remo
+    Data.deep    = args.deep
+    Data.nprc    = args.nprc
+    Data.l_frnd  = args.frnd
+    Data.no_tree = args.ntre
+    Data.mnf_path= f'{Data.inp_dir}/{Data.mnf_name}' if args.mnf is None else args.mnf
 
     LogStore.set_level('rx_data:check_file', Data.lvl)
 # -----------------------------------
-def _is_good_file(path : str) -> bool:
+def _check_file(path : str, deep : bool) -> dict:
+    '''
+    Checks file, returns dictionary with:
+
+    good   : True if file can be opened and is neither a zombie nor recovered
+             and, if deep is True, all the entries of the tree can be read
+    deep   : Value of deep argument
+    entries: Number of entries in tree, None if there is no tree or file is bad
+    error  : If deep is True and a basket cannot be read, branch, basket and entries where it failed
+    '''
+    d_res = {'good' : False, 'deep' : deep, 'entries' : None}
     try:
         ifile = TFile.Open(path)
     except OSError:
-        return False
+        return d_res
 
-    if ifile.IsZombie():
-        ifile.Close()
-        return False
+    if not ifile:
+        return d_res
+
+    # Zombie and recovered files are also closed, otherwise they stay open in the process
+    try:
+        if ifile.IsZombie() or ifile.TestBit(TFile.kRecovered) != 0:
+            return d_res
+
+        tree = ifile.Get(Data.tree_name)
+        if not tree:
+            log.debug(f'No {Data.tree_name} found in: {path}')
+            d_res['good'] = True
+            return d_res
 
-    if ifile.TestBit(TFile.kRecovered) != 0:
+        nentries = tree.GetEntries()
+    finally:
         ifile.Close()
-        return False
 
-    ifile.Close()
+    if deep:
+        error = _find_bad_basket(path)
+        if error is not None:
+            log.warning(f'{path}: {error}')
+            d_res['error'] = error
+            return d_res
+
+    d_res['good'   ] = True
+    d_res['entries'] = nentries
+
+    return d_res
+# -----------------------------------
+def _find_bad_basket(path : str) -> Union[str,None]:
+    '''
+    Reads all the branches of the tree, in steps of many baskets, returns None if everything
+    could be read, otherwise a message with the first branch and basket that failed
+    '''
+    try:
+        with uproot.open(path) as ifile:
+            for _ in ifile[Data.tree_name].iterate(step_size=Data.step_size, library='np'):
+                pass
+    except Exception: # pylint: disable=broad-exception-caught
+        # Failure is only located, basket by basket, for bad files
+        return _locate_bad_basket(path)
+
+    return None
+# -----------------------------------
+def _locate_bad_basket(path : str) -> str:
+    '''
+    Reads each basket of each branch, returns message with the first one that cannot be read
+    '''
+    try:
+        ifile = uproot.open(path)
+        tree  = ifile[Data.tree_name]
+    except Exception as exc: # pylint: disable=broad-exception-caught
+        return f'Cannot open {Data.tree_name}: {exc}'
+
+    with ifile:
+        for branch in tree.branches:
+            l_offset = branch.entry_offsets
+            for ibasket in range(branch.num_baskets):
+                start, stop = l_offset[ibasket], l_offset[ibasket + 1]
+                try:
+                    branch.array(entry_start=start, entry_stop=stop, library='np')
+                except Exception as exc: # pylint: disable=broad-exception-caught
+                    return f'Branch {branch.name}, basket {ibasket}, entries [{start}, {stop}): {exc}'
+
+    return 'Tree cannot be read, but every basket can'
+# -----------------------------------
+def _check_file_pool(args : tuple[str,bool]) -> tuple[str,dict]:
+    path, deep = args
 
-    return True
+    return path, _check_file(path, deep)
+# -----------------------------------
+def _get_cached(cache : FileCache, path : str, deep : bool) -> Union[dict,None]:
+    d_res = cache.get(path)
+    if d_res is None:
+        return None
+
+    # Results of shallow checks cannot be used for deep checks
+    if deep and not d_res['deep']:
+        return None
+
+    return d_res
+# -----------------------------------
+def _check_files(l_path : list[str], cache : FileCache, deep : bool) -> dict[str,dict]:
+    '''
+    Takes list of paths, returns dictionary mapping path to result of check,
+    files that did not change since last check are not checked again
+    '''
+    d_res   = {}
+    l_check = []
+    for path in l_path:
+        d_cached = _get_cached(cache, path, deep)
+        if d_cached is None:
+            l_check.append((path, deep))
+        else:
+            d_res[path] = d_cached
+
+    ncached = len(d_res)
+    ncheck  = len(l_check)
+    log.info(f'Checking {ncheck} files, reusing results for {ncached}')
+
+    if Data.nprc > 1 and ncheck > 1:
+        with Pool(processes=Data.nprc) as pool:
+            l_res = list(tqdm.tqdm(pool.imap_unordered(_check_file_pool, l_check, chunksize=10), total=ncheck, ascii=' -'))
+    else:
+        l_res = [ _check_file_pool(args) for args in tqdm.tqdm(l_check, ascii=' -') ]
+
+    for path, d_path in l_res:
+        cache.set(path, d_path)
+        d_res[path] = d_path
+
+    return d_res
+# -----------------------------------
+def _get_friend_paths(l_path : list[str]) -> dict[str,list[str]]:
+    '''
+    Returns dictionary mapping path of main file to list of paths of existing friend files
+    '''
+    d_frnd = {}
+    for path in l_path:
+        file_name = os.path.basename(path)
+        l_frnd    = [ f'{frnd_dir}/{file_name}' for frnd_dir in Data.l_frnd ]
+        d_frnd[path] = [ frnd_path for frnd_path in l_frnd if os.path.isfile(frnd_path) ]
+
+    return d_frnd
+# -----------------------------------
+def _get_bad_friends(
+        d_res      : dict[str,dict],
+        d_frnd     : dict[str,list[str]],
+        d_res_frnd : dict[str,dict]) -> tuple[list[str],list[str]]:
+    '''
+    Returns tuple with:
+
+    - List of friend files that are corrupted or whose number of entries differs from the main file
+    - List of friend files that can be read, but have no tree, while the main file has one
+    '''
+    l_bad     = []
+    l_no_tree = []
+    for path, l_frnd_path in d_frnd.items():
+        nentries = d_res[path]['entries']
+        for frnd_path in l_frnd_path:
+            d_frnd_res = d_res_frnd[frnd_path]
+            if not d_frnd_res['good']:
+                l_bad.append(frnd_path)
+                continue
+
+            if not d_res[path]['good'] or nentries is None:
+                continue
+
+            if d_frnd_res['entries'] is None:
+                log.warning(f'No {Data.tree_name} found in friend: {frnd_path}')
+                l_no_tree.append(frnd_path)
+                continue
+
+            if d_frnd_res['entries'] != nentries:
+                log.warning(f'Entries differ, {nentries} != {d_frnd_res["entries"]}: {frnd_path}')
+                l_bad.append(frnd_path)
+
+    return l_bad, l_no_tree
 # -----------------------------------
 def _remove_files(l_path : list[str]) -> None:
     nfile = len(l_path)
@@ -95,14 +275,25 @@ def main():
     '''
     _parse_args()
 
+    cache      = FileCache(path=Data.mnf_path)
     l_all_path = _get_paths()
-    l_bad_path = []
-    for path in tqdm.tqdm(l_all_path, ascii=' -'):
-        if _is_good_file(path):
-            continue
+    d_res      = _check_files(l_all_path, cache, deep=Data.deep)
+    l_bad_path = [ path for path, d_path in d_res.items() if not d_path['good'] ]
+
+    if len(Data.l_frnd) != 0:
+        d_frnd     = _get_friend_paths(l_all_path)
+        l_frnd_path= [ frnd_path for l_frnd_path in d_frnd.values() for frnd_path in l_frnd_path ]
+        d_res_frnd = _check_files(l_frnd_path, cache, deep=Data.deep)
+        l_bad_frnd, l_no_tree = _get_bad_friends(d_res, d_frnd, d_res_frnd)
+        l_bad_path+= l_bad_frnd
 
-        l_bad_path.append(path)
+        nno_tree   = len(l_no_tree)
+        if   nno_tree != 0 and Data.no_tree:
+            l_bad_path+= l_no_tree
+        elif nno_tree != 0:
+            log.warning(f'Found {nno_tree} friend files without {Data.tree_name}, not removed, use -t to remove them')
 
+    cache.save()
     _remove_files(l_bad_path)
 # -----------------------------------
 if __name__ == '__main__':
@@ -6,7 +6,9 @@ import os
 import re
 import glob
 import argparse
-from typing import Union
+from typing             import Union
+from functools          import cache
+from concurrent.futures import ThreadPoolExecutor
 
 import yaml
 from dmu.generic                    import utilities          as gut
@@ -21,7 +23,10 @@ class Data:
     '''
     skip_sam : list[str]
     log_level: int
+    nthreads : int
     data_dir : str = None
+    mis_path = 'missing.yaml'
+    run_path = 'rerun.yaml'
     data_rgx = r'(data_24_mag(?:down|up)_24c\d)_(.*)\.root'
     mc_rgx   = r'mc_mag(?:up|down)_(?:.*_)?\d{8}_(.*)_(Hlt2RD.*)_\w{10}\.root'
 
@@ -44,6 +49,7 @@ def _parse_args() -> None:
     parser = argparse.ArgumentParser(description='Script meant to check for missing friend trees')
     parser.add_argument('-d', '--data_dir' , type=str , help='Path to directory with main and friend samples, if not passed, will pick DATADIR from environment')
     parser.add_argument('-s', '--skip_sam' , nargs='+', help='Samples to skip', default=[])
+    parser.add_argument('-t', '--nthreads' , type=int , help='Number of threads used to list directories', default=8)
     parser.add_argument('-l', '--log_level', type=int , help='Logging level', default=20, choices=[10, 20, 30])
 
     args = parser.parse_args()
@@ -51,6 +57,7 @@ def _parse_args() -> None:
     Data.data_dir = args.data_dir
     Data.skip_sam = args.skip_sam
     Data.log_level= args.log_level
+    Data.nthreads = args.nthreads
 # ---------------------------------
 def _version_from_path(path : str) -> Union[str,None]:
     try:
@@ -62,15 +69,16 @@ def _version_from_path(path : str) -> Union[str,None]:
     return version
 # ---------------------------------
 def _fname_from_sample(path : str, version : str) -> set[str]:
-    root_wc = f'{path}/{version}/*.root'
-    l_path  = glob.glob(root_wc)
-    l_fname = [ os.path.basename(path) for path in l_path ]
+    root_dir = f'{path}/{version}'
+    with os.scandir(root_dir) as it_entry:
+        s_fname = { entry.name for entry in it_entry if entry.name.endswith('.root') }
 
-    if len(l_fname) == 0:
-        log.warning(f'No file found in: {root_wc}')
+    if len(s_fname) == 0:
+        log.warning(f'No file found in: {root_dir}/*.root')
 
-    return set(l_fname)
+    return s_fname
 # ---------------------------------
+@cache
 def _info_from_fname(fname : str) -> tuple[str,str]:
     if fname.startswith('data_'):
         rgx = Data.data_rgx
@@ -121,38 +129,58 @@ def _count_paths(d_data : dict[str, dict]) -> int:
 
     return npath
 # ---------------------------------
-def _find_paths() -> dict[str,set[str]]:
-    l_sample = glob.glob(f'{Data.data_dir}/*')
-    d_fname  = {}
+def _list_sample(sample : str) -> Union[tuple[str,str,set[str]],None]:
+    '''
+    Takes path to directory with versions of a sample, e.g. $DATADIR/mva
+    Returns name of sample, latest version and names of files, or None if no version was found
+    '''
+    version = _version_from_path(path=sample)
+    if not version:
+        return None
 
-    l_msg = []
-    for sample in l_sample:
-        sample_name = os.path.basename(sample)
-        if sample_name in ['samples'] + Data.skip_sam:
-            continue
+    name = os.path.basename(sample)
+    log.debug(f'Finding paths for sample: {name}/{version}')
 
-        version = _version_from_path(path=sample)
-        if not version:
-            continue
+    s_fname = _fname_from_sample(path=sample, version=version)
 
-        name = os.path.basename(sample)
+    return name, version, s_fname
+# ---------------------------------
+def _find_paths() -> tuple[dict[str,set[str]], dict[str,str]]:
+    '''
+    Returns:
+
+    - Dictionary mapping sample (e.g. main, mva) to set of file names in latest version
+    - Dictionary mapping sample to latest version
+    '''
+    l_sample = glob.glob(f'{Data.data_dir}/*')
+    l_sample = [ sample for sample in l_sample if os.path.basename(sample) not in ['samples'] + Data.skip_sam ]
+
+    # Listing directories in network filesystems is slow, do it in parallel
+    with ThreadPoolExecutor(max_workers=Data.nthreads) as pool:
+        l_listing = list(pool.map(_list_sample, l_sample))
 
-        log.debug(f'Finding paths for sample: {name}/{version}')
+    d_fname = {}
+    d_vers  = {}
+    l_msg   = []
+    for listing in l_listing:
+        if listing is None:
+            continue
 
-        s_fname = _fname_from_sample(path=sample, version=version)
-        d_fname[name] = _fname_to_dict(s_fname)
-        nfname  = len(s_fname)
+        name, version, s_fname = listing
+        d_fname[name] = s_fname
+        d_vers[name]  = version
+        nfname        = len(s_fname)
 
         l_msg.append(f'{name:<20}{version:<10}{nfname:<10}')
 
     log.info(40 * '-')
     log.info(f'{"Tree":<20}{"Latest":<10}{"Files":<10}')
     log.info(40 * '-')
-    for msg in l_msg:
+    for msg in sorted(l_msg):
         log.info(msg)
     log.info(40 * '-')
 
-    return d_fname
+    return d_fname, d_vers
 # ---------------------------------
 def _get_sample_files(sample : dict[str,list[str]]) -> set[str]:
     l_path = []
@@ -161,28 +189,6 @@ def _get_sample_files(sample : dict[str,list[str]]) -> set[str]:
 
     return set(l_path)
 # ---------------------------------
-def _sample_difference(
-        sample_1 : dict[str,list[str]],
-        sample_2 : dict[str,list[str]]) -> list[str]:
-
-    s_path_1 = _get_sample_files(sample_1)
-    s_path_2 = _get_sample_files(sample_2)
-    s_diff   = s_path_1 - s_path_2
-    l_diff   = list(s_diff)
-
-    if len(l_diff) != 0:
-        log.debug('Main')
-        l_path_1 = sorted(list(s_path_1))
-        for path_1 in l_path_1:
-            log.debug(path_1)
-
-        log.debug('Friend')
-        l_path_2 = sorted(list(s_path_2))
-        for path_2 in l_path_2:
-            log.debug(path_2)
-
-    return sorted(l_diff)
-# ---------------------------------
 def _is_muon_sample(l_path : list[str]) -> bool:
     '''
     True if ALL paths belong to muon
@@ -212,20 +218,27 @@ def _should_exist(frn_name : str, sample : dict[str,list[str]]) -> bool:
 
     return False
 # ---------------------------------
+def _samples_from_fnames(s_fname : set[str]) -> set[str]:
+    return { _info_from_fname(fname)[0] for fname in s_fname }
+# ---------------------------------
 def _compare_against_main(
         frn_name : str,
         main_sam : dict[str,dict],
-        frnd_sam : dict[str,dict]) -> Union[dict[list[str]], dict[str]]:
+        main_fnm : set[str],
+        frnd_fnm : set[str]) -> dict[str,Union[list[str],str]]:
     '''
-    Compares dictionaries associated to main and friend trees
+    Compares file names of main and friend trees
 
     Parameters
     -------------
     frn_name : Name of the friend tree kind, e.g. mva
-    *_sam: Dictionary mapping:
+    main_sam : Dictionary mapping:
 
     sample (e.g. data_24_mag) ->
-        HltTrigger -> list of paths to ROOT files
+        HltTrigger -> list of names of ROOT files
+
+    main_fnm : Set of names of files in main tree directory
+    frnd_fnm : Set of names of files in friend tree directory
 
     Returns
     -------------
@@ -233,27 +246,27 @@ def _compare_against_main(
 
     sample (e.g. data_24_mag) -> list of missing files OR 'all' in case all the files are missing
     '''
-    s_main_sample = set(main_sam.keys())
-    s_frnd_sample = set(frnd_sam.keys())
-    s_diff        = s_main_sample - s_frnd_sample
-    l_diff        = list(s_diff)
-    l_diff        = sorted(l_diff)
+    s_frnd_sample = _samples_from_fnames(frnd_fnm)
 
-    # If whole sample is missing, add 'all'
-    d_diff = { sample : 'all' for sample in l_diff if _should_exist(frn_name=frn_name, sample=main_sam[sample])}
+    d_missing = {}
+    for fname in main_fnm - frnd_fnm:
+        sample, _ = _info_from_fname(fname)
+        if sample not in d_missing:
+            d_missing[sample] = []
 
-    # Else check which files are missing
-    s_both = s_main_sample & s_frnd_sample
-    for sample in s_both:
-        m_sample = main_sam[sample]
-        f_sample = frnd_sam[sample]
+        d_missing[sample].append(fname)
 
-        log.debug(f'Sample: {sample}')
-        l_path = _sample_difference(sample_1=m_sample, sample_2=f_sample)
-        npath  = len(l_path)
-        if npath == 0:
+    d_diff = {}
+    for sample in sorted(d_missing):
+        l_path = sorted(d_missing[sample])
+
+        # If whole sample is missing, add 'all'
+        if sample not in s_frnd_sample:
+            if _should_exist(frn_name=frn_name, sample=main_sam[sample]):
+                d_diff[sample] = 'all'
             continue
 
+        log.debug(f'Sample: {sample}')
         if _is_muon_sample(l_path) and frn_name in Data.l_electron_samples:
             log.warning(f'Skipping {sample} for {frn_name}')
             continue
@@ -262,6 +275,23 @@ def _compare_against_main(
 
     return d_diff
 # ---------------------------------
+def _get_rerun_paths(
+        d_diff   : dict[str,Union[list[str],str]],
+        main_sam : dict[str,dict],
+        main_dir : str) -> list[str]:
+    '''
+    Takes dictionary with missing samples, returned by `_compare_against_main`
+    Returns list of paths to main files whose friends need to be made
+    '''
+    l_fname = []
+    for sample, l_path in d_diff.items():
+        if l_path == 'all':
+            l_fname += _get_sample_files(main_sam[sample])
+        else:
+            l_fname += l_path
+
+    return [ f'{main_dir}/{fname}' for fname in sorted(l_fname) ]
+# ---------------------------------
 def main():
     '''
     Start here
@@ -269,11 +299,14 @@ def main():
     _parse_args()
     _initialize()
 
-    d_sample = _find_paths()
+    d_fname, d_vers = _find_paths()
 
-    main_sam = d_sample['main']
+    main_fnm = d_fname['main']
+    main_sam = _fname_to_dict(main_fnm)
+    main_dir = f'{Data.data_dir}/main/{d_vers["main"]}'
     d_mis    = {}
-    for friend, data in d_sample.items():
+    d_run    = {}
+    for friend, frnd_fnm in d_fname.items():
         if friend in ['main', 'samples']: # samples stores yaml files
             continue                      # main is what we are comparing against
 
@@ -286,10 +319,18 @@ def main():
         d_mis[friend] = _compare_against_main(
                 frn_name = friend,
                 main_sam = main_sam,
-                frnd_sam = data)
+                main_fnm = main_fnm,
+                frnd_fnm = frnd_fnm)
+
+        d_run[friend] = _get_rerun_paths(d_diff=d_mis[friend], main_sam=main_sam, main_dir=main_dir)
 
-    with open('missing.yaml', 'w', encoding='utf-8') as ofile:
+    log.info(f'Saving missing samples to: {Data.mis_path}')
+    with open(Data.mis_path, 'w', encoding='utf-8') as ofile:
         yaml.dump(d_mis, ofile, Dumper=gut.BlockStyleDumper)
+
+    log.info(f'Saving paths to main files with missing friends to: {Data.run_path}')
+    with open(Data.run_path, 'w', encoding='utf-8') as ofile:
+        yaml.dump(d_run, ofile, Dumper=gut.BlockStyleDumper)
 # ---------------------------------
 if __name__ == '__main__':
     main()
@@ -1,77 +1,81 @@
 '''
 Script used to print statistics on files stored in cluster
 '''
-import os
 import argparse
 import pandas   as pnd
 
-import yaml
+from dmu.logging.log_store import LogStore
+from rx_data.sample_stats  import SampleStats
 # --------------------------------------
 class Data:
     '''
     Class used to share attributes
     '''
     samples_path : str
+    entries      : bool
+    branches     : bool
+    nthreads     : int
+    out_dir      : str
+    l_format     : list[str]
 # --------------------------------------
 def _parse_args():
     parser = argparse.ArgumentParser(description='Script used to print statistics on files store in cluster')
     parser.add_argument('-p', '--path' , type=str, help='Path to file storing lists of samples', required=True)
+    parser.add_argument('-e', '--entr' ,           help='If used, will add number of entries and bytes per entry', action='store_true')
+    parser.add_argument('-b', '--brch' ,           help='If used, will also save sizes of branches', action='store_true')
+    parser.add_argument('-t', '--nthr' , type=int, help='Number of threads used to access files', default=16)
+    parser.add_argument('-o', '--out'  , type=str, help='Directory where tables will be saved', default='.')
+    parser.add_argument('-f', '--fmt'  , nargs='+', help='Formats of tables', choices=['md', 'csv', 'parquet'], default=['md', 'csv', 'parquet'])
+    parser.add_argument('-l', '--lvl'  , type=int, help='Logging level', choices=[10, 20, 30], default=20)
     args = parser.parse_args()
 
     Data.samples_path = args.path
-# --------------------------------------
-def _get_samples() -> dict:
-    with open(Data.samples_path, encoding='utf-8') as ifile:
-        d_data = yaml.safe_load(ifile)
-
-    return d_data
-# --------------------------------------
-def _size_from_paths(l_path : str) -> int:
-    l_size = [ os.path.getsize(path) / (1024 ** 2) for path in l_path ]
-    size   = sum(l_size)
-
-    return int(size)
-# --------------------------------------
-def _data_to_size(d_data : dict) -> pnd.DataFrame:
-    d_size = {'Sample' : [], 'Trigger' : [], 'Size' : []}
-    for sample in d_data:
-        for trigger in d_data[sample]:
-            l_path = d_data[sample][trigger]
-            size   = _size_from_paths(l_path)
-
-            d_size['Sample' ].append(sample)
-            d_size['Trigger'].append(trigger)
-            d_size['Size'   ].append(size)
+    Data.entries      = args.entr
+    Data.branches     = args.brch
+    Data.nthreads     = args.nthr
+    Data.out_dir      = args.out
+    Data.l_format     = args.fmt
 
-    df = pnd.DataFrame(d_size)
-    df = df.sort_values(by='Size', ascending=False)
-
-    return df
+    LogStore.set_level('rx_data:sample_stats', args.lvl)
 # --------------------------------------
 def _add_total(df : pnd.DataFrame) -> pnd.DataFrame:
-    total_size      = df.Size.sum()
-    df.loc[len(df)] = ['Total', 'Any', total_size]
+    row = {'Sample' : 'Total', 'Trigger' : 'Any', 'Files' : df.Files.sum(), 'Bytes' : df.Bytes.sum()}
+    if 'Entries' in df.columns:
+        nentries             = df.Entries.sum()
+        row['Entries'      ] = nentries
+        row['BytesPerEntry'] = row['Bytes'] / nentries if nentries > 0 else float('nan')
+
+    df.loc[len(df)] = row
 
     return df
 # --------------------------------------
-def _save_table(df : pnd.DataFrame, file_name : str) -> None:
+def _save_table(df : pnd.DataFrame, name : str) -> None:
+    df = df.reset_index(drop=True)
     df = _add_total(df)
-    with open(file_name, 'w', encoding='utf-8') as ofile:
-        text = df.to_markdown(index=False)
-        ofile.write(text)
+
+    SampleStats.save(df, path=f'{Data.out_dir}/{name}', formats=Data.l_format)
 # --------------------------------------
 def main():
     '''
     Starts here
     '''
     _parse_args()
-    d_data = _get_samples()
-    df     = _data_to_size(d_data)
+    sst    = SampleStats(
+            samples_path = Data.samples_path,
+            entries      = Data.entries,
+            branches     = Data.branches,
+            nthreads     = Data.nthreads)
+
+    df     = sst.get_df()
     df_dt  = df[ df.Sample.str.startswith('DATA_')]
     df_mc  = df[~df.Sample.str.startswith('DATA_')]
 
-    _save_table(df_dt, 'data.md')
-    _save_table(df_mc,   'mc.md')
+    _save_table(df_dt, 'data')
+    _save_table(df_mc,   'mc')
+
+    if Data.branches:
+        df_br = sst.get_branch_df()
+        SampleStats.save(df_br, path=f'{Data.out_dir}/branches', formats=Data.l_format)
 # --------------------------------------
 if __name__ == '__main__':
     main()
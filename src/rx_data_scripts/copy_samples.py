@@ -2,15 +2,17 @@
 Script used to copy ntuples from mounted filesystem
 '''
 import os
+import re
 import glob
 import shutil
+import hashlib
 import argparse
-import multiprocessing
+from typing               import Iterator
+from multiprocessing.pool import Pool
 from importlib.resources import files
 
 import tqdm
 import yaml
-import numpy
 from dmu.generic.version_management import get_last_version
 from dmu.logging.log_store          import LogStore
 from rx_data                        import utilities as ut
@@ -25,12 +27,13 @@ class Data:
     conf    : str
     dry     : bool
     nprc    : int
+    hash    : bool
     d_conf  : dict
     d_data  : dict
-    out_dir : str
-    l_source: list[str]
 
     vers    = None
+    bsize   = 64 * 1024 * 1024
+    evt_cre = re.compile(r'^mc_.*?_(\d{8})_')
     l_kind  = [
             'all',
             'main',
@@ -49,6 +52,7 @@ def _parse_args():
     parser.add_argument('-n', '--nprc', type=int, help='Number of process to download with', default=1)
     parser.add_argument('-v', '--vers', type=str, help='Version of files, only makes sense if kind is not "all"')
     parser.add_argument('-d', '--dry' ,           help='If used, will do not copy files', action='store_true')
+    parser.add_argument('-H', '--hash',           help='If used, files with same size will be compared through checksums, instead of modification times', action='store_true')
     args = parser.parse_args()
 
     Data.kind = args.kind
@@ -56,17 +60,61 @@ def _parse_args():
     Data.vers = args.vers
     Data.dry  = args.dry
     Data.nprc = args.nprc
+    Data.hash = args.hash
 
     LogStore.set_level('rx_data:copy_samples', args.logl)
 # -----------------------------------------
-def _is_right_trigger(path : str) -> bool:
-    l_trigger  = Data.d_conf['triggers']
-    _, trigger = ut.info_from_path(path)
+def _get_identifier(path : str, sample : str) -> str:
+    '''
+    Returns event type for MC and sample, e.g. data_24_magdown_24c1, for data
+    '''
+    mtch = Data.evt_cre.match(os.path.basename(path))
+    if mtch:
+        return mtch.group(1)
 
-    return trigger in l_trigger
+    return sample
 # -----------------------------------------
-def _get_source_paths() -> list[str]:
+def _build_index(l_path : list[str]) -> dict[tuple[str,str],list[str]]:
+    '''
+    Takes list of paths, returns dictionary mapping (identifier, trigger) to paths,
+    where identifier is the event type for MC and the sample for data
+    '''
+    d_info  = ut.info_from_paths(l_path, raise_on_fail=False)
+    d_index = {}
+    for path, sample, trigger in zip(l_path, d_info['sample'], d_info['line']):
+        if sample is None:
+            log.warning(f'Cannot extract sample and trigger, skipping: {path}')
+            continue
+
+        key = _get_identifier(path, sample), trigger
+        if key not in d_index:
+            d_index[key] = []
+
+        d_index[key].append(path)
+
+    return d_index
+# -----------------------------------------
+def _find_paths(d_index : dict[tuple[str,str],list[str]], identifier : str) -> list[str]:
+    l_path = []
+    for trigger in Data.d_conf['triggers']:
+        l_path += d_index.get((identifier, trigger), [])
+
+    if len(l_path) != 0:
+        return l_path
+
+    # Identifiers that are neither event types nor data samples are searched in the paths
+    s_trigger = set(Data.d_conf['triggers'])
+    for (_, trigger), l_path_key in d_index.items():
+        if trigger not in s_trigger:
+            continue
+
+        l_path += [ path for path in l_path_key if identifier in path ]
+
+    return l_path
+# -----------------------------------------
+def _get_source_paths(l_path : list[str]) -> list[str]:
     d_samp   = Data.d_conf['samples']
+    d_index  = _build_index(l_path)
     l_source = []
     log.info(70 * '-')
     log.info(f'{"Sample":<20}{"Identifier":<30}{"Paths":<20}')
@@ -74,14 +122,16 @@ def _get_source_paths() -> list[str]:
     for sample, l_identifier in d_samp.items():
         for identifier in l_identifier:
             identifier    = str(identifier)
-            l_source_samp = [ source for source in Data.l_source if identifier in source and _is_right_trigger(source) ]
+            l_source_samp = _find_paths(d_index, identifier)
             npath = len(l_source_samp)
             log.info(f'{sample:<20}{identifier:<30}{npath:<20}')
             l_source += l_source_samp
 
     log.info(70 * '-')
 
-    nsource = len(l_source)
+    # Same path could be picked by different identifiers
+    l_source = list(dict.fromkeys(l_source))
+    nsource  = len(l_source)
     if nsource == 0:
         raise ValueError('Will not copy any file')
 
@@ -100,7 +150,10 @@ def _get_version(kind : str) -> str:
 
     return vers
 # -----------------------------------------
-def _initialize_kind(kind : str):
+def _get_kind_paths(kind : str) -> list[tuple[str,str,str]]:
+    '''
+    Returns list of (kind, source, target) for files of a given kind that need to be copied
+    '''
     if Data.vers is not None and Data.kind == 'all':
         raise ValueError(f'Specified version {Data.vers} for kind {Data.kind}')
 
@@ -111,12 +164,11 @@ def _initialize_kind(kind : str):
     l_path  = glob.glob(path_wc)
 
     out_dir = Data.d_conf['out_dir']
-    Data.out_dir = f'{out_dir}/{kind}/{vers}'
-    os.makedirs(Data.out_dir, exist_ok=True)
-
+    out_dir = f'{out_dir}/{kind}/{vers}'
+    os.makedirs(out_dir, exist_ok=True)
 
     log.info(f'Source: {inp_dir}')
-    log.info(f'Target: {Data.out_dir}')
+    log.info(f'Target: {out_dir}')
 
     nsource = len(l_path)
     if nsource == 0:
@@ -124,67 +176,126 @@ def _initialize_kind(kind : str):
 
     log.info(f'Found {nsource} files')
 
-    Data.l_source = l_path
+    l_source = _get_source_paths(l_path)
+
+    return [ (kind, source, f'{out_dir}/{os.path.basename(source)}') for source in l_source ]
 # -----------------------------------------
 def _initialize() -> None:
     cfg_path = files('rx_data_data').joinpath(f'copy_files/{Data.conf}.yaml')
     with open(cfg_path, encoding='utf-8') as ifile:
         Data.d_conf = yaml.safe_load(ifile)
 # -----------------------------------------
-def _copy_sample(source : str) -> int:
-    fname = os.path.basename(source)
-    target= f'{Data.out_dir}/{fname}'
+def _get_checksum(path : str) -> str:
+    hsh = hashlib.md5()
+    with open(path, 'rb') as ifile:
+        for block in iter(lambda : ifile.read(Data.bsize), b''):
+            hsh.update(block)
 
-    if os.path.isfile(target):
-        log.debug(f'Target found, skipping: {target}')
-        return 0
+    return hsh.hexdigest()
+# -----------------------------------------
+def _needs_copy(source : str, target : str) -> bool:
+    '''
+    Checks if target is missing or differs from source, i.e.
+    different size, older than source or, if hashing, different checksum
+    '''
+    if not os.path.isfile(target):
+        return True
 
-    if not Data.dry:
-        log.debug('')
-        log.debug(source)
-        log.debug('--->')
-        log.debug(target)
-        log.debug('')
-        shutil.copy(source, target)
-        return 1
+    src_stat = os.stat(source)
+    tgt_stat = os.stat(target)
+    if src_stat.st_size != tgt_stat.st_size:
+        log.debug(f'Size changed: {target}')
+        return True
 
-    return 0
+    if Data.hash:
+        return _get_checksum(source) != _get_checksum(target)
+
+    # Copies get the modification time of the source, older copies get the time they were made
+    if int(src_stat.st_mtime) > int(tgt_stat.st_mtime):
+        log.debug(f'Source is newer: {target}')
+        return True
+
+    return False
 # -----------------------------------------
-def _download_group(group : list[str]) -> int:
-    if len(group) == 1:
-        ncopied = _copy_sample(group[0])
-        return ncopied
+def _copy_file(source : str, target : str) -> None:
+    '''
+    Copies source to temporary file, which is renamed to target at the end,
+    such that interrupted copies do not leave truncated targets
+    '''
+    tmp_path = f'{target}.{os.getpid()}.tmp'
+    try:
+        with open(source, 'rb') as ifile, open(tmp_path, 'wb') as ofile:
+            _copy_content(ifile, ofile)
 
-    with multiprocessing.Pool() as pool:
-        l_ncopied = pool.map(_copy_sample, group)
-        ncopied   = sum(l_ncopied)
+        src_stat = os.stat(source)
+        os.utime(tmp_path, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+        os.replace(tmp_path, target)
+    finally:
+        if os.path.isfile(tmp_path):
+            os.remove(tmp_path)
+# -----------------------------------------
+def _copy_content(ifile, ofile) -> None:
+    '''
+    Copies with copy_file_range, which avoids going through user space, if possible
+    '''
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while os.copy_file_range(ifile.fileno(), ofile.fileno(), Data.bsize) > 0:
+                pass
+            return
+        except OSError as exc:
+            log.debug(f'Cannot use copy_file_range, falling back: {exc}')
+            ifile.seek(0)
+            ofile.seek(0)
+            ofile.truncate()
 
-    return ncopied
+    shutil.copyfileobj(ifile, ofile, Data.bsize)
 # -----------------------------------------
-def _group_paths(l_path : list[str]) -> list[list[str]]:
+def _copy_sample(paths : tuple[str,str,str]) -> tuple[str,int]:
+    kind, source, target = paths
+
+    if not _needs_copy(source, target):
+        log.debug(f'Target up to date, skipping: {target}')
+        return kind, 0
+
+    if Data.dry:
+        return kind, 0
+
+    log.debug('')
+    log.debug(source)
+    log.debug('--->')
+    log.debug(target)
+    log.debug('')
+    _copy_file(source, target)
+
+    return kind, 1
+# -----------------------------------------
+def _copy_paths(l_paths : list[tuple[str,str,str]]) -> dict[str,int]:
+    '''
+    Takes list of (kind, source, target), copies files and
+    returns dictionary with number of copied files per kind
+    '''
     if Data.nprc <  1:
         raise ValueError(f'Number of processes has to be larger or equal to 1, found: {Data.nprc}')
 
     if Data.nprc == 1:
-        l_group = [ [path] for path in l_path ]
-        return l_group
-
-    return numpy.array_split(l_path, Data.nprc)
-# -----------------------------------------
-def _download_kind(kind : str):
-    if kind == 'all':
-        return
+        return _count_copied(map(_copy_sample, l_paths), l_paths)
 
-    log.info(f'Copying files for kind {kind}')
-    _initialize_kind(kind)
+    log.debug(f'Starting pool with {Data.nprc} processes')
+    with Pool(processes=Data.nprc) as pool:
+        d_ncopied = _count_copied(pool.imap_unordered(_copy_sample, l_paths), l_paths)
 
-    l_path = _get_source_paths()
-    l_group= _group_paths(l_path)
-    ncopied= 0
-    for group in tqdm.tqdm(l_group, ascii=' -'):
-        ncopied += _download_group(group)
+    return d_ncopied
+# -----------------------------------------
+def _count_copied(it_ncopied : Iterator[tuple[str,int]], l_paths : list[tuple[str,str,str]]) -> dict[str,int]:
+    '''
+    Consumes iterator with (kind, copied) and returns dictionary with number of copied files per kind
+    '''
+    d_ncopied = { kind : 0 for kind, _, _ in l_paths }
+    for kind, val in tqdm.tqdm(it_ncopied, total=len(l_paths), ascii=' -'):
+        d_ncopied[kind] += val
 
-    log.info(f'Copied {ncopied} files for kind {kind}')
+    return d_ncopied
 # -----------------------------------------
 def main():
     '''
@@ -194,12 +305,19 @@ def main():
     _initialize()
 
     if Data.kind == 'all':
-        l_kind = Data.l_kind
+        l_kind = [ kind for kind in Data.l_kind if kind != 'all' ]
     else:
         l_kind = [Data.kind]
 
+    l_paths = []
     for kind in l_kind:
-        _download_kind(kind)
+        log.info(f'Finding files for kind {kind}')
+        l_paths += _get_kind_paths(kind)
+
+    d_ncopied = _copy_paths(l_paths)
+
+    for kind, ncopied in d_ncopied.items():
+        log.info(f'Copied {ncopied} files for kind {kind}')
 # -----------------------------------------
 if __name__ == '__main__':
     main()
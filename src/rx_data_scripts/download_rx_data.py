@@ -5,13 +5,10 @@ from the grid
 
 import os
 import math
-import json
 import glob
-import random
 import argparse
 
 from typing                 import Union
-from importlib.resources    import files
 from concurrent.futures     import ThreadPoolExecutor
 from dataclasses            import dataclass
 
@@ -21,7 +18,7 @@ import yaml
 from XRootD                 import client   as clt
 from dmu.logging.log_store  import LogStore
 
-from rx_data                import utilities as ut
+from rx_data.lfn_catalog    import LFNCatalog
 
 log = LogStore.add_logger('rx_data:download_rx_data')
 
@@ -36,6 +33,7 @@ class Data:
     # Need this class to store data
 
     d_trig  : dict[str,int]
+    l_samp  : list[str]
     vers    : str
     kind    : str
     nfile   : int
@@ -44,6 +42,7 @@ class Data:
     eos_dir : str
     drun    : bool
     ran_pfn : bool
+    seed    : Union[int, None]
     force   : bool
     trg_path: str
 
@@ -75,35 +74,32 @@ def _check_status(status, kind):
     else:
         raise ValueError(f'Failed to run {kind}: {status.message}')
 # --------------------------------------------------
-def _get_pfn_subset(l_pfn : list[str]) -> list[str]:
-    if not Data.ran_pfn:
-        log.warning(f'Picking up a subset of the first {Data.nfile} ntuples')
-        return l_pfn[:Data.nfile]
-
-    log.warning(f'Picking up a random subset of {Data.nfile} ntuples')
-
-    l_pfn = random.sample(l_pfn, Data.nfile)
-
-    return l_pfn
-# --------------------------------------------------
-def _has_good_trigger(pfn : str) -> bool:
-    _, trigger = ut.info_from_path(pfn)
-
-    is_good = trigger in Data.d_trig
-
-    return is_good
+def _get_lfns(ctl : LFNCatalog) -> list[str]:
+    '''
+    Picks LFNs from catalog by trigger and sample. If -n is used, this number
+    of files is picked for each sample and trigger
+    '''
+    if Data.nfile > 0 and Data.ran_pfn:
+        log.warning(f'Picking up a random subset of {Data.nfile} ntuples per sample and trigger')
+    elif Data.nfile > 0:
+        log.warning(f'Picking up a subset of the first {Data.nfile} ntuples per sample and trigger')
+
+    l_lfn = ctl.query(
+            samples  = Data.l_samp,
+            triggers = list(Data.d_trig),
+            nfile    = Data.nfile,
+            randomize= Data.ran_pfn,
+            seed     = Data.seed)
+
+    return l_lfn
 # --------------------------------------------------
 def _get_pfns() -> list[str]:
-    json_wc = files('rx_data_lfns').joinpath(f'{Data.kind}/{Data.vers}/*.json')
-    json_wc = str(json_wc)
-    l_json  = glob.glob(json_wc)
-
-    l_lfn   = []
-    for json_path in l_json:
-        with open(json_path, encoding='utf-8') as ifile:
-            l_lfn += json.load(ifile)
+    try:
+        ctl = LFNCatalog(kind=Data.kind, vers=Data.vers)
+    except FileNotFoundError:
+        ctl = None
 
-    nlfn    = len(l_lfn)
+    nlfn    = 0 if ctl is None else len(ctl)
     if nlfn == 0:
         raise ValueError(f'''
         -------------------------------------------------------------------
@@ -115,16 +111,12 @@ def _get_pfns() -> list[str]:
                          ''')
 
     log.info(f'Found {nlfn} paths')
-    l_pfn   = [ f'{Data.pfn_preffix}/{LFN}' for LFN in l_lfn ]
-
-    if Data.nfile > 0:
-        l_pfn = _get_pfn_subset(l_pfn)
+    l_lfn   = _get_lfns(ctl)
+    nnew    = len(l_lfn)
 
-    nold  = len(l_pfn)
-    l_pfn = [ pfn for pfn in l_pfn if _has_good_trigger(pfn) ]
-    nnew  = len(l_pfn)
+    log.info(f'Filtering LFNs by trigger and sample: {nlfn} -> {nnew}')
 
-    log.info(f'Filtering PFNs by trigger: {nold} -> {nnew}')
+    l_pfn   = [ f'{Data.pfn_preffix}/{LFN}' for LFN in l_lfn ]
 
     return l_pfn
 # --------------------------------------------------
@@ -133,11 +125,13 @@ def _get_args():
     parser.add_argument('-t', '--trig' , type=str, help='Path to YAML file with list of triggers', required=True)
     parser.add_argument('-v', '--vers' , type=str, help='Version of LFNs'                        , required=True)
     parser.add_argument('-k', '--kind' , type=str, help='Type of production'                     , choices=['rx', 'lbpkmumu'], required=True)
-    parser.add_argument('-n', '--nfile', type=int, help='Number of files to download', default=-1)
+    parser.add_argument('-s', '--samp' , nargs='+', help='Samples to download, accepts wildcards, e.g. data_24_magup_*, by default all', default=['*'])
+    parser.add_argument('-n', '--nfile', type=int, help='Number of files to download for each sample and trigger', default=-1)
     parser.add_argument('-p', '--dest' , type=str, help='Destination directory will override whatever is in DOWNLOAD_NTUPPATH')
     parser.add_argument('-l', '--log'  , type=int, help='Log level, default 20', choices=[10, 20, 30, 40], default=20)
     parser.add_argument('-m', '--mth'  , type=int, help=f'Number of threads to use for downloading, default {Data.nthread}', default=Data.nthread)
     parser.add_argument('-r', '--ran'  ,           help='When picking a subset of files, with -n, pick them randomly', action='store_true')
+    parser.add_argument('-e', '--seed' , type=int, help='Seed used to pick files randomly, with -r')
     parser.add_argument('-d', '--dryr' ,           help='If used, it will skip downloads, but do everything else'    , action='store_true')
     parser.add_argument('-f', '--force',           help='If used, it will download even if output already exists'    , action='store_true')
 
@@ -151,6 +145,8 @@ def _get_args():
     Data.log_lvl = args.log
     Data.nthread = args.mth
     Data.ran_pfn = args.ran
+    Data.seed    = args.seed
+    Data.l_samp  = args.samp
     Data.drun    = args.dryr
     Data.force   = args.force
 # --------------------------------------------------
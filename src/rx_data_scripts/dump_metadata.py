@@ -1,27 +1,188 @@
 '''
-Script used to dump metadata stored in ROOT file to YAML file
+Script used to dump the metadata stored in ROOT files. It runs in two modes:
+
+- With `-f`, the metadata of one file is saved to `metadata.yaml`
+- With `-i`, the metadata of every file found in directories, YAML/JSON catalogs or wildcards, local
+  or XRootD paths, is read in parallel. Each distinct payload is saved once, keyed by a hash of it,
+  to `metadata_payloads.yaml`, together with the number of files having it. The table `metadata_table.csv`
+  has, for each file, the hash of its payload, the fields requested with `-k` and, if the metadata cannot be
+  read, e.g. the file cannot be opened or the payload is not JSON, an empty hash and the error
 '''
+import os
+import glob
 import json
+import hashlib
 import argparse
+from multiprocessing       import Pool
+from typing                import Union
 
 import yaml
-from ROOT import TFile
+import pandas as pnd
+from ROOT                  import TFile
+from dmu.logging.log_store import LogStore
+from rx_data               import utilities as ut
 
+log = LogStore.add_logger('rx_data:dump_metadata')
 # ------------------------------
 class Data:
     '''
     Data class used to store shared data
     '''
-    yaml_path = 'metadata.yaml'
-    fpath : str
-
+    yaml_path  = 'metadata.yaml'
+    table_name = 'metadata_table.csv'
+    mdata_name = 'metadata_payloads.yaml'
+    fpath      : Union[str,None]
+    l_inp      : list[str]
+    l_key      : list[str]
+    nprc       : int
+    out_dir    : str
 # ------------------------------
 def _parse_args() -> None:
-    parser = argparse.ArgumentParser(description='Script used to dump YAML file with metadata from ROOT file')
-    parser.add_argument('-f', '--fpath' , type=str, help='Path to ROOT file', required=True)
+    parser = argparse.ArgumentParser(description='Script used to dump YAML file with metadata from ROOT file, or table with metadata of many files')
+    group  = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('-f', '--fpath' , type=str, help='Path to ROOT file')
+    group.add_argument('-i', '--inputs', nargs='+', help='Directories, YAML/JSON catalogs with paths or wildcards, used to dump metadata of many files')
+    parser.add_argument('-k', '--keys' , nargs='+', help='Fields of metadata added to table, nested fields separated by dots, e.g. a.b', default=[])
+    parser.add_argument('-n', '--nprc' , type=int , help='Number of processes used to read files', default=8)
+    parser.add_argument('-o', '--out'  , type=str , help='Directory where outputs of batch mode go', default='.')
     args = parser.parse_args()
 
-    Data.fpath = args.fpath
+    Data.fpath   = args.fpath
+    Data.l_inp   = args.inputs
+    Data.l_key   = args.keys
+    Data.nprc    = args.nprc
+    Data.out_dir = args.out
+# ------------------------------
+def _read_metadata(path : str) -> tuple[Union[str,None],Union[str,None]]:
+    '''
+    Returns tuple with string stored in metadata object and error. If the
+    metadata cannot be read, the string is None and the error says why
+    '''
+    try:
+        ifile = TFile.Open(path)
+    except OSError as exc:
+        log.warning(f'Cannot open: {path}')
+        return None, f'Cannot open: {exc}'
+
+    if not ifile or ifile.IsZombie():
+        if ifile:
+            ifile.Close()
+
+        log.warning(f'Cannot open: {path}')
+        return None, 'Cannot open'
+
+    if not hasattr(ifile, 'metadata'):
+        ifile.Close()
+        log.warning(f'metadata missing in: {path}')
+        return None, 'Missing metadata'
+
+    meta_str = ifile.metadata.GetString().Data()
+    ifile.Close()
+
+    return meta_str, None
+# ------------------------------
+def _read_metadata_pool(path : str) -> tuple[str,Union[str,None],Union[str,None]]:
+    return path, *_read_metadata(path)
+# ------------------------------
+def _paths_from_catalog(data) -> list[str]:
+    '''
+    Takes loaded YAML/JSON catalog, returns ROOT paths found in it, at any depth
+    '''
+    if isinstance(data, str):
+        return [data] if data.endswith('.root') else []
+
+    if isinstance(data, dict):
+        data = list(data.values())
+
+    if isinstance(data, list):
+        return [ path for value in data for path in _paths_from_catalog(value) ]
+
+    return []
+# ------------------------------
+def _get_paths() -> list[str]:
+    '''
+    Returns list of unique paths to ROOT files from inputs
+    '''
+    l_path = []
+    for inp in Data.l_inp:
+        if '://' in inp:
+            l_path.append(inp)
+        elif os.path.isdir(inp):
+            l_path += glob.glob(f'{inp}/**/*.root', recursive=True)
+        elif inp.endswith(('.yaml', '.yml', '.json')):
+            l_path += _paths_from_catalog(ut.load_yaml(inp))
+        else:
+            l_path += glob.glob(inp)
+
+    l_path = sorted(set(l_path))
+    if len(l_path) == 0:
+        raise ValueError(f'No ROOT file found in: {Data.l_inp}')
+
+    return l_path
+# ------------------------------
+def _get_field(data : dict, key : str):
+    for name in key.split('.'):
+        if not isinstance(data, dict) or name not in data:
+            return None
+
+        data = data[name]
+
+    if isinstance(data, (dict, list)):
+        return json.dumps(data, sort_keys=True)
+
+    return data
+# ------------------------------
+def _dump_batch() -> None:
+    '''
+    Reads metadata of many files in parallel, saves each distinct payload once, keyed by its hash
+    and table with path, hash and requested fields for each file
+    '''
+    l_path = _get_paths()
+    npath  = len(l_path)
+    log.info(f'Reading metadata from {npath} files with {Data.nprc} processes')
+
+    with Pool(processes=Data.nprc) as pool:
+        l_meta = list(pool.imap_unordered(_read_metadata_pool, l_path, chunksize=8))
+
+    d_payload = {}
+    l_row     = []
+    for path, meta_str, error in sorted(l_meta, key=lambda meta : meta[0]):
+        if meta_str is None:
+            l_row.append({'path' : path, 'hash' : None, 'error' : error})
+            continue
+
+        hsh = hashlib.sha256(meta_str.encode('utf-8')).hexdigest()[:16]
+        if hsh not in d_payload:
+            try:
+                data = json.loads(meta_str)
+            except json.JSONDecodeError as exc:
+                log.warning(f'Metadata is not JSON in: {path}')
+                l_row.append({'path' : path, 'hash' : None, 'error' : f'Invalid JSON: {exc}'})
+                continue
+
+            d_payload[hsh] = {'nfiles' : 0, 'data' : data}
+
+        d_payload[hsh]['nfiles'] += 1
+        row = {'path' : path, 'hash' : hsh, 'error' : None}
+        for key in Data.l_key:
+            row[key] = _get_field(d_payload[hsh]['data'], key)
+
+        l_row.append(row)
+
+    npayload = len(d_payload)
+    log.info(f'Found {npayload} distinct payloads')
+
+    os.makedirs(Data.out_dir, exist_ok=True)
+    table_path = f'{Data.out_dir}/{Data.table_name}'
+    mdata_path = f'{Data.out_dir}/{Data.mdata_name}'
+
+    df = pnd.DataFrame(l_row, columns=['path', 'hash', 'error'] + Data.l_key)
+    df.to_csv(table_path, index=False)
+    log.info(f'Saved: {table_path}')
+
+    with open(mdata_path, 'w', encoding='utf-8') as ofile:
+        yaml.safe_dump(d_payload, ofile, width=float('inf'), sort_keys=False)
+    log.info(f'Saved: {mdata_path}')
 # ------------------------------
 def main():
     '''
@@ -29,6 +190,10 @@ def main():
     '''
     _parse_args()
 
+    if Data.fpath is None:
+        _dump_batch()
+        return
+
     ifile = TFile.Open(Data.fpath)
     if not hasattr(ifile, 'metadata'):
         ifile.ls()
@@ -0,0 +1,75 @@
+'''
+Script used to export samples, with friend trees, to Parquet files
+'''
+import argparse
+
+from dmu.logging.log_store    import LogStore
+from rx_data                  import utilities as ut
+from rx_data.rdf_getter       import RDFGetter
+from rx_data.parquet_exporter import ParquetExporter
+
+log = LogStore.add_logger('rx_data:export_parquet')
+# --------------------------------------
+class Data:
+    '''
+    Class used to share attributes
+    '''
+    sample      : str
+    trigger     : str
+    columns     : list[str]
+    selection   : dict[str,str]
+    out_dir     : str
+    float32     : bool
+    dictionary  : list[str]
+    compression : str
+    nmax        : int
+# --------------------------------------
+def _parse_args():
+    parser = argparse.ArgumentParser(description='Script used to export samples, with friend trees, to Parquet files, one per file in main sample')
+    parser.add_argument('-s', '--samp' , type=str , help='Sample, e.g. DATA_24_MagDown_24c2', required=True)
+    parser.add_argument('-t', '--trig' , type=str , help='Trigger, e.g. Hlt2RD_BuToKpEE_MVA', required=True)
+    parser.add_argument('-c', '--cols' , nargs='+', help='Columns to export, e.g. B_M mva.mva_cmb', required=True)
+    parser.add_argument('-x', '--sel'  , type=str , help='Path to YAML file with selection, with cut names as keys and cuts as values')
+    parser.add_argument('-o', '--out'  , type=str , help='Directory where Parquet files will go', required=True)
+    parser.add_argument('-f', '--f32'  ,            help='If used, double precision columns are stored with single precision', action='store_true')
+    parser.add_argument('-d', '--dict' , nargs='+', help='Columns stored with dictionary encoding', default=[])
+    parser.add_argument('-z', '--comp' , type=str , help='Compression', default='zstd')
+    parser.add_argument('-n', '--nmax' , type=int , help='If used, export at most this number of entries per file', default=-1)
+    parser.add_argument('-l', '--lvl'  , type=int , help='Logging level', choices=[10, 20, 30], default=20)
+    args = parser.parse_args()
+
+    Data.sample      = args.samp
+    Data.trigger     = args.trig
+    Data.columns     = args.cols
+    Data.selection   = {} if args.sel is None else ut.load_yaml(args.sel)
+    Data.out_dir     = args.out
+    Data.float32     = args.f32
+    Data.dictionary  = args.dict
+    Data.compression = args.comp
+    Data.nmax        = args.nmax
+
+    LogStore.set_level('rx_data:parquet_exporter', args.lvl)
+# --------------------------------------
+def main():
+    '''
+    Starts here
+    '''
+    _parse_args()
+    RDFGetter.max_entries = Data.nmax
+
+    exp = ParquetExporter(
+            sample      = Data.sample,
+            trigger     = Data.trigger,
+            columns     = Data.columns,
+            out_dir     = Data.out_dir,
+            selection   = Data.selection,
+            float32     = Data.float32,
+            dictionary  = Data.dictionary,
+            compression = Data.compression)
+
+    l_path = exp.run()
+    npath  = len(l_path)
+    log.info(f'Dataset with {npath} files in: {Data.out_dir}')
+# --------------------------------------
+if __name__ == '__main__':
+    main()
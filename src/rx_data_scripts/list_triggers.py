@@ -3,17 +3,14 @@ Script used to show a summary of triggers
 '''
 # pylint: disable=line-too-long, import-error
 
-import json
-import glob
 import argparse
 
 from typing                 import Union
 from dataclasses            import dataclass
-from importlib.resources    import files
 
 import yaml
 from dmu.logging.log_store  import LogStore
-from rx_data                import utilities as ut
+from rx_data.lfn_catalog    import LFNCatalog
 
 log = LogStore.add_logger('rx_data:list_triggers')
 
@@ -41,38 +38,14 @@ def _parse_args():
     Data.kind    = args.kind
 
     LogStore.set_level('rx_data:list_triggers', args.level)
+    LogStore.set_level('rx_data:lfn_catalog'  , args.level)
 # ----------------------------
 def _get_triggers() -> dict[str,int]:
-    lfn_wc = files('rx_data_lfns').joinpath(f'{Data.kind}/{Data.version}/*.json')
-    lfn_wc = str(lfn_wc)
-    l_path = glob.glob(lfn_wc)
-
-    npath  = len(l_path)
-    log.debug(f'Found {npath} paths in {lfn_wc}')
-
-    if len(l_path) == 0:
-        raise ValueError(f'No files found in: {lfn_wc}')
-
-    l_lfn  = []
-
-    for path in l_path:
-        with open(path, encoding='utf-8') as ifile:
-            l_lfn += json.load(ifile)
-
-    nlfn = len(l_lfn)
+    ctl  = LFNCatalog(kind=Data.kind, vers=Data.version)
+    nlfn = len(ctl)
     log.info(f'Found {nlfn} LFNs')
 
-    d_trigger = {}
-    for lfn in l_lfn:
-        _, trigger = ut.info_from_path(lfn)
-        if trigger not in d_trigger:
-            d_trigger[trigger] = 1
-        else:
-            d_trigger[trigger]+= 1
-
-    d_trigger_sorted = { name : d_trigger[name] for name in sorted(d_trigger) }
-
-    return d_trigger_sorted
+    return ctl.get_triggers()
 # ----------------------------
 def _save(d_trigger : dict[str,int]) -> None:
     if Data.outfile is None:
@@ -0,0 +1,68 @@
+'''
+Script used to build the compressed catalogs of LFNs shipped with the project
+'''
+import os
+import glob
+import argparse
+from importlib.resources    import files
+
+from dmu.logging.log_store  import LogStore
+from rx_data.lfn_catalog    import LFNCatalog
+
+log = LogStore.add_logger('rx_data:make_lfn_catalog')
+# ----------------------------
+class Data:
+    '''
+    Data class storing shared attributes
+    '''
+    kind    : str
+    version : str
+
+    l_kind  = ['rx', 'lbpkmumu']
+# ----------------------------
+def _parse_args() -> None:
+    parser = argparse.ArgumentParser(description='Script used to build catalogs of LFNs, needs to run every time a new list of LFNs is added')
+    parser.add_argument('-k', '--kind' , type=str, help='Type of production', choices=Data.l_kind + ['all'], default='all')
+    parser.add_argument('-v', '--vers' , type=str, help='Version of LFNs, by default all versions', default='all')
+    parser.add_argument('-l', '--level', type=int, help='Logging level', choices=[10, 20, 30], default=20)
+    args = parser.parse_args()
+
+    Data.kind    = args.kind
+    Data.version = args.vers
+
+    LogStore.set_level('rx_data:make_lfn_catalog', args.level)
+    LogStore.set_level('rx_data:lfn_catalog'     , args.level)
+# ----------------------------
+def _get_versions(kind : str) -> list[str]:
+    if Data.version != 'all':
+        return [Data.version]
+
+    kind_dir = str(files('rx_data_lfns').joinpath(kind))
+    l_vers   = [ os.path.basename(path) for path in glob.glob(f'{kind_dir}/v*') ]
+
+    return sorted(l_vers)
+# ----------------------------
+def _has_lfns(kind : str, vers : str) -> bool:
+    json_wc = files('rx_data_lfns').joinpath(f'{kind}/{vers}/*.json')
+    l_json  = glob.glob(str(json_wc))
+
+    return len(l_json) != 0
+# ----------------------------
+def main():
+    '''
+    Starts here
+    '''
+    _parse_args()
+
+    l_kind = Data.l_kind if Data.kind == 'all' else [Data.kind]
+    for kind in l_kind:
+        for vers in _get_versions(kind):
+            if not _has_lfns(kind, vers):
+                log.warning(f'No JSON files found for {kind}/{vers}, skipping')
+                continue
+
+            log.info(f'Building catalog for {kind}/{vers}')
+            LFNCatalog.build(kind=kind, vers=vers)
+# ----------------------------
+if __name__ == '__main__':
+    main()
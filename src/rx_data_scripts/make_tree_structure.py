@@ -4,31 +4,25 @@ Script used to link ntuples properly and merge them
 
 # pylint: disable=line-too-long, import-error
 # pylint: disable=invalid-name
+# pylint: disable=import-outside-toplevel
 
 import re
 import os
 import glob
-import json
 import argparse
 from typing                 import Union
 from dataclasses            import dataclass
-from importlib.resources    import files
+from multiprocessing        import Pool
 
-import yaml
 import dmu.generic.utilities as gut
-from dmu.rfile.rfprinter    import RFPrinter
 from dmu.logging.log_store  import LogStore
 from rx_data.path_splitter  import PathSplitter
+from rx_data.lfn_catalog    import LFNCatalog
+from rx_data.file_cache     import FileCache
+from rx_data                import utilities as ut
 
 log   = LogStore.add_logger('rx_data:make_tree_structure')
 # ---------------------------------
-class IndentListDumper(yaml.SafeDumper):
-    '''
-    Class needed to implement indentation correctly in dumped yaml files
-    '''
-    def increase_indent(self, flow=False, indentless=False):
-        return super().increase_indent(flow, False)
-# ---------------------------------
 @dataclass
 class Data:
     '''
@@ -36,6 +30,8 @@ class Data:
     '''
     grid_preffix = 'root://x509up_u12477@eoslhcb.cern.ch//eos/lhcb/grid/user'
     eos_preffix  = 'root://eosuser.cern.ch/'
+    summary_name = 'summary.txt'
+    cache_name   = '.summary_cache.json'
     l_line_to_pick : list[str]
 
     naming    : str
@@ -44,6 +40,8 @@ class Data:
     new_path  : str
     ver       : str
     dry       : bool
+    rebuild   : bool
+    nprc      : int
     jsn_ver   : str
     inp_path  : str
     out_path  : str
@@ -69,20 +67,10 @@ def _get_paths_from_json() -> list[str]:
     if Data.kind is None:
         raise ValueError('Kind argument not passed')
 
-    jsn_wc = files('rx_data_lfns').joinpath(f'{Data.kind}/{Data.jsn_ver}/*.json')
-    jsn_wc = str(jsn_wc)
-    l_path = glob.glob(jsn_wc)
-
-    npath  = len(l_path)
-    if npath == 0:
-        raise FileNotFoundError(f'No files found in {jsn_wc}')
-
-    l_lfn  = []
-    for path in l_path:
-        with open(path, encoding='utf-8') as ifile:
-            l_this_file = json.load(ifile)
-            l_this_file = [ f'{Data.grid_preffix}{this_file}' for this_file in l_this_file ]
-            l_lfn      += l_this_file
+    # All LFNs are returned, including the ones whose sample and trigger could not be extracted,
+    # the lines are picked downstream
+    ctl    = LFNCatalog(kind=Data.kind, vers=Data.jsn_ver)
+    l_lfn  = [ f'{Data.grid_preffix}{lfn}' for lfn in ctl.get_column('lfn') ]
 
     return l_lfn
 # ---------------------------------
@@ -100,6 +88,9 @@ def _link_paths(sample : str, line : str, l_path : list[str]) -> Union[str, None
     Makes symbolic links of list of paths of a specific kind
     info is a tuple with = (sample, channel, kind, year) information
     Will return directory where linked files are
+
+    Unless rebuilding, only links that are missing or point to a different file
+    are made and links to files no longer in the list are removed
     '''
     if Data.out_path is None:
         return None
@@ -107,7 +98,7 @@ def _link_paths(sample : str, line : str, l_path : list[str]) -> Union[str, None
     npath = len(l_path)
     log.debug(f'Linking {npath} paths for {sample}/{line}')
 
-    target_dir  = f'{Data.out_path}/{Data.ver}/post_ap/{sample}/{line}'
+    target_dir  = _get_target_dir(sample, line)
     os.makedirs(target_dir, exist_ok=True)
 
     log.debug(f'Linking to: {target_dir}')
@@ -115,42 +106,127 @@ def _link_paths(sample : str, line : str, l_path : list[str]) -> Union[str, None
         log.warning('Dry run, not linking')
         return None
 
-    for source_path in l_path:
-        file_name   = os.path.basename(source_path)
-        target_path = f'{target_dir}/{file_name}'
+    d_link_new = { os.path.basename(source_path) : source_path for source_path in l_path }
+    d_link_old = {} if Data.rebuild else _get_links(target_dir)
+
+    nlinked  = 0
+    for file_name, source_path in d_link_new.items():
+        if d_link_old.get(file_name) == source_path:
+            continue
 
+        target_path = f'{target_dir}/{file_name}'
         log.debug(f'{source_path:<50}{"->":10}{target_path:<50}')
         _do_link_paths(src=source_path, tgt=target_path)
+        nlinked += 1
+
+    l_stale = [ file_name for file_name in d_link_old if file_name not in d_link_new ]
+    for file_name in l_stale:
+        log.debug(f'Removing stale link: {target_dir}/{file_name}')
+        os.unlink(f'{target_dir}/{file_name}')
+
+    nstale = len(l_stale)
+    log.debug(f'Linked {nlinked} paths, removed {nstale} links')
 
     return target_dir
 # ---------------------------------
+def _get_target_dir(sample : str, line : str) -> str:
+    return f'{Data.out_path}/{Data.ver}/post_ap/{sample}/{line}'
+# ---------------------------------
+def _get_links(target_dir : str) -> dict[str,str]:
+    '''
+    Returns dictionary mapping name of ROOT file to path it points to,
+    for all the symbolic links in directory
+    '''
+    d_link = {}
+    with os.scandir(target_dir) as it_entry:
+        for entry in it_entry:
+            if not entry.name.endswith('.root') or not entry.is_symlink():
+                continue
+
+            d_link[entry.name] = os.readlink(entry.path)
+
+    return d_link
+# ---------------------------------
 def _do_link_paths(src : str, tgt : str) -> None:
     '''
     Will check if target link exists, will delete it if it does
     Will make link
     '''
-    if os.path.exists(tgt):
+    if os.path.lexists(tgt):
         os.unlink(tgt)
 
     os.symlink(src, tgt)
 # ---------------------------------
-@gut.timeit
-def _save_summary(target_dir : str) -> None:
+def _get_summary_file(target_dir : str) -> Union[str,None]:
     '''
-    Make text file with summary of file, e.g. 2024.root -> 2024.txt
+    Returns path to ROOT file used to make summary, None if no file found
     '''
-    if Data.dry:
-        return
-
     l_file_path = glob.glob(f'{target_dir}/*.root')
     if len(l_file_path) == 0:
         log.warning(f'No ROOT file found in {target_dir}')
-        return
+        return None
+
+    return min(l_file_path)
+# ---------------------------------
+def _get_source_identity(target_file : str) -> Union[tuple[str,int,int],None]:
+    '''
+    Returns identity of file the link points to. Files in the grid cannot be
+    accessed locally but are never overwritten, they are identified by their path
+    '''
+    source_path = os.readlink(target_file) if os.path.islink(target_file) else target_file
+    if '://' in source_path:
+        return source_path, -1, -1
 
-    target_file = l_file_path[0]
+    # Target of link can be relative to the directory of the link
+    return FileCache.identity(os.path.realpath(target_file))
+# ---------------------------------
+def _save_summary(target_file : str) -> None:
+    '''
+    Make text file with summary of file, e.g. 2024.root -> 2024.txt
+    '''
+    # RFPrinter needs ROOT, import it only when summaries are made
+    from dmu.rfile.rfprinter import RFPrinter
 
     prt = RFPrinter(path=target_file)
-    prt.save(file_name='summary.txt', raise_on_fail=False)
+    prt.save(file_name=Data.summary_name, raise_on_fail=False)
+# ---------------------------------
+@gut.timeit
+def _save_summaries(l_target_dir : list[str]) -> None:
+    '''
+    Makes summaries for directories in list. Summaries are made in parallel and
+    only if the file they are made from changed since the last time
+    '''
+    if Data.dry or len(l_target_dir) == 0:
+        return
+
+    cache  = FileCache(path=f'{Data.out_path}/{Data.ver}/post_ap/{Data.cache_name}')
+    d_file = {}
+    for target_dir in l_target_dir:
+        target_file = _get_summary_file(target_dir)
+        if target_file is None:
+            continue
+
+        identity = _get_source_identity(target_file)
+        summary  = f'{target_dir}/{Data.summary_name}'
+        if not Data.rebuild and cache.get(target_file, identity=identity) == target_dir and os.path.isfile(summary):
+            log.debug(f'Summary up to date: {summary}')
+            continue
+
+        d_file[target_file] = identity
+
+    nfile = len(d_file)
+    log.info(f'Making {nfile} summaries with {Data.nprc} processes')
+    if Data.nprc > 1 and nfile > 1:
+        with Pool(processes=Data.nprc) as pool:
+            pool.map(_save_summary, list(d_file))
+    else:
+        for target_file in d_file:
+            _save_summary(target_file)
+
+    for target_file, identity in d_file.items():
+        cache.set(target_file, os.path.dirname(target_file), identity=identity)
+
+    cache.save()
 # ---------------------------------
 def _get_args() -> argparse.Namespace:
     '''
@@ -166,6 +242,8 @@ def _get_args() -> argparse.Namespace:
     parser.add_argument('-k', '--kind', type=str, help='Type of production', choices=['rx', 'lbpkmumu'])
     parser.add_argument('-n', '--nam' , type=str, help='Naming scheme for samples', default='new', choices=['new', 'old'])
     parser.add_argument('-m', '--max' , type=int, help='Maximum number of paths, for test runs'   , default=-1)
+    parser.add_argument('-j', '--nprc', type=int, help='Number of processes used to make summaries', default=1)
+    parser.add_argument('-r', '--rebuild',        help='Remake all links and summaries, by default only what changed is remade', action='store_true')
     parser.add_argument('-l', '--lvl' , type=int, help='log level', choices=[10, 20, 30]          , default=20)
     parser.add_argument('-d', '--dry' ,           help='Dry run if 1', action='store_true')
     args = parser.parse_args()
@@ -190,8 +268,7 @@ def _load_lines(args : argparse.Namespace) -> list[str]:
 
     path = args.trg
     log.debug(f'Picking up lines from: {path}')
-    with open(path, encoding='utf-8') as ifile:
-        d_trig = yaml.safe_load(ifile)
+    d_trig = ut.load_yaml(path)
 
     return list(d_trig)
 # ---------------------------------
@@ -206,6 +283,8 @@ def _initialize(args : argparse.Namespace) -> None:
     Data.out_path  = args.out
     Data.fil_path  = args.fle
     Data.new_path  = args.path
+    Data.nprc      = args.nprc
+    Data.rebuild   = args.rebuild
 
     LogStore.set_level('rx_data:make_tree_structure', args.lvl)
     LogStore.set_level('rx_data:path_splitter'      , args.lvl)
@@ -255,9 +334,8 @@ def _save_to_file(d_struc : dict) -> None:
     d_struc = _change_file_paths(d_struc)
 
     log.info(f'Saving samples list to: {Data.fil_path}')
-    with open(Data.fil_path, 'w', encoding='utf-8') as ofile:
-        _sort_lists(d_struc)
-        yaml.dump(d_struc, ofile, Dumper=IndentListDumper, default_flow_style=False)
+    _sort_lists(d_struc)
+    ut.dump_samples(d_struc, Data.fil_path)
 # ---------------------------------
 def _drop_line(line_name : str) -> bool:
     if len(Data.l_line_to_pick) == 0:
@@ -279,7 +357,8 @@ def main():
     splt   = PathSplitter(paths=l_path, max_files=Data.max_files, sample_naming=Data.naming)
     d_path = splt.split()
 
-    d_struc = {}
+    d_struc      = {}
+    l_target_dir = []
     for (sample, line), l_path in d_path.items():
         if _drop_line(line):
             log.debug(f'Dropping {line}')
@@ -292,8 +371,9 @@ def main():
 
         target_dir = _link_paths(sample, line, l_path)
         if target_dir is not None:
-            _save_summary(target_dir)
+            l_target_dir.append(target_dir)
 
+    _save_summaries(l_target_dir)
     _save_to_file(d_struc)
 # ---------------------------------
 if __name__ == '__main__':
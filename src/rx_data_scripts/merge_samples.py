@@ -3,12 +3,15 @@ Script used to merge ROOT files
 '''
 
 import os
+import json
+import fnmatch
 import argparse
-import subprocess
+from multiprocessing       import Pool
+from typing                import Union
 
-import yaml
-from ROOT                  import TFileMerger
+from ROOT                  import TFileMerger, TFile, RDataFrame, RDF
 from dmu.logging.log_store import LogStore
+from rx_data               import utilities as ut
 
 log = LogStore.add_logger('rx_data:merge_samples')
 # --------------------------------------
@@ -20,18 +23,44 @@ class Data:
     sample_name  : str
     trigger_name : str
     out_dir      : str
+    nprc         : int
+    fanin        : int
+    target_size  : Union[int,None]
+    comp         : Union[str,None]
+    clevel       : int
+    bsize        : Union[int,None]
+    d_mnf        : dict[str,dict]
+
+    l_skip_obj   = ['metadata']
+    d_comp       = {'zlib' : 1, 'lzma' : 2, 'lz4' : 4, 'zstd' : 5}
+    manifest     = 'manifest.json'
 # --------------------------------------
 def _parse_args():
     parser = argparse.ArgumentParser(description='Script used to merge ROOT files from list of samples')
     parser.add_argument('-p', '--path' , type=str, help='Path to file storing lists of samples', required=True)
-    parser.add_argument('-s', '--samp' , type=str, help='Name of sample to merge', required=True)
-    parser.add_argument('-t', '--trig' , type=str, help='Trigger'                , required=True)
+    parser.add_argument('-s', '--samp' , type=str, help='Name of sample to merge, accepts wildcards, by default all', default='*')
+    parser.add_argument('-t', '--trig' , type=str, help='Trigger, accepts wildcards, by default all'                , default='*')
+    parser.add_argument('-n', '--nprc' , type=int, help='Number of processes, each merges a sample and trigger'     , default=1)
+    parser.add_argument('-f', '--fanin', type=int, help='Maximum number of files merged at once, larger inputs are merged in steps', default=100)
+    parser.add_argument('-S', '--target-size', type=int, help='If passed, each sample and trigger will be merged into files of roughly this size in MB')
+    parser.add_argument('-c', '--comp' , type=str, help='Compression algorithm of outputs, by default, the one of the first input', choices=list(Data.d_comp))
+    parser.add_argument('-z', '--clevel',type=int, help='Compression level, used with --comp', default=4)
+    parser.add_argument('-b', '--bsize', type=int, help='Basket size in bytes of outputs, by default, the one of the inputs, or the one of ROOT if --comp is passed')
     args = parser.parse_args()
 
     Data.samples_path = args.path
     Data.sample_name  = args.samp
     Data.trigger_name = args.trig
+    Data.nprc         = args.nprc
+    Data.fanin        = args.fanin
+    Data.target_size  = args.target_size
+    Data.comp         = args.comp
+    Data.clevel       = args.clevel
+    Data.bsize        = args.bsize
     Data.out_dir      = _get_out_dir()
+
+    if Data.fanin < 2:
+        raise ValueError(f'Fan-in has to be at least 2, found: {Data.fanin}')
 # --------------------------------------
 def _get_out_dir() -> str:
     config_dir = os.path.dirname(Data.samples_path)
@@ -42,39 +71,276 @@ def _get_out_dir() -> str:
     return out_dir
 # --------------------------------------
 def _get_samples() -> dict:
-    with open(Data.samples_path, encoding='utf-8') as ifile:
-        d_data = yaml.safe_load(ifile)
+    d_data = ut.load_yaml(Data.samples_path)
 
     return d_data
+# --------------------------------------
+def _get_jobs(d_data : dict) -> list[tuple[str,str,list[str]]]:
+    '''
+    Returns list of (sample, trigger, paths) for samples and triggers matching arguments
+    '''
+    l_job = []
+    for sample, d_trigger in d_data.items():
+        if not fnmatch.fnmatch(sample, Data.sample_name):
+            continue
+
+        for trigger, l_path in d_trigger.items():
+            if fnmatch.fnmatch(trigger, Data.trigger_name):
+                l_job.append((sample, trigger, l_path))
+
+    if len(l_job) == 0:
+        raise ValueError(f'No sample and trigger found for {Data.sample_name}/{Data.trigger_name}')
+
+    return l_job
 # ----------------------------
-def _merge_paths(l_path : list[str]) -> None:
-    sample_name = Data.sample_name.lower()
-    out_path    = f'{Data.out_dir}/{sample_name}_{Data.trigger_name}.root'
-    if os.path.isfile(out_path):
-        log.info(f'File already found: {out_path}')
-        return
+def _get_bins(l_path : list[str]) -> list[list[str]]:
+    '''
+    Splits paths into groups of roughly the target size, with similar sizes.
+    If no target size was passed, returns a single group
+    '''
+    if Data.target_size is None:
+        return [l_path]
+
+    d_size = { path : os.path.getsize(os.path.realpath(path)) for path in l_path }
+    target = Data.target_size * 1024 ** 2
+    nbin   = max(1, round(sum(d_size.values()) / target))
+
+    # Biggest files first, each goes to the smallest bin
+    l_bin  = [ [] for _ in range(nbin) ]
+    l_size = [ 0  for _ in range(nbin) ]
+    for path in sorted(l_path, key=lambda path : d_size[path], reverse=True):
+        ibin = l_size.index(min(l_size))
+        l_bin[ibin].append(path)
+        l_size[ibin] += d_size[path]
+
+    return [ sorted(l_bin_path) for l_bin_path in l_bin if len(l_bin_path) != 0 ]
+# ----------------------------
+def _get_entries(path : str) -> dict[str,int]:
+    '''
+    Returns dictionary with tree name as key and number of entries as value
+    '''
+    ifile   = TFile.Open(path)
+    d_entry = {}
+    for key in ifile.GetListOfKeys():
+        if key.GetClassName() != 'TTree':
+            continue
+
+        d_entry[key.GetName()] = ifile.Get(key.GetName()).GetEntries()
+
+    ifile.Close()
+
+    return d_entry
+# ----------------------------
+def _get_settings() -> dict:
+    '''
+    Returns dictionary with the arguments that change the merged files
+    '''
+    return {
+            'target_size' : Data.target_size,
+            'comp'        : Data.comp,
+            'clevel'      : Data.clevel if Data.comp is not None else None,
+            'bsize'       : Data.bsize}
+# ----------------------------
+def _can_reuse(out_path : str, l_path : list[str]) -> bool:
+    '''
+    Returns True if merged file exists and was made, according to the manifest,
+    from the same inputs and with the same settings
+    '''
+    if not os.path.isfile(out_path):
+        return False
+
+    d_info = Data.d_mnf.get(os.path.basename(out_path))
+    if d_info is None:
+        log.warning(f'File not in manifest, merging again: {out_path}')
+        return False
+
+    if d_info.get('paths') != sorted(l_path) or d_info.get('settings') != _get_settings():
+        log.warning(f'Inputs or settings changed, merging again: {out_path}')
+        return False
+
+    return True
+# ----------------------------
+def _remove_orphans(sample_name : str, trigger : str, d_out : dict[str,dict]) -> None:
+    '''
+    Removes merged files of this sample and trigger, left by earlier runs, that are not among the current outputs
+    '''
+    l_name = [ f'{sample_name}_{trigger}.root' ] + [ name for name in os.listdir(Data.out_dir) if fnmatch.fnmatch(name, f'{sample_name}_{trigger}_[0-9][0-9][0-9].root') ]
+    for name in l_name:
+        path = f'{Data.out_dir}/{name}'
+        if path in d_out or not os.path.isfile(path):
+            continue
+
+        log.warning(f'Removing merged file from earlier run: {path}')
+        os.remove(path)
+# ----------------------------
+def _merge_job(job : tuple[str,str,list[str]]) -> tuple[str,str,dict[str,dict]]:
+    '''
+    Takes (sample, trigger, paths), merges paths and returns (sample, trigger, outputs),
+    where outputs maps each merged path to its inputs, settings, size and entries per tree
+    '''
+    sample, trigger, l_path = job
+
+    sample_name = sample.lower()
+    l_bin       = _get_bins(l_path)
+    d_out       = {}
+    for ibin, l_bin_path in enumerate(l_bin):
+        suffix   = '' if Data.target_size is None else f'_{ibin:03}'
+        out_path = f'{Data.out_dir}/{sample_name}_{trigger}{suffix}.root'
+        if _can_reuse(out_path, l_bin_path):
+            log.info(f'File already found: {out_path}')
+        else:
+            npath = len(l_bin_path)
+            log.info(f'Merging {npath} paths for {sample_name}/{trigger} into {out_path}')
+            _merge_tree(l_bin_path, out_path)
 
-    npath = len(l_path)
-    log.info(f'Merging {npath} paths for {sample_name}/{Data.trigger_name}')
+        d_out[out_path] = {
+                'inputs'  : len(l_bin_path),
+                'paths'   : sorted(l_bin_path),
+                'settings': _get_settings(),
+                'size'    : os.path.getsize(out_path),
+                'entries' : _get_entries(out_path)}
+
+    _remove_orphans(sample_name, trigger, d_out)
+
+    return sample, trigger, d_out
+# ----------------------------
+def _merge_tree(l_path : list[str], out_path : str) -> None:
+    '''
+    Merges paths into out_path. If there are more paths than the fan-in
+    they are merged in groups into temporary files, which are merged in turn
+    '''
+    level   = 0
+    l_input = l_path
+    l_temp  = []
+    while len(l_input) > Data.fanin:
+        l_group = [ l_input[start:start + Data.fanin] for start in range(0, len(l_input), Data.fanin) ]
+        l_level = []
+        for igroup, l_group_path in enumerate(l_group):
+            tmp_path = out_path.replace('.root', f'_{level:02}_{igroup:04}_pre_merge.root')
+            _merge_paths(l_group_path, tmp_path)
+            l_level.append(tmp_path)
+
+        ngroup = len(l_group)
+        log.debug(f'Merged level {level} into {ngroup} files')
+
+        _remove_files(l_temp)
+        l_temp  = l_level
+        l_input = l_level
+        level  += 1
+
+    _merge_paths(l_input, out_path)
+    _remove_files(l_temp)
+# ----------------------------
+def _remove_files(l_path : list[str]) -> None:
+    for path in l_path:
+        os.remove(path)
+# ----------------------------
+def _merge_paths(l_path : list[str], out_path : str) -> None:
+    '''
+    Merges paths into temporary file, which is renamed to out_path if merging succeeded.
+    The objects in `l_skip_obj` are not copied.
+    '''
+    tmp_path = out_path.replace('.root', '_tmp.root')
+    if Data.comp is not None or Data.bsize is not None:
+        _snapshot_paths(l_path, tmp_path)
+        os.replace(tmp_path, out_path)
+        return
 
     fm = TFileMerger(isLocal=False)
     fm.SetFastMethod(True)
     for path in l_path:
         fm.AddFile(path, cpProgress=False)
 
-    fm.OutputFile(out_path, 'RECREATE')
-    success = fm.Merge()
+    for name in Data.l_skip_obj:
+        fm.AddObjectNames(name)
+
+    fm.OutputFile(tmp_path, 'RECREATE')
+    success = fm.PartialMerge(TFileMerger.kAll | TFileMerger.kRegular | TFileMerger.kSkipListed)
     if not success:
-        raise RuntimeError('Merge failed')
+        raise RuntimeError(f'Merge failed for: {out_path}')
 
-    _remove_objects(out_path)
+    os.replace(tmp_path, out_path)
 # ----------------------------
-def _remove_objects(out_path : str) -> None:
-    log.info('Removing not needed objects from merged file')
-    result = subprocess.run(['rootrm', f'{out_path}:metadata'], capture_output=True, text=True, check=False)
+def _get_compression(path : str) -> tuple[int,int]:
+    '''
+    Returns compression algorithm and level, to be used in outputs. If not passed, they are the ones of the file in `path`
+    '''
+    if Data.comp is not None:
+        return Data.d_comp[Data.comp], Data.clevel
+
+    ifile    = TFile.Open(path)
+    settings = ifile.GetCompressionSettings()
+    ifile.Close()
+
+    return settings // 100, settings % 100
+# ----------------------------
+def _get_snapshot_options(algorithm : int, level : int) -> RDF.RSnapshotOptions:
+    opts = RDF.RSnapshotOptions()
+    opts.fMode                 = 'UPDATE'
+    opts.fCompressionAlgorithm = algorithm
+    opts.fCompressionLevel     = level
+
+    if Data.bsize is not None:
+        opts.fBasketSize = Data.bsize
+
+    return opts
+# ----------------------------
+def _snapshot_paths(l_path : list[str], out_path : str) -> None:
+    '''
+    Writes trees in input files, except objects in `l_skip_obj`, with the compression
+    and basket size requested. Needed because TFileMerger copies the baskets as they are.
+    '''
+    l_tree = [ name for name in _get_entries(l_path[0]) if name not in Data.l_skip_obj ]
+    if len(l_tree) == 0:
+        raise ValueError(f'No tree found in: {l_path[0]}')
+
+    # File is created with the right compression, trees are then added one by one
+    algorithm, level = _get_compression(l_path[0])
+    ofile = TFile(out_path, 'RECREATE')
+    ofile.SetCompressionSettings(100 * algorithm + level)
+    ofile.Close()
+
+    opts = _get_snapshot_options(algorithm, level)
+    for tree in l_tree:
+        rdf = RDataFrame(tree, l_path)
+        rdf.Snapshot(tree, out_path, '', opts)
+# ----------------------------
+def _load_manifest() -> dict[str,dict]:
+    mnf_path = f'{Data.out_dir}/{Data.manifest}'
+    if not os.path.isfile(mnf_path):
+        return {}
+
+    with open(mnf_path, encoding='utf-8') as ifile:
+        return json.load(ifile)
+# ----------------------------
+def _save_manifest(l_merged : list[tuple[str,str,dict[str,dict]]]) -> None:
+    '''
+    Updates JSON file in output directory with, for each merged file, sample, trigger,
+    inputs, settings, size and entries per tree. Entries of files removed are dropped
+    '''
+    mnf_path = f'{Data.out_dir}/{Data.manifest}'
+    d_mnf    = _load_manifest()
+
+    s_merged = { (sample, trigger) for sample, trigger, _ in l_merged }
+    d_mnf    = { name : d_info for name, d_info in d_mnf.items() if (d_info['sample'], d_info['trigger']) not in s_merged }
+    for sample, trigger, d_out in l_merged:
+        for out_path, d_info in d_out.items():
+            d_mnf[os.path.basename(out_path)] = {'sample' : sample, 'trigger' : trigger, **d_info}
+
+    log.info(f'Saving manifest to: {mnf_path}')
+    with open(mnf_path, 'w', encoding='utf-8') as ofile:
+        json.dump(d_mnf, ofile, indent=4, sort_keys=True)
+# ----------------------------
+def _save_samples(d_data : dict, l_merged : list[tuple[str,str,dict[str,dict]]]) -> None:
+    '''
+    Saves copy of samples YAML file, where merged samples point to merged files
+    '''
+    for sample, trigger, d_out in l_merged:
+        d_data[sample][trigger] = list(d_out)
 
-    if result.returncode != 0:
-        raise RuntimeError('Cannot delete metadata from file')
+    out_path = f'{Data.out_dir}/{os.path.basename(Data.samples_path)}'
+    log.info(f'Saving list of samples to: {out_path}')
+    ut.dump_samples(d_data, out_path)
 # ----------------------------
 def main():
     '''
@@ -82,15 +348,21 @@ def main():
     '''
     _parse_args()
     d_data = _get_samples()
-    if Data.sample_name not in d_data:
-        raise ValueError(f'Sample {Data.sample_name} not found')
+    l_job  = _get_jobs(d_data)
 
-    if Data.trigger_name not in d_data[Data.sample_name]:
-        raise ValueError(f'Trigger {Data.trigger_name} not found for sample {Data.sample_name}')
+    # Loaded before the processes are forked, such that they can check which outputs can be reused
+    Data.d_mnf = _load_manifest()
 
-    l_path = d_data[Data.sample_name][Data.trigger_name]
+    njob   = len(l_job)
+    log.info(f'Merging {njob} samples with {Data.nprc} processes')
+    if Data.nprc > 1 and njob > 1:
+        with Pool(processes=Data.nprc) as pool:
+            l_merged = pool.map(_merge_job, l_job, chunksize=1)
+    else:
+        l_merged = [ _merge_job(job) for job in l_job ]
 
-    _merge_paths(l_path)
+    _save_manifest(l_merged)
+    _save_samples(d_data, l_merged)
 
     log.info('Merge finished')
 # ----------------------------
@@ -0,0 +1,43 @@
+'''
+Module with fixtures shared by the tests
+'''
+import numpy
+import uproot
+import pytest
+
+from rx_data.stats import Stats
+from rx_data       import utilities as ut
+# ----------------------------------------
+@pytest.fixture
+def samples_path(tmp_path, monkeypatch) -> str:
+    '''
+    Writes small files with DecayTree and MCDecayTree, where the i-th file of each sample and trigger
+    has 10 + i entries, and YAML file with the samples. The YAML file is used as the main sample
+    by `Stats`, whose cache is moved to the temporary directory. Returns path to YAML file
+    '''
+    d_data = {}
+    for sample in ['Bu_Kee_eq_btosllball05_DPC', 'Bu_Kmumu_eq_btosllball05_DPC']:
+        d_data[sample] = {}
+        for trigger in ['Hlt2RD_BuToKpEE_MVA', 'Hlt2RD_BuToKpMuMu_MVA']:
+            l_path = []
+            for ifile in range(3):
+                nentries = 10 + ifile
+                path     = f'{tmp_path}/{sample}_{trigger}_{ifile:03}.root'
+                with uproot.recreate(path) as rfile:
+                    mc_tree = rfile.mktree('MCDecayTree', {'x' : 'f8'})
+                    mc_tree.extend({'x' : numpy.zeros(nentries)})
+
+                    tree    = rfile.mktree('DecayTree', {'B_M' : 'f8', 'B_PT' : 'f4'})
+                    tree.extend({'B_M' : numpy.random.normal(size=nentries), 'B_PT' : numpy.zeros(nentries, dtype='float32')})
+
+                l_path.append(path)
+
+            d_data[sample][trigger] = l_path
+
+    yaml_path = f'{tmp_path}/main.yaml'
+    ut.dump_samples(d_data, yaml_path)
+
+    monkeypatch.setattr(Stats, 'd_sample'  , {'main' : yaml_path})
+    monkeypatch.setattr(Stats, 'cache_path', f'{tmp_path}/cache/entries.json')
+
+    return yaml_path
@@ -0,0 +1,141 @@
+'''
+Module with tests for ChunkCheckpoint class
+'''
+import os
+
+import numpy
+import uproot
+import pytest
+from dmu.logging.log_store    import LogStore
+from rx_data.column_writer    import ColumnWriter
+from rx_data.chunk_checkpoint import ChunkCheckpoint
+
+log = LogStore.add_logger('rx_data:test_chunk_checkpoint')
+# ----------------------------------------
+class Data:
+    '''
+    Class used to share attributes
+    '''
+    config = {'input' : ('/some/file.root', 100, 1), 'chunk_size' : 100}
+    nchunk = 4
+# ----------------------------------------
+@pytest.fixture(scope='session', autouse=True)
+def _initialize():
+    LogStore.set_level('rx_data:chunk_checkpoint', 10)
+# ----------------------------------------
+def _get_data(index : int) -> dict[str,numpy.ndarray]:
+    return {
+            'hop_mass'    : numpy.arange(100, dtype='float64') + 100 * index,
+            'EVENTNUMBER' : numpy.arange(100, dtype='uint64' ) + 100 * index}
+# ----------------------------------------
+def _run(out_path : str, config : dict, stop_at : int = -1) -> list[int]:
+    '''
+    Processes chunks, stopping before chunk `stop_at`, if passed, returns indices of chunks processed
+    '''
+    ckp = ChunkCheckpoint(out_path=out_path, config=config)
+    l_index = []
+    for index in range(Data.nchunk):
+        if index < ckp.ndone:
+            continue
+
+        if index == stop_at:
+            return l_index
+
+        with ColumnWriter(path=ckp.get_chunk_path(index)) as wrt:
+            wrt.write(_get_data(index))
+
+        ckp.add(index, 100 * index, 100 * (index + 1))
+        l_index.append(index)
+
+    ckp.merge()
+
+    return l_index
+# ----------------------------------------
+def _check_output(out_path : str) -> None:
+    with uproot.open(out_path) as ifile:
+        d_data = ifile['DecayTree'].arrays(library='np')
+
+    numpy.testing.assert_array_equal(d_data['hop_mass'   ], numpy.arange(100 * Data.nchunk, dtype='float64'))
+    numpy.testing.assert_array_equal(d_data['EVENTNUMBER'], numpy.arange(100 * Data.nchunk, dtype='uint64' ))
+# ----------------------------------------
+def test_resume(tmp_path):
+    '''
+    Tests that a stopped job continues from the first missing chunk
+    '''
+    out_path = f'{tmp_path}/file.root'
+
+    assert _run(out_path, Data.config, stop_at=2) == [0, 1]
+    assert not os.path.isfile(out_path)
+
+    assert _run(out_path, Data.config) == [2, 3]
+    assert os.listdir(tmp_path) == ['file.root']
+
+    _check_output(out_path)
+# ----------------------------------------
+def test_corrupted_chunk(tmp_path):
+    '''
+    Tests that chunks after a modified one are processed again
+    '''
+    out_path = f'{tmp_path}/file.root'
+    _run(out_path, Data.config, stop_at=3)
+
+    with open(f'{out_path}.chunks/00001.root', 'ab') as ofile:
+        ofile.write(b'x')
+
+    assert _run(out_path, Data.config) == [1, 2, 3]
+    _check_output(out_path)
+# ----------------------------------------
+def test_config_changed(tmp_path):
+    '''
+    Tests that chunks are not reused if the configuration changed
+    '''
+    out_path = f'{tmp_path}/file.root'
+    _run(out_path, Data.config, stop_at=2)
+
+    config = dict(Data.config)
+    config['chunk_size'] = 200
+
+    assert _run(out_path, config) == [0, 1, 2, 3]
+    _check_output(out_path)
+# ----------------------------------------
+def test_stale_files(tmp_path):
+    '''
+    Tests that temporary files and chunks not recorded are removed
+    '''
+    out_path = f'{tmp_path}/file.root'
+    _run(out_path, Data.config, stop_at=1)
+
+    for name in ['00001.root', '00001.root.123.tmp']:
+        with open(f'{out_path}.chunks/{name}', 'w', encoding='utf-8') as ofile:
+            ofile.write('partial')
+
+    ckp = ChunkCheckpoint(out_path=out_path, config=Data.config)
+
+    assert ckp.ndone == 1
+    assert sorted(os.listdir(f'{out_path}.chunks')) == ['00000.root', 'checkpoint.json']
+# ----------------------------------------
+def test_add_out_of_order(tmp_path):
+    '''
+    Tests that chunks have to be added in order
+    '''
+    ckp = ChunkCheckpoint(out_path=f'{tmp_path}/file.root', config=Data.config)
+    with pytest.raises(ValueError):
+        ckp.add(1, 100, 200)
+# ----------------------------------------
+def test_remove_stale(tmp_path):
+    '''
+    Tests that chunks left after the output was written are removed
+    '''
+    out_path = f'{tmp_path}/file.root'
+    _run(out_path, Data.config, stop_at=2)
+
+    with pytest.raises(FileNotFoundError):
+        ChunkCheckpoint.remove_stale(out_path)
+
+    assert os.path.isdir(f'{out_path}.chunks')
+
+    _run(out_path, Data.config)
+    os.makedirs(f'{out_path}.chunks')
+    ChunkCheckpoint.remove_stale(out_path)
+
+    assert os.listdir(tmp_path) == ['file.root']
@@ -0,0 +1,74 @@
+'''
+Module with tests for ColumnWriter class
+'''
+import os
+
+import numpy
+import uproot
+import pytest
+from dmu.logging.log_store  import LogStore
+from rx_data.column_writer  import ColumnWriter
+
+log = LogStore.add_logger('rx_data:test_column_writer')
+# ----------------------------------------
+@pytest.fixture(scope='session', autouse=True)
+def _initialize():
+    LogStore.set_level('rx_data:column_writer', 10)
+# ----------------------------------------
+def _get_data(index : int) -> dict[str,numpy.ndarray]:
+    return {
+            'hop_mass'    : numpy.arange(100, dtype='float64') + 100 * index,
+            'EVENTNUMBER' : numpy.arange(100, dtype='uint64' ) + 100 * index,
+            'RUNNUMBER'   : numpy.full(100, 300_000, dtype='uint32')}
+# ----------------------------------------
+@pytest.mark.parametrize('compression', [None, 'lz4', 'zstd:5'])
+def test_root(tmp_path, compression : str):
+    '''
+    Tests writing ROOT file in chunks
+    '''
+    out_path = f'{tmp_path}/file.root'
+    with ColumnWriter(path=out_path, compression=compression, basket_size=30) as wrt:
+        for index in range(3):
+            wrt.write(_get_data(index))
+
+    assert os.listdir(tmp_path) == ['file.root']
+
+    with uproot.open(out_path) as rfile:
+        tree   = rfile['DecayTree']
+        d_data = tree.arrays(library='np')
+
+        assert tree['hop_mass'].num_baskets == 12
+
+    assert numpy.array_equal(d_data['hop_mass'   ], numpy.arange(300))
+    assert numpy.array_equal(d_data['EVENTNUMBER'], numpy.arange(300))
+    assert d_data['RUNNUMBER'].dtype == 'uint32'
+# ----------------------------------------
+def test_failure(tmp_path):
+    '''
+    Tests that nothing is left when writing fails
+    '''
+    out_path = f'{tmp_path}/file.root'
+    with pytest.raises(ValueError):
+        with ColumnWriter(path=out_path) as wrt:
+            wrt.write(_get_data(0))
+            wrt.write({'hop_mass' : numpy.zeros(10), 'EVENTNUMBER' : numpy.zeros(5)})
+
+    assert os.listdir(tmp_path) == []
+# ----------------------------------------
+def test_parquet(tmp_path):
+    '''
+    Tests writing Parquet file in chunks
+    '''
+    pq = pytest.importorskip('pyarrow.parquet')
+
+    out_path = f'{tmp_path}/file.parquet'
+    with ColumnWriter(path=out_path, fmt='parquet', compression='zstd') as wrt:
+        for index in range(3):
+            wrt.write(_get_data(index))
+
+    pfile = pq.ParquetFile(out_path)
+    table = pfile.read()
+
+    assert pfile.num_row_groups == 3
+    assert numpy.array_equal(table['hop_mass'].to_numpy(), numpy.arange(300))
+# ----------------------------------------
@@ -0,0 +1,74 @@
+'''
+Module with tests for FileCache class
+'''
+import os
+
+import pytest
+from dmu.logging.log_store import LogStore
+from rx_data.file_cache    import FileCache
+
+log = LogStore.add_logger('rx_data:test_file_cache')
+# ----------------------------------------
+@pytest.fixture(scope='session', autouse=True)
+def _initialize():
+    LogStore.set_level('rx_data:file_cache', 10)
+# ----------------------------------------
+def _make_file(path : str, text : str) -> str:
+    with open(path, 'w', encoding='utf-8') as ofile:
+        ofile.write(text)
+
+    return path
+# ----------------------------------------
+def test_persist(tmp_path):
+    '''
+    Values are kept across instances
+    '''
+    file_path  = _make_file(f'{tmp_path}/file.txt', 'abc')
+    cache_path = f'{tmp_path}/cache/cache.json'
+
+    cache = FileCache(path=cache_path)
+    assert cache.get(file_path) is None
+
+    cache.set(file_path, {'entries' : 10})
+    cache.save()
+
+    cache = FileCache(path=cache_path)
+    assert len(cache) == 1
+    assert cache.get(file_path) == {'entries' : 10}
+# ----------------------------------------
+def test_link(tmp_path):
+    '''
+    Links are resolved, value is shared with the file they point to
+    '''
+    file_path = _make_file(f'{tmp_path}/file.txt', 'abc')
+    link_path = f'{tmp_path}/link.txt'
+    os.symlink(file_path, link_path)
+
+    cache = FileCache(path=f'{tmp_path}/cache.json')
+    cache.set(link_path, 1)
+
+    assert cache.get(file_path) == 1
+# ----------------------------------------
+def test_changed(tmp_path):
+    '''
+    Values of files that changed are not returned
+    '''
+    file_path = _make_file(f'{tmp_path}/file.txt', 'abc')
+
+    cache = FileCache(path=f'{tmp_path}/cache.json')
+    cache.set(file_path, 1)
+
+    _make_file(file_path, 'abcd')
+    assert cache.get(file_path) is None
+# ----------------------------------------
+@pytest.mark.parametrize('path', ['/not/a/file.root', 'root://eoslhcb.cern.ch//eos/lhcb/file.root'])
+def test_not_accessible(tmp_path, path : str):
+    '''
+    Files that cannot be accessed are not cached
+    '''
+    cache = FileCache(path=f'{tmp_path}/cache.json')
+    cache.set(path, 1)
+
+    assert cache.get(path) is None
+    assert len(cache) == 0
+# ----------------------------------------
@@ -0,0 +1,141 @@
+'''
+Module with tests for LFNCatalog class
+'''
+import os
+import gzip
+import json
+import shutil
+import glob
+from importlib.resources   import files
+
+import pytest
+from dmu.logging.log_store import LogStore
+from rx_data.lfn_catalog   import LFNCatalog
+
+log = LogStore.add_logger('rx_data:test_lfn_catalog')
+# ----------------------------------------
+class Data:
+    '''
+    Class used to share attributes
+    '''
+    kind = 'rx'
+    vers = 'v4'
+# ----------------------------------------
+@pytest.fixture(scope='session', autouse=True)
+def _initialize():
+    LogStore.set_level('rx_data:lfn_catalog', 10)
+# ----------------------------------------
+def _get_lfns() -> list[str]:
+    jsn_wc = files('rx_data_lfns').joinpath(f'{Data.kind}/{Data.vers}/*.json')
+    l_path = glob.glob(str(jsn_wc))
+
+    l_lfn  = []
+    for path in l_path:
+        with open(path, encoding='utf-8') as ifile:
+            l_lfn += json.load(ifile)
+
+    return l_lfn
+# ----------------------------------------
+@pytest.fixture
+def _tmp_catalog(tmp_path):
+    '''
+    Saves catalog in a temporary copy of the directory with the LFNs
+    '''
+    org_dir = str(files('rx_data_lfns').joinpath(f'{Data.kind}/{Data.vers}'))
+    tmp_dir = f'{tmp_path}/{Data.kind}/{Data.vers}'
+    shutil.copytree(org_dir, tmp_dir)
+
+    ctl = LFNCatalog(kind=Data.kind, vers=Data.vers, from_json=True)
+    ctl._lfn_dir = tmp_dir # pylint: disable=protected-access
+    ctl.save()
+
+    return ctl
+# ----------------------------------------
+def test_from_json():
+    '''
+    Catalog built from JSON files contains all the LFNs
+    '''
+    ctl   = LFNCatalog(kind=Data.kind, vers=Data.vers, from_json=True)
+    l_lfn = _get_lfns()
+
+    assert len(ctl) == len(l_lfn)
+    assert sorted(ctl.get_column('lfn')) == sorted(l_lfn)
+# ----------------------------------------
+def test_save_load(_tmp_catalog : LFNCatalog):
+    '''
+    Catalog read from compressed file is identical to one built from JSON
+    '''
+    ctl_org = _tmp_catalog
+    path    = ctl_org.catalog_path
+    with gzip.open(path, 'rt', encoding='utf-8') as ifile:
+        d_data = json.load(ifile)
+
+    # pylint: disable=protected-access
+    d_column = LFNCatalog._decode(d_data)
+    for name in ['lfn', 'sample', 'trigger', 'polarity', 'event_type']:
+        assert d_column[name] == ctl_org.get_column(name)
+
+    size = os.path.getsize(path)
+    log.info(f'Catalog size: {size / 1024:.0f} KB')
+# ----------------------------------------
+def test_outdated(_tmp_catalog : LFNCatalog):
+    '''
+    Catalog is not used when the JSON files changed after it was made
+    '''
+    # pylint: disable=protected-access
+    ctl       = _tmp_catalog
+    json_path = ctl._get_json_paths()[0]
+    with gzip.open(ctl.catalog_path, 'rt', encoding='utf-8') as ifile:
+        d_data = json.load(ifile)
+
+    assert d_data['hash'] == ctl._get_hash()
+
+    with open(json_path, encoding='utf-8') as ifile:
+        l_lfn = json.load(ifile)
+
+    with open(json_path, 'w', encoding='utf-8') as ofile:
+        json.dump(l_lfn[1:], ofile)
+
+    assert d_data['hash'] != ctl._get_hash()
+# ----------------------------------------
+def test_get_triggers():
+    '''
+    Counts of triggers add up to number of parsed LFNs
+    '''
+    ctl       = LFNCatalog(kind=Data.kind, vers=Data.vers, from_json=True)
+    d_trigger = ctl.get_triggers()
+
+    assert sum(d_trigger.values()) == len(ctl.get_lfns())
+    for trigger, nfile in d_trigger.items():
+        log.info(f'{trigger:<50}{nfile:<10}')
+        assert len(ctl.get_lfns(trigger=trigger)) == nfile
+# ----------------------------------------
+@pytest.mark.parametrize('sample', ['data_24_*', 'bu_jpsik_ee_eq_dpc', 'bu_*'])
+def test_get_lfns(sample : str):
+    '''
+    Filtering by sample
+    '''
+    ctl    = LFNCatalog(kind=Data.kind, vers=Data.vers, from_json=True)
+    l_lfn  = ctl.get_lfns(sample=sample, trigger='Hlt2RD_BuToKpEE_MVA')
+    nlfn   = len(l_lfn)
+    log.info(f'Found {nlfn} LFNs for {sample}')
+
+    for lfn in l_lfn:
+        assert 'Hlt2RD_BuToKpEE_MVA_' in lfn
+# ----------------------------------------
+@pytest.mark.parametrize('randomize', [True, False])
+def test_query(randomize : bool):
+    '''
+    Subsampling is done for each sample and trigger
+    '''
+    ctl       = LFNCatalog(kind=Data.kind, vers=Data.vers, from_json=True)
+    l_trigger = ['Hlt2RD_BuToKpEE_MVA', 'Hlt2RD_BuToKpMuMu_MVA']
+    d_stratum = ctl.get_strata(samples=['data_24_*'], triggers=l_trigger)
+    l_lfn     = ctl.query(samples=['data_24_*'], triggers=l_trigger, nfile=2, randomize=randomize, seed=1)
+
+    nexp = sum( min(2, len(l_index)) for l_index in d_stratum.values() )
+    assert len(l_lfn) == nexp
+
+    l_lfn_again = ctl.query(samples=['data_24_*'], triggers=l_trigger, nfile=2, randomize=randomize, seed=1)
+    assert l_lfn == l_lfn_again
+# ----------------------------------------
@@ -7,6 +7,7 @@ import copy
 from importlib.resources import files
 
 import mplhep
+import numpy
 import pytest
 import yaml
 import matplotlib.pyplot as plt
@@ -259,3 +260,43 @@ def test_add_smearing(kind : str, is_mc : bool):
     d_rdf   = {'Original' : rdf_org, 'Corrected' : rdf_cor, 'Smeared' : rdf_smr}
     _compare_masses(d_rdf, f'add_smearing_{sample}', kind)
 #-----------------------------------------
+@pytest.mark.parametrize('is_mc', [True, False])
+def test_vectorized(is_mc : bool):
+    '''
+    Checks that vectorized calculation gives the same values and types as the row by row one
+    '''
+    rdf_org = _get_rdf(is_mc=is_mc)
+    rdf_org = rdf_org.Range(5_000)
+    # With a seed, the smearing of each candidate does not depend on how the candidates are processed
+    cor     = MassBiasCorrector(rdf=rdf_org, nthreads=1, ecorr_kind='brem_track_2', seed=42)
+    rdf_row = cor.get_rdf(vectorized=False)
+    rdf_vec = cor.get_rdf(vectorized=True)
+
+    _check_output_columns(rdf_vec)
+
+    d_row = rdf_row.AsNumpy()
+    d_vec = rdf_vec.AsNumpy()
+
+    assert sorted(d_row) == sorted(d_vec)
+    for name, arr_row in d_row.items():
+        log.debug(f'Comparing: {name}')
+        arr_vec = d_vec[name]
+
+        assert arr_row.dtype == arr_vec.dtype
+        assert numpy.allclose(arr_row, arr_vec, rtol=1e-9)
+#-----------------------------------------
+def test_smearing_seed():
+    '''
+    Checks that with a seed, the smeared masses do not depend on how the data is split
+    '''
+    rdf_org = _get_rdf(is_mc=True)
+    rdf_all = rdf_org.Range(2_000)
+    l_rdf   = [rdf_org.Range(0, 1_000), rdf_org.Range(1_000, 2_000)]
+
+    d_all   = MassBiasCorrector(rdf=rdf_all, seed=42).get_rdf().AsNumpy(['B_M_smr', 'Jpsi_M_smr'])
+    l_part  = [ MassBiasCorrector(rdf=rdf, seed=42).get_rdf().AsNumpy(['B_M_smr', 'Jpsi_M_smr']) for rdf in l_rdf ]
+
+    for name, arr_all in d_all.items():
+        arr_part = numpy.concatenate([ d_part[name] for d_part in l_part ])
+        assert numpy.allclose(arr_all, arr_part)
+#-----------------------------------------
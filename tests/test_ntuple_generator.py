@@ -0,0 +1,122 @@
+'''
+Module with tests for NtupleGenerator class
+'''
+import os
+
+import numpy
+import uproot
+import pytest
+from dmu.logging.log_store    import LogStore
+from rx_data                  import utilities as ut
+from rx_data.ntuple_generator import NtupleGenerator
+
+log = LogStore.add_logger('rx_data:test_ntuple_generator')
+# ----------------------------------------
+@pytest.fixture(scope='session', autouse=True)
+def _initialize():
+    LogStore.set_level('rx_data:ntuple_generator', 10)
+# ----------------------------------------
+def _read(path : str, tree : str = 'DecayTree') -> dict[str,numpy.ndarray]:
+    with uproot.open(path) as ifile:
+        return ifile[tree].arrays(library='np')
+# ----------------------------------------
+def test_layout(tmp_path):
+    '''
+    Tests that files and lists of samples can be used as the real ones
+    '''
+    gen    = NtupleGenerator(out_dir=str(tmp_path), nentries=100, nfiles=2)
+    d_yaml = gen.run()
+
+    assert sorted(d_yaml) == sorted(['main'] + NtupleGenerator.l_friend)
+    for tree, yaml_path in d_yaml.items():
+        assert yaml_path == f'{tmp_path}/Data/samples/{tree}.yaml'
+
+    d_main = ut.load_yaml(d_yaml['main'])
+    assert sorted(d_main) == sorted(NtupleGenerator.l_sample)
+
+    for sample, d_trigger in d_main.items():
+        assert sorted(d_trigger) == sorted(NtupleGenerator.l_trigger)
+        for trigger, l_path in d_trigger.items():
+            assert len(l_path) == 2
+            for path in l_path:
+                assert os.path.isfile(path)
+                assert ut.info_from_path(path)[1] == trigger
+
+    # Friend trees have the same file names as the main ones
+    d_brem = ut.load_yaml(d_yaml['brem_track_2'])
+    for sample, d_trigger in d_brem.items():
+        assert list(d_trigger) == ['Hlt2RD_BuToKpEE_MVA']
+        l_main = [ os.path.basename(path) for path in d_main[sample]['Hlt2RD_BuToKpEE_MVA'] ]
+        l_brem = [ os.path.basename(path) for path in d_trigger['Hlt2RD_BuToKpEE_MVA']     ]
+
+        assert l_main == l_brem
+# ----------------------------------------
+def test_branches(tmp_path):
+    '''
+    Tests branches of main and friend trees
+    '''
+    gen    = NtupleGenerator(out_dir=str(tmp_path), nentries=500, nfiles=1, triggers=['Hlt2RD_BuToKpEE_MVA'])
+    d_yaml = gen.run()
+
+    d_main = ut.load_yaml(d_yaml['main'])
+    d_mva  = ut.load_yaml(d_yaml['mva'])
+
+    mc_path = d_main['Bu_JpsiK_ee_eq_DPC'  ]['Hlt2RD_BuToKpEE_MVA'][0]
+    dt_path = d_main['DATA_24_MagDown_24c2']['Hlt2RD_BuToKpEE_MVA'][0]
+
+    d_mc = _read(mc_path)
+    d_dt = _read(dt_path)
+
+    assert 'L1_TRUEID' in d_mc
+    assert 'L1_TRUEID' not in d_dt
+
+    for name in ['B_M', 'Jpsi_M', 'L1_BREMHYPOCOL', 'H_PID_E', 'Jpsi_DTF_HEAD_PE', 'block', 'EVENTNUMBER']:
+        assert name in d_dt
+        assert len(d_dt[name]) == 500
+
+    assert numpy.all(d_dt['B_DIRA_OWNPV'] <= 1)
+    assert numpy.median(d_dt['B_DIRA_OWNPV']) > 0.99
+    assert 5_000 < numpy.median(d_mc['B_M']) < 5_400
+
+    d_fr = _read(d_mva['DATA_24_MagDown_24c2']['Hlt2RD_BuToKpEE_MVA'][0])
+    numpy.testing.assert_array_equal(d_fr['EVENTNUMBER'], d_dt['EVENTNUMBER'])
+# ----------------------------------------
+def test_mcdt(tmp_path):
+    '''
+    Tests that MC files have MCDecayTree, with the true decays of the candidates and of decays not reconstructed
+    '''
+    gen    = NtupleGenerator(out_dir=str(tmp_path), nentries=100, nfiles=2, triggers=['Hlt2RD_BuToKpEE_MVA'], friends=[])
+    d_yaml = gen.run()
+    d_main = ut.load_yaml(d_yaml['main'])
+
+    l_evt = []
+    for path in d_main['Bu_JpsiK_ee_eq_DPC']['Hlt2RD_BuToKpEE_MVA']:
+        d_rec = _read(path)
+        d_gen = _read(path, tree='MCDecayTree')
+
+        assert len(d_gen['EVENTNUMBER']) == 200
+        for name in ['EVENTNUMBER', 'RUNNUMBER', 'B_TRUEM', 'L1_TRUEPX', 'L2_TRUEENERGY', 'H_TRUEID']:
+            numpy.testing.assert_array_equal(d_gen[name][:100], d_rec[name])
+
+        l_evt.append(d_gen['EVENTNUMBER'])
+
+    arr_evt = numpy.concatenate(l_evt)
+    assert len(numpy.unique(arr_evt)) == len(arr_evt)
+
+    with uproot.open(d_main['DATA_24_MagDown_24c2']['Hlt2RD_BuToKpEE_MVA'][0]) as ifile:
+        assert 'MCDecayTree' not in ifile
+# ----------------------------------------
+def test_reproducible(tmp_path):
+    '''
+    Tests that the same seed gives the same ntuples
+    '''
+    l_data = []
+    for name in ['a', 'b']:
+        gen    = NtupleGenerator(out_dir=f'{tmp_path}/{name}', nentries=50, nfiles=1, samples=['DATA_24_MagDown_24c2'], friends=[], seed=3)
+        d_yaml = gen.run()
+        d_main = ut.load_yaml(d_yaml['main'])
+        l_data.append(_read(d_main['DATA_24_MagDown_24c2']['Hlt2RD_BuToKpEE_MVA'][0]))
+
+    d_1, d_2 = l_data
+    for name, arr in d_1.items():
+        numpy.testing.assert_array_equal(arr, d_2[name])
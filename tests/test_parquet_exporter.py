@@ -0,0 +1,54 @@
+'''
+Module with tests for ParquetExporter class
+'''
+import os
+
+import pytest
+from dmu.logging.log_store import LogStore
+from rx_data.rdf_getter    import RDFGetter
+
+pq = pytest.importorskip('pyarrow.parquet')
+ds = pytest.importorskip('pyarrow.dataset')
+
+from rx_data.parquet_exporter import ParquetExporter # pylint: disable=wrong-import-position
+
+log = LogStore.add_logger('rx_data:test_parquet_exporter')
+# ----------------------------------------
+@pytest.fixture(scope='session', autouse=True)
+def _initialize():
+    LogStore.set_level('rx_data:parquet_exporter', 10)
+    RDFGetter.max_entries = 1000
+# ----------------------------------------
+@pytest.mark.parametrize('sample, trigger', [
+    ('DATA_24_MagDown_24c2', 'Hlt2RD_BuToKpEE_MVA'),
+    ('Bu_JpsiK_ee_eq_DPC'  , 'Hlt2RD_BuToKpEE_MVA')])
+def test_export(tmp_path, sample : str, trigger : str):
+    '''
+    Exports sample with friend columns, then checks that exporting again does not rewrite files
+    '''
+    out_dir = f'{tmp_path}/{sample}'
+    exp     = ParquetExporter(
+            sample    = sample,
+            trigger   = trigger,
+            columns   = ['B_M', 'q2', 'mva.mva_cmb', 'hop.hop_mass', 'nPVs'],
+            out_dir   = out_dir,
+            selection = {'mass' : 'B_M > 4500'},
+            float32   = True,
+            dictionary= ['nPVs'])
+
+    l_path  = exp.run()
+    d_mtime = { path : os.stat(path).st_mtime_ns for path in l_path }
+
+    table   = ds.dataset(out_dir, format='parquet').to_table()
+    assert table.num_rows > 0
+    assert str(table.schema.field('B_M').type) == 'float'
+    assert (table['B_M'].to_numpy() > 4500).all()
+
+    for path in l_path:
+        pfile = pq.ParquetFile(path)
+        assert pfile.num_row_groups == 1
+        assert ParquetExporter.meta_key in pfile.schema_arrow.metadata
+
+    exp.run()
+    assert d_mtime == { path : os.stat(path).st_mtime_ns for path in l_path }
+# ----------------------------------------
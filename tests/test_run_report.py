@@ -0,0 +1,128 @@
+'''
+Module with tests for RunReport class
+'''
+import json
+import time
+
+import pytest
+from dmu.logging.log_store import LogStore
+from rx_data.run_report    import RunReport
+
+log = LogStore.add_logger('rx_data:test_run_report')
+# ----------------------------------------
+@pytest.fixture(scope='session', autouse=True)
+def _initialize():
+    LogStore.set_level('rx_data:run_report', 10)
+# ----------------------------------------
+def _get_report(tmp_path) -> RunReport:
+    rep = RunReport(labels={'kind' : 'hop', 'part' : '0_1'})
+    for ichunk in range(3):
+        with rep.stage('calculate', path='file.root', chunk=ichunk) as rec:
+            time.sleep(0.01)
+            rec['entries'] = 100
+
+        with rep.stage('write', path='file.root', chunk=ichunk) as rec:
+            with open(f'{tmp_path}/out_{ichunk}.txt', 'w', encoding='utf-8') as ofile:
+                ofile.write(1000 * 'x')
+
+            rec['entries'] = 100
+
+    return rep
+# ----------------------------------------
+def test_stages(tmp_path):
+    '''
+    Tests totals per stage and records per chunk
+    '''
+    rep      = _get_report(tmp_path)
+    d_report = rep.to_dict()
+    d_stage  = d_report['stages']
+
+    assert sorted(d_stage) == ['calculate', 'write']
+    assert d_stage['calculate']['calls'  ] == 3
+    assert d_stage['calculate']['entries'] == 300
+    assert d_stage['calculate']['seconds'] >= 0.03
+    assert d_stage['calculate']['rate'   ] <= 300 / 0.03
+    assert d_stage['write']['bytes_written'] >= 3000
+    assert d_stage['write']['peak_rss'] <= d_report['peak_rss']
+
+    assert len(d_report['records']) == 6
+    assert [ rec['chunk'] for rec in d_report['records'] ] == [0, 0, 1, 1, 2, 2]
+    assert d_report['peak_rss'] > 0
+
+    rep.print_summary()
+# ----------------------------------------
+def test_peak_rss():
+    '''
+    Tests that the peak memory of a stage does not include the one of earlier stages
+    '''
+    rep = RunReport()
+    with rep.stage('allocate'):
+        arr = bytearray(200 * 1024 ** 2)
+        arr[::4096] = len(arr[::4096]) * b'x'
+
+    del arr
+
+    with rep.stage('sleep'):
+        time.sleep(0.01)
+
+    d_stage = rep.to_dict()['stages']
+    mb      = 1024 ** 2
+
+    assert d_stage['allocate']['peak_rss'] - d_stage['sleep']['peak_rss'] > 100 * mb
+    assert rep.to_dict()['peak_rss'] >= d_stage['allocate']['peak_rss']
+# ----------------------------------------
+def test_nested_peak_rss():
+    '''
+    Tests that the peak memory of a stage includes the one of the stages inside it
+    '''
+    rep = RunReport()
+    mb  = 1024 ** 2
+    with rep.stage('file'):
+        with rep.stage('calculate'):
+            arr = bytearray(200 * mb)
+            arr[::4096] = len(arr[::4096]) * b'x'
+
+        del arr
+
+        with rep.stage('write'):
+            time.sleep(0.01)
+
+    d_stage = rep.to_dict()['stages']
+
+    assert d_stage['file']['peak_rss'] >= d_stage['calculate']['peak_rss']
+    assert d_stage['file']['peak_rss'] - d_stage['write']['peak_rss'] > 100 * mb
+# ----------------------------------------
+def test_failed_stage():
+    '''
+    Tests that stages that raise are recorded
+    '''
+    rep = RunReport()
+    with pytest.raises(ValueError):
+        with rep.stage('calculate'):
+            raise ValueError('Failed')
+
+    d_report = rep.to_dict()
+    assert d_report['stages']['calculate']['calls'] == 1
+    assert d_report['records'][0]['rate'] is None
+# ----------------------------------------
+def test_save(tmp_path):
+    '''
+    Tests saving report to JSON and Prometheus files
+    '''
+    rep       = _get_report(tmp_path)
+    json_path = f'{tmp_path}/reports/report.json'
+    prom_path = f'{tmp_path}/metrics/job.prom'
+    rep.save(json_path, prometheus=prom_path)
+
+    with open(json_path, encoding='utf-8') as ifile:
+        d_report = json.load(ifile)
+
+    assert d_report['labels'] == {'kind' : 'hop', 'part' : '0_1'}
+
+    with open(prom_path, encoding='utf-8') as ifile:
+        l_line = ifile.read().splitlines()
+
+    assert '# TYPE rx_data_stage_seconds gauge' in l_line
+    assert '# TYPE rx_data_read_bytes_total counter' in l_line
+    assert 'rx_data_stage_entries{kind="hop",part="0_1",stage="calculate"} 300' in l_line
+    assert 'rx_data_stage_calls{kind="hop",part="0_1",stage="write"} 3' in l_line
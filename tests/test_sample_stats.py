@@ -0,0 +1,49 @@
+'''
+Module with tests for SampleStats class
+'''
+import os
+
+import numpy
+import pytest
+from dmu.logging.log_store import LogStore
+from rx_data.sample_stats  import SampleStats
+from rx_data.stats         import Stats
+
+log = LogStore.add_logger('rx_data:test_sample_stats')
+# ----------------------------------------
+@pytest.fixture(scope='session', autouse=True)
+def _initialize():
+    LogStore.set_level('rx_data:sample_stats', 10)
+# ----------------------------------------
+def test_sizes(samples_path : str):
+    '''
+    Tests table with sizes only
+    '''
+    sst = SampleStats(samples_path=samples_path)
+    df  = sst.get_df()
+
+    assert len(df) == 4
+    assert list(df.columns) == ['Sample', 'Trigger', 'Files', 'Bytes']
+    assert (df.Files == 3).all()
+    assert not os.path.isfile(Stats.cache_path)
+# ----------------------------------------
+def test_entries(samples_path : str, tmp_path):
+    '''
+    Tests table with entries and branch sizes, read first from files and then from the cache of Stats
+    '''
+    for _ in range(2):
+        sst = SampleStats(samples_path=samples_path, entries=True, branches=True)
+        df  = sst.get_df()
+        df_br = sst.get_branch_df()
+
+        assert (df.Entries == 33).all()
+        assert numpy.allclose(df.BytesPerEntry, df.Bytes / 33)
+        assert sorted(df_br.Branch.unique()) == ['B_M', 'B_PT']
+        assert len(df_br) == 8
+
+    assert os.path.isfile(Stats.cache_path)
+
+    SampleStats.save(df, path=f'{tmp_path}/out/stats', formats=['md', 'csv'])
+    assert os.path.isfile(f'{tmp_path}/out/stats.md')
+    assert os.path.isfile(f'{tmp_path}/out/stats.csv')
+# ----------------------------------------
@@ -1,6 +1,7 @@
 '''
 Module with testing functions for the Stats class
 '''
+import os
 
 import pytest
 from dmu.logging.log_store import LogStore
@@ -24,3 +25,24 @@ def test_mcdt():
 
     assert val > 0
 # ----------------------------------------
+@pytest.mark.usefixtures('samples_path')
+def test_metadata():
+    '''
+    Tests retrieval of entries from metadata, with and without cache
+    '''
+    obj = Stats(sample='Bu_Kee_eq_btosllball05_DPC', trigger='Hlt2RD_BuToKpEE_MVA')
+    assert obj.get_entries(tree='MCDecayTree') == 33
+    assert obj.get_entries(tree='MCDecayTree') == 33
+    assert os.path.isfile(Stats.cache_path)
+# ----------------------------------------
+@pytest.mark.usefixtures('samples_path')
+def test_sample_entries():
+    '''
+    Tests retrieval of entries for multiple samples and triggers
+    '''
+    d_entry = Stats.get_sample_entries(samples=['Bu_*'], triggers=['*EE_MVA'], tree='MCDecayTree')
+
+    assert d_entry == {
+            ('Bu_Kee_eq_btosllball05_DPC'  , 'Hlt2RD_BuToKpEE_MVA') : 33,
+            ('Bu_Kmumu_eq_btosllball05_DPC', 'Hlt2RD_BuToKpEE_MVA') : 33}
+# ----------------------------------------
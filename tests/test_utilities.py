@@ -2,6 +2,11 @@
 Script meant to be used to test functions in utilities.py module
 '''
 import os
+import glob
+import json
+from typing                import Union
+from importlib.resources   import files
+
 import yaml
 import pytest
 
@@ -72,3 +77,83 @@ def test_is_reso():
     assert ut.is_reso(q2bin='jpsi')
     assert ut.is_reso(q2bin='psi2')
 # -----------------------------------------
+@pytest.mark.parametrize('vers', ['v4', 'v10'])
+def test_info_from_paths(vers : str):
+    '''
+    Tests batch extraction of information from paths against the one path at a time version
+    '''
+    jsn_wc = files('rx_data_lfns').joinpath(f'rx/{vers}/*.json')
+    l_lfn  = []
+    for path in glob.glob(str(jsn_wc)):
+        with open(path, encoding='utf-8') as ifile:
+            l_lfn += json.load(ifile)
+
+    d_info = ut.info_from_paths(l_lfn)
+    for lfn, sample, line, hsh in zip(l_lfn, d_info['sample'], d_info['line'], d_info['hash']):
+        assert (sample, line) == ut.info_from_path(lfn)
+        assert lfn.endswith(f'_{hsh}.root')
+# -----------------------------------------
+def test_info_from_paths_fail():
+    '''
+    Tests that paths that cannot be parsed are either None or raise
+    '''
+    l_path = [
+            '/path/to/data_24_magup_turbo_24c1_Hlt2RD_BuToKpEE_MVA_09b4612601.root',
+            '/path/to/not_a_sample.root']
+
+    d_info = ut.info_from_paths(l_path, raise_on_fail=False)
+    assert d_info['sample'] == ['data_24_magup_24c1' , None]
+    assert d_info['line'  ] == ['Hlt2RD_BuToKpEE_MVA', None]
+
+    with pytest.raises(ValueError):
+        ut.info_from_paths(l_path)
+# -----------------------------------------
+@pytest.mark.parametrize('path', [
+    'root://eoslhcb.cern.ch//eos/lhcb/grid/user/data_24_magup_24c1_Hlt2RD_BuToKpEE_MVA_09b4612601.root',
+    '/path with spaces/file.root',
+    '/path/to/yes',
+    '123'])
+def test_dump_samples(tmp_path, path : str):
+    '''
+    Tests that lists of samples are written as the IndentListDumper would and can be read back
+    '''
+    d_struc = {
+            'DATA_24_MagUp_24c1'  : {'Hlt2RD_BuToKpEE_MVA' : ['/path/b.root', path], 'Hlt2RD_BuToKpMuMu_MVA' : ['/path/a.root']},
+            'Bu_JpsiK_ee_eq_DPC'  : {'Hlt2RD_BuToKpEE_MVA' : ['/path/c.root']}}
+
+    yaml_path = f'{tmp_path}/samples.yaml'
+    ut.dump_samples(d_struc, yaml_path)
+
+    with open(yaml_path, encoding='utf-8') as ifile:
+        text = ifile.read()
+
+    assert text == yaml.dump(d_struc, Dumper=ut.IndentListDumper, default_flow_style=False)
+    assert ut.load_yaml(yaml_path) == d_struc
+# -----------------------------------------
+def _get_rdf(nentries : int):
+    from ROOT import RDataFrame
+
+    rdf = RDataFrame(nentries)
+    rdf = rdf.Define('EVENTNUMBER', 'rdfentry_')
+    rdf = rdf.Define('B_BPVX'     , 'rdfentry_ % 10 == 0 ? std::numeric_limits<double>::quiet_NaN() : 1.5 * rdfentry_')
+    for lep in ['L1', 'L2', 'H']:
+        rdf = rdf.Define(f'{lep}_HASBREMADDED'        , 'rdfentry_ % 2 == 0')
+        rdf = rdf.Define(f'{lep}_BREMHYPOENERGY'      , '100.0')
+        rdf = rdf.Define(f'{lep}_BREMTRACKBASEDENERGY', '200.0')
+
+    return rdf
+# -----------------------------------------
+@pytest.mark.parametrize('float32', [True, False, ['B_BPVX']])
+def test_df_from_rdf(float32 : Union[bool,list[str]]):
+    '''
+    Tests extraction of projected columns, with entries with NaNs dropped
+    '''
+    rdf = _get_rdf(nentries=100)
+    df  = ut.df_from_rdf(rdf, columns=['EVENTNUMBER', 'B_BPVX', 'L1_BREMHYPOENERGY'], float32=float32)
+
+    assert list(df.columns) == ['EVENTNUMBER', 'B_BPVX', 'L1_BREMHYPOENERGY']
+    assert len(df) == 90
+    assert df.B_BPVX.dtype            == ('float32' if float32 else 'float64')
+    assert df.L1_BREMHYPOENERGY.dtype == ('float32' if float32 is True else 'float64')
+    assert (df.L1_BREMHYPOENERGY == 100 * (df.EVENTNUMBER % 2 == 0)).all()
+# -----------------------------------------